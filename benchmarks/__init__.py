@@ -0,0 +1,17 @@
+"""
+无头性能基准。
+
+在项目根目录下运行（资源按相对路径加载）：
+
+    python -m benchmarks.run                 # 固定动作脚本的整体吞吐量和峰值内存
+    python -m benchmarks.micro               # 碰撞和绘制函数随物体数量的变化
+    python -m benchmarks.leaks               # 连续多局运行的内存增长
+    python -m benchmarks.workers             # worker 启动时间和内存：spawn 与 fork server
+
+导入这个包时默认使用 dummy 视频/音频驱动，不打开窗口也不需要声卡。
+"""
+
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+"""
+多局运行的内存增长检查
+用法: python -m benchmarks.leaks [--script NAME] [--mode MODE] [--episodes N]
+                                 [--threshold KB] [--top N]
+
+按动作脚本（benchmarks/scripts/，默认 deaths：每局很快死掉）循环执行，一局结束就
+reset，连续跑 --episodes 局。先跑 --warmup 局让各种缓存（素材表、字体、声音等）
+填满，之后开始 tracemalloc，每 --sample-every 局做一次完整垃圾回收并采样：
+
+    Python 堆    tracemalloc 统计的当前分配量
+    RSS          进程当前的常驻内存（/proc/self/statm），包括 SDL 分配的图片像素，
+                 这部分 tracemalloc 看不到
+
+对采样点做最小二乘，得到每局的增长量。结束时再与开始时比较，按分配位置（文件:行）
+和对象类型（gc 跟踪的对象按类名计数）列出每局留下来的内存和对象，增长最多的排在
+前面。Python 堆每局增长超过 --threshold（KB）时退出码为 1；--rss-threshold 可以
+对 RSS 做同样的检查（RSS 受分配器影响波动较大，默认不检查）。
+"""
+
+import gc
+import os
+import sys
+import json
+import shutil
+import argparse
+import tracemalloc
+import contextlib
+import collections
+
+import benchmarks  # noqa: F401  无头驱动
+from benchmarks import run
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def current_rss():
+    """当前常驻内存（字节），不支持的平台返回 None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def type_counts():
+    """gc 跟踪的对象按类名计数"""
+    counts = collections.Counter()
+    for obj in gc.get_objects():
+        kind = type(obj)
+        counts[f"{kind.__module__}.{kind.__qualname__}"] += 1
+    return counts
+
+
+def slope(points):
+    """(局数, 字节) 采样点的最小二乘斜率，即每局增长的字节数"""
+    if len(points) < 2:
+        return None
+    mean_x = sum(p[0] for p in points) / len(points)
+    mean_y = sum(p[1] for p in points) / len(points)
+    var = sum((p[0] - mean_x) ** 2 for p in points)
+    return sum((p[0] - mean_x) * (p[1] - mean_y) for p in points) / var if var else None
+
+
+def episodes(env, script):
+    """按脚本循环执行动作，每结束一局 yield 一次并重新 reset"""
+    start = dict(script['start'])
+    actions = list(run.expand_actions(script))  # 先展开，循环中不再分配
+    env.reset(**start)
+    while True:
+        for action_code in actions:
+            obs, done, info = env.step(action_code)
+            if done:
+                yield info
+                env.reset(**start)
+
+
+def measure(script, mode, count, warmup, sample_every, frames):
+    """跑 warmup + count 局，返回采样点和开始/结束时的快照"""
+    env, record_root = run.make_env(mode, fast_forward=script['fast_forward'])
+    played = episodes(env, script)
+    try:
+        for _ in range(warmup):
+            next(played)
+
+        # 采样列表预先分配好；快照里排除 tracemalloc 和这个文件自身的分配，只看游戏
+        samples = count // sample_every + 2
+        heap, rss = [None] * samples, [None] * samples
+        gc.collect()
+        types_before = type_counts()
+        tracemalloc.start(frames)
+        before = tracemalloc.take_snapshot()
+        heap[0], rss[0] = (0, tracemalloc.get_traced_memory()[0]), (0, current_rss())
+
+        taken = 1
+        for episode in range(1, count + 1):
+            next(played)
+            if episode % sample_every == 0 or episode == count:
+                gc.collect()
+                heap[taken], rss[taken] = \
+                    (episode, tracemalloc.get_traced_memory()[0]), (episode, current_rss())
+                taken += 1
+
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        before, after = before.filter_traces(ignore), after.filter_traces(ignore)
+        del heap[taken:], rss[taken:]
+        gc.collect()
+        types_after = type_counts()
+    finally:
+        if record_root:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                env.control.recorder.stop_recording()
+            shutil.rmtree(record_root, ignore_errors=True)
+
+    if rss[0][1] is None:
+        rss = []
+    return heap, rss, before, after, types_after - types_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多局运行的内存增长检查')
+    parser.add_argument('--script', default='deaths', help='动作脚本 (默认: deaths)')
+    parser.add_argument('--mode', default='logic', choices=run.MODES, help='运行模式 (默认: logic)')
+    parser.add_argument('--episodes', type=int, default=300, help='统计的局数 (默认: 300)')
+    parser.add_argument('--warmup', type=int, default=20, help='开始统计前先跑的局数 (默认: 20)')
+    parser.add_argument('--sample-every', type=int, default=10, help='每几局采样一次 (默认: 10)')
+    parser.add_argument('--frames', type=int, default=1,
+                        help='分配位置记录的调用栈深度，大于 1 时按调用栈列出 (默认: 1)')
+    parser.add_argument('--top', type=int, default=15, help='列出增长最多的几项 (默认: 15)')
+    parser.add_argument('--threshold', type=float, default=1.0,
+                        help='Python 堆每局允许增长的 KB 数 (默认: 1.0)')
+    parser.add_argument('--rss-threshold', type=float, help='RSS 每局允许增长的 KB 数 (默认不检查)')
+    parser.add_argument('--out', help='把结果保存为 JSON')
+
+    args = parser.parse_args()
+    scripts = run.discover_scripts([args.script])
+    if not scripts:
+        parser.error(f"在 {run.SCRIPTS_DIR} 下没有找到脚本 {args.script}")
+    if args.episodes < 1 or args.sample_every < 1:
+        parser.error("--episodes 和 --sample-every 至少为 1")
+
+    heap, rss, before, after, types = measure(scripts[0], args.mode, args.episodes, args.warmup,
+                                              args.sample_every, args.frames)
+    heap_growth = slope(heap)
+    rss_growth = slope(rss)
+
+    print(f"=== {args.script}/{args.mode}: 预热 {args.warmup} 局后统计 {args.episodes} 局 ===")
+    print(f"Python 堆: {heap[0][1] / 1024:.1f} KB -> {heap[-1][1] / 1024:.1f} KB，"
+          f"每局 {heap_growth / 1024:+.3f} KB")
+    if rss:
+        print(f"RSS:       {rss[0][1] / 1048576:.1f} MB -> {rss[-1][1] / 1048576:.1f} MB，"
+              f"每局 {rss_growth / 1024:+.3f} KB")
+
+    key_type = 'traceback' if args.frames > 1 else 'lineno'
+    sites = [stat for stat in after.compare_to(before, key_type) if stat.size_diff > 0]
+    print(f"\n每局留下的内存，按分配位置 (前 {args.top} 项):")
+    print(f"{'B/episode':>12}{'blocks/ep':>12}  site")
+    for stat in sites[:args.top]:
+        lines = stat.traceback.format()
+        print(f"{stat.size_diff / args.episodes:>12.1f}{stat.count_diff / args.episodes:>12.2f}"
+              f"  {lines[0].strip()}")
+        for line in lines[1:]:
+            print(f"{'':>26}{line.strip()}")
+
+    growing = types.most_common(args.top)
+    print(f"\n每局增加的对象，按类型 (前 {args.top} 项):")
+    print(f"{'objs/ep':>12}{'total':>10}  type")
+    for name, count in growing:
+        print(f"{count / args.episodes:>12.2f}{count:>10}  {name}")
+    if not growing:
+        print(f"{'':>12}{'':>10}  (没有)")
+
+    problems = []
+    if heap_growth is not None and heap_growth > args.threshold * 1024:
+        problems.append(f"Python 堆每局增长 {heap_growth / 1024:.3f} KB，超过 {args.threshold} KB")
+    if args.rss_threshold is not None and rss_growth is not None \
+            and rss_growth > args.rss_threshold * 1024:
+        problems.append(f"RSS 每局增长 {rss_growth / 1024:.3f} KB，超过 {args.rss_threshold} KB")
+
+    if args.out:
+        report = {
+            'script': args.script, 'mode': args.mode,
+            'episodes': args.episodes, 'warmup': args.warmup,
+            'heap_samples': heap, 'rss_samples': rss,
+            'heap_bytes_per_episode': heap_growth, 'rss_bytes_per_episode': rss_growth,
+            'sites': [{'site': stat.traceback.format(), 'size_diff': stat.size_diff,
+                       'count_diff': stat.count_diff} for stat in sites[:args.top]],
+            'types': dict(growing),
+            'problems': problems,
+        }
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n结果已保存到 {args.out}")
+
+    print()
+    for problem in problems:
+        print(f"❌ {problem}")
+    if not problems:
+        print("✅ 没有超过阈值的增长")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
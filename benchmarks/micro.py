@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+"""
+碰撞和绘制的微基准
+用法: python -m benchmarks.micro [--counts 1,2,4,...] [--routine NAME] [--fixed kind=N]
+                                 [--repeat N] [--out curves.json]
+
+真实关卡里同屏的敌人不到 20 个，自定义场景可能多得多。这里在刚开始的 Level1 中
+按给定数量在视口里随机放敌人、龟壳、火球、砖块和问号砖（populate），然后逐个
+计时 ROUTINES 中的碰撞函数和 blit_everything，得到每个函数随物体数量变化的曲线。
+
+每次计时前都用存档把世界恢复到放好物体时的状态（碰撞会杀死、移动物体），
+恢复和恢复后预热用的一遍绘制不计时；取 --repeat 次的中位数。最后对每条曲线
+数量较大的一半点在对数坐标下拟合斜率：1 左右是线性，明显大于 1（默认阈值
+--superlinear 1.3）的函数标为 ⚠️，数量一多就会先成为瓶颈。
+"""
+
+import gc
+import json
+import math
+import time
+import random
+import argparse
+import statistics
+
+import benchmarks  # noqa: F401  无头驱动
+
+KINDS = ('enemies', 'shells', 'fireballs', 'bricks', 'coin_boxes')
+DEFAULT_COUNTS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def each(sprites, function):
+    for sprite in list(sprites):
+        function(sprite)
+
+
+def enemy_x_pass(level):
+    from data import broadphase
+    enemies = level.enemy_group.sprites()
+    sweep = broadphase.SweepAndPrune(enemies)
+    for enemy in enemies:
+        level.check_enemy_x_collisions(enemy, sweep)
+
+
+def fireballs(level):
+    return [powerup for powerup in level.powerup_group if powerup.name == 'fireball']
+
+
+# 名字 -> 对 (level, surface) 跑一遍的函数；按物体逐个调用的检查函数跑完整个精灵组
+ROUTINES = {
+    'check_mario_x_collisions': lambda level, surface: level.check_mario_x_collisions(),
+    'check_mario_y_collisions': lambda level, surface: level.check_mario_y_collisions(),
+    'check_enemy_x_collisions': lambda level, surface: enemy_x_pass(level),
+    'check_enemy_y_collisions': lambda level, surface: each(
+        level.enemy_group, level.check_enemy_y_collisions),
+    'check_shell_x_collisions': lambda level, surface: each(
+        level.shell_group, level.check_shell_x_collisions),
+    'check_shell_y_collisions': lambda level, surface: each(
+        level.shell_group, level.check_shell_y_collisions),
+    'check_fireball_x_collisions': lambda level, surface: each(
+        fireballs(level), level.check_fireball_x_collisions),
+    'check_fireball_y_collisions': lambda level, surface: each(
+        fireballs(level), level.check_fireball_y_collisions),
+    'adjust_sprite_positions': lambda level, surface: level.adjust_sprite_positions(),
+    'blit_everything': lambda level, surface: level.blit_everything(surface),
+}
+
+
+def populate(level, counts, seed=0):
+    """在视口中随机放置 counts = {种类: 个数} 个物体"""
+    from data import constants as c
+    from data.components import enemies, powerups, bricks, coin_box
+
+    rng = random.Random(seed)
+    left = level.viewport.x + 50
+    right = level.viewport.x + level.viewport.width - 50
+
+    def x():
+        return rng.randrange(left, right)
+
+    def direction():
+        return rng.choice((c.LEFT, c.RIGHT))
+
+    for _ in range(counts.get('enemies', 0)):
+        kind = rng.choice((enemies.Goomba, enemies.Koopa))
+        enemy = kind(c.GROUND_HEIGHT, x(), direction())
+        level.enemy_group.add(enemy)
+        level.mario_and_enemy_group.add(enemy)
+    for _ in range(counts.get('shells', 0)):
+        shell = enemies.Koopa(c.GROUND_HEIGHT, x(), direction())
+        shell.jumped_on()
+        shell.state = c.SHELL_SLIDE
+        shell.shell_sliding()
+        level.shell_group.add(shell)
+    for _ in range(counts.get('fireballs', 0)):
+        level.powerup_group.add(powerups.FireBall(x(), rng.randrange(300, 500), rng.random() < 0.5))
+    for _ in range(counts.get('bricks', 0)):
+        level.brick_group.add(bricks.Brick(x(), rng.choice((193, 365))))
+    for _ in range(counts.get('coin_boxes', 0)):
+        level.coin_box_group.add(coin_box.Coin_box(x(), rng.choice((193, 365)), c.COIN,
+                                                   level.coin_group))
+
+
+def time_routine(env, state, routine, repeat):
+    """每次从 state 恢复后计时 routine 一次，返回中位数（秒）"""
+    from data import savestate
+
+    samples = []
+    enabled = gc.isenabled()
+    try:
+        for _ in range(repeat):
+            savestate.restore_level(env.level, state)
+            # 恢复时重建了背景画布，精灵也都是新对象；先不计时地画一遍，
+            # 否则第一次访问这些内存的开销会算进计时（绘制不改变游戏状态）
+            env.level.blit_everything(env.control.screen)
+            gc.collect()
+            gc.disable()  # 与 timeit 相同，计时期间不做垃圾回收
+            started = time.perf_counter()
+            routine(env.level, env.control.screen)
+            samples.append(time.perf_counter() - started)
+            gc.enable()
+    finally:
+        if enabled:
+            gc.enable()
+    return statistics.median(samples)
+
+
+def scaling_exponent(counts, seconds):
+    """log(时间) 对 log(数量) 的最小二乘斜率
+
+    只用数量较大的一半点：数量少时每遍的固定开销占主导，会把斜率拉低。
+    """
+    points = sorted((math.log(n), math.log(t)) for n, t in zip(counts, seconds) if n > 0 and t > 0)
+    points = points[(len(points) - 1) // 2:]
+    if len(points) < 2:
+        return None
+    mean_x = sum(p[0] for p in points) / len(points)
+    mean_y = sum(p[1] for p in points) / len(points)
+    var = sum((p[0] - mean_x) ** 2 for p in points)
+    if not var:
+        return None
+    return sum((p[0] - mean_x) * (p[1] - mean_y) for p in points) / var
+
+
+def run(counts, routines, fixed, repeat, seed):
+    """返回 {函数名: [每个数量的中位数耗时（秒）, ...]}"""
+    from data import savestate
+    from data.env import MarioEnv
+
+    env = MarioEnv(render=True)
+    curves = {name: [] for name in routines}
+    for n in counts:
+        env.reset()
+        populate(env.level, dict({kind: n for kind in KINDS}, **fixed), seed)
+        state = savestate.load_snapshot(savestate.snapshot(env.level, env.control.current_time, 0))
+        for name in routines:
+            curves[name].append(time_routine(env, state, ROUTINES[name], repeat))
+    return curves
+
+
+def parse_fixed(values):
+    fixed = {}
+    for value in values or []:
+        kind, _, count = value.partition('=')
+        if kind not in KINDS or not count.isdigit():
+            raise argparse.ArgumentTypeError(f"--fixed 应为 种类=个数，种类是 {', '.join(KINDS)}")
+        fixed[kind] = int(count)
+    return fixed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='碰撞和绘制函数随物体数量变化的微基准')
+    parser.add_argument('--counts', default=','.join(map(str, DEFAULT_COUNTS)),
+                        help='每种物体的数量，逗号分隔 (默认: 1,2,4,...,256)')
+    parser.add_argument('--routine', action='append', choices=sorted(ROUTINES),
+                        help='只测这些函数（可多次指定，默认全部）')
+    parser.add_argument('--fixed', action='append', metavar='KIND=N',
+                        help=f"某种物体固定为 N 个，不随 --counts 变化（{', '.join(KINDS)}）")
+    parser.add_argument('--repeat', type=int, default=15, help='每个点计时几次取中位数 (默认: 15)')
+    parser.add_argument('--seed', type=int, default=0, help='放置物体的随机种子')
+    parser.add_argument('--superlinear', type=float, default=1.3,
+                        help='斜率超过这个值时标记为超线性 (默认: 1.3)')
+    parser.add_argument('--out', help='把曲线保存为 JSON')
+
+    args = parser.parse_args()
+    counts = [int(n) for n in args.counts.split(',') if n.strip()]
+    routines = args.routine or list(ROUTINES)
+    try:
+        fixed = parse_fixed(args.fixed)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    curves = run(counts, routines, fixed, args.repeat, args.seed)
+
+    print(f"每遍耗时 (微秒)，物体数量: {', '.join(map(str, counts))}"
+          + (f"，固定: {fixed}" if fixed else ''))
+    print(f"{'routine':<30}" + "".join(f"{n:>10}" for n in counts) + f"{'slope':>8}")
+    print("=" * (38 + 10 * len(counts)))
+    slopes = {}
+    for name in routines:
+        slope = slopes[name] = scaling_exponent(counts, curves[name])
+        mark = ' ⚠️' if slope is not None and slope > args.superlinear else ''
+        print(f"{name:<30}" + "".join(f"{t * 1e6:>10.1f}" for t in curves[name])
+              + (f"{slope:>8.2f}" if slope is not None else f"{'-':>8}") + mark)
+
+    if args.out:
+        report = {'counts': counts, 'fixed': fixed, 'repeat': args.repeat, 'seed': args.seed,
+                  'seconds': curves, 'slopes': slopes}
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n结果已保存到 {args.out}")
+
+
+if __name__ == '__main__':
+    main()
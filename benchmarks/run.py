@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+"""
+固定动作脚本的无头基准
+用法: python -m benchmarks.run [--script NAME] [--mode MODE] [--repeat N]
+                               [--out results.json] [--baseline baseline.json]
+
+benchmarks/scripts/ 下每个 JSON 是一段固定的动作编码序列（见 load_script），
+按三种模式运行：
+
+    logic    只跑游戏逻辑，不绘制 (MarioEnv(render=False))
+    render   逻辑 + 每步绘制画面
+    record   逻辑 + 绘制 + Recorder 录制（写到临时目录，结束时删除；计时包括
+             结束时等保存线程写完）
+
+每个 (脚本, 模式) 在单独的子进程里运行，峰值内存（ru_maxrss）互不影响；重复
+--repeat 次取中位数。游戏按固定时间步运行，同一脚本的结果（步数、死亡次数、
+过关次数、分数）每次都一样，与脚本中的 expect 不符时说明游戏行为变了，
+这时的速度不能和基线比较。
+
+--baseline 与之前 --out 保存的结果比较：步数/秒低于基线超过 --tolerance，或峰值
+内存高于基线超过 --memory-tolerance 时记为退化，退出码为 1。
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import glob
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import contextlib
+import multiprocessing
+
+import benchmarks  # noqa: F401  无头驱动
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts')
+MODES = ('logic', 'render', 'record')
+OUTCOME_KEYS = ('steps', 'episodes', 'deaths', 'completions', 'score')
+
+
+def load_script(path):
+    """读取动作脚本
+
+    {"description": "...",
+     "start": {"power": "small", "start_x": null},   # 可选，见 MarioEnv.reset
+     "fast_forward": true,                           # 可选，见 MarioEnv；false 时完整
+                                                     # 运行旗杆、城堡和倒计时
+     "actions": [[动作编码, 步数], ...],
+     "repeat": 1,                                    # actions 整体重复的次数
+     "expect": {"steps": ..., "episodes": ..., ...}} # 固定的运行结果
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        script = json.load(f)
+    script['name'] = os.path.splitext(os.path.basename(path))[0]
+    script['path'] = path
+    script.setdefault('start', {})
+    script.setdefault('fast_forward', True)
+    script.setdefault('repeat', 1)
+    script.setdefault('expect', {})
+    return script
+
+
+def save_script(script):
+    """写回脚本文件，动作每对一行"""
+    data = dict((key, script[key])
+                for key in ('description', 'start', 'fast_forward', 'actions', 'repeat', 'expect'))
+    text = json.dumps(data, indent=2, ensure_ascii=False)
+    text = re.sub(r'\[\s+(\d+),\s+(\d+)\s+\]', r'[\1, \2]', text)
+    with open(script['path'], 'w', encoding='utf-8') as f:
+        f.write(text + '\n')
+
+
+def discover_scripts(names=None):
+    scripts = [load_script(path) for path in sorted(glob.glob(os.path.join(SCRIPTS_DIR, '*.json')))]
+    if names:
+        scripts = [script for script in scripts if script['name'] in names]
+    return scripts
+
+
+def expand_actions(script):
+    """逐步的动作编码"""
+    for _ in range(script['repeat']):
+        for action_code, count in script['actions']:
+            for _ in range(count):
+                yield action_code
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位是 KB，macOS 上是字节
+    return peak / (1024.0 * 1024.0 if sys.platform == 'darwin' else 1024.0)
+
+
+def make_env(mode, record_format='chunk', record_quality='low', fast_forward=True):
+    """按模式创建 MarioEnv；record 模式时返回的第二项是录制用的临时目录，否则为 None"""
+    from data.env import MarioEnv
+    from data.recorder import Recorder
+
+    env = MarioEnv(render=mode != 'logic', fast_forward=fast_forward)
+    record_root = None
+    if mode == 'record':
+        record_root = tempfile.mkdtemp(prefix='mario_bench_')
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            recorder = Recorder(True, 1, record_quality, record_format, root=record_root)
+            recorder.start_recording()
+        env.control.recorder = recorder
+    return env, record_root
+
+
+def run_case(script, mode, record_format='chunk', record_quality='low'):
+    """在当前进程中运行一个 (脚本, 模式)，返回计时、峰值内存和运行结果"""
+    start = dict(script['start'])
+    started = time.perf_counter()
+    env, record_root = make_env(mode, record_format, record_quality, script['fast_forward'])
+    env.reset(**start)
+    setup_seconds = time.perf_counter() - started
+
+    outcome = dict.fromkeys(OUTCOME_KEYS, 0)
+    started = time.perf_counter()
+    for action_code in expand_actions(script):
+        obs, done, info = env.step(action_code)
+        outcome['steps'] += 1
+        if done:
+            outcome['episodes'] += 1
+            outcome['deaths'] += int(info['mario_dead'])
+            outcome['completions'] += int(info['level_complete'])
+            outcome['score'] += info['score']
+            env.reset(**start)
+    if mode == 'record':
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            env.control.recorder.stop_recording()
+    seconds = time.perf_counter() - started
+
+    if record_root:
+        shutil.rmtree(record_root, ignore_errors=True)
+    return {
+        'seconds': seconds,
+        'setup_seconds': setup_seconds,
+        'steps_per_second': outcome['steps'] / seconds if seconds else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+        'outcome': outcome,
+    }
+
+
+def _run_case_in_child(connection, args):
+    connection.send(run_case(*args))
+    connection.close()
+
+
+def run_isolated(script, mode, record_format, record_quality):
+    """在新的子进程中运行，避免前面的用例影响峰值内存和缓存"""
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_run_case_in_child,
+                              args=(sender, (script, mode, record_format, record_quality)))
+    process.start()
+    sender.close()
+    try:
+        return receiver.recv()
+    except EOFError:
+        raise RuntimeError(f"{script['name']}/{mode} 的子进程异常退出 (exitcode={process.exitcode})")
+    finally:
+        process.join()
+
+
+def summarize(runs):
+    """多次运行取中位数"""
+    first = runs[0]
+    peaks = [run['peak_rss_mb'] for run in runs if run['peak_rss_mb'] is not None]
+    return {
+        'runs': len(runs),
+        'steps_per_second': statistics.median(run['steps_per_second'] for run in runs),
+        'seconds': statistics.median(run['seconds'] for run in runs),
+        'setup_seconds': statistics.median(run['setup_seconds'] for run in runs),
+        'peak_rss_mb': statistics.median(peaks) if peaks else None,
+        'outcome': first['outcome'],
+        'deterministic': all(run['outcome'] == first['outcome'] for run in runs),
+    }
+
+
+def golden_problems(script, result):
+    """运行结果与脚本中 expect 不符的项"""
+    outcome = result['outcome']
+    problems = [f"{key}: 期望 {value}, 实际 {outcome.get(key)}"
+                for key, value in script['expect'].items() if outcome.get(key) != value]
+    if not result['deterministic']:
+        problems.append("多次运行的结果不一致")
+    return problems
+
+
+def compare(results, baseline, tolerance, memory_tolerance):
+    """与基线比较，返回 {用例: [退化说明, ...]}"""
+    regressions = {}
+    for case, result in results.items():
+        base = baseline.get('results', {}).get(case)
+        if base is None:
+            continue
+        problems = []
+        if result['outcome'] != base['outcome']:
+            problems.append("运行结果与基线不同，速度不可比")
+        elif result['steps_per_second'] < base['steps_per_second'] * (1 - tolerance):
+            change = result['steps_per_second'] / base['steps_per_second'] - 1
+            problems.append(f"步数/秒 {change:+.1%}")
+        if result['peak_rss_mb'] and base.get('peak_rss_mb') \
+                and result['peak_rss_mb'] > base['peak_rss_mb'] * (1 + memory_tolerance):
+            change = result['peak_rss_mb'] / base['peak_rss_mb'] - 1
+            problems.append(f"峰值内存 {change:+.1%}")
+        if problems:
+            regressions[case] = problems
+    return regressions
+
+
+def environment_info():
+    import numpy as np
+    import pygame as pg
+    return {
+        'python': platform.python_version(),
+        'pygame': pg.version.ver,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='固定动作脚本的无头性能基准')
+    parser.add_argument('--script', action='append', help='只运行这些脚本（可多次指定，默认全部）')
+    parser.add_argument('--mode', action='append', choices=MODES, help='只运行这些模式（默认全部）')
+    parser.add_argument('--repeat', type=int, default=3, help='每个用例运行几次，取中位数 (默认: 3)')
+    parser.add_argument('--record-format', default='chunk', choices=['png', 'chunk'],
+                        help='record 模式的存储格式 (默认: chunk)')
+    parser.add_argument('--record-quality', default='low', choices=['low', 'medium', 'high'],
+                        help='record 模式的图片质量 (默认: low)')
+    parser.add_argument('--out', help='把结果保存为 JSON')
+    parser.add_argument('--baseline', help='与之前保存的结果比较')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='步数/秒允许比基线低的比例 (默认: 0.10)')
+    parser.add_argument('--memory-tolerance', type=float, default=0.10,
+                        help='峰值内存允许比基线高的比例 (默认: 0.10)')
+    parser.add_argument('--write-expect', action='store_true',
+                        help='把这次的运行结果写回脚本的 expect（修改了游戏行为之后）')
+
+    args = parser.parse_args()
+
+    scripts = discover_scripts(args.script)
+    if not scripts:
+        print(f"错误: 在 {SCRIPTS_DIR} 下没有找到动作脚本")
+        sys.exit(1)
+    modes = args.mode or list(MODES)
+
+    results = {}
+    failed = False
+    print(f"{'case':<26}{'steps/s':>12}{'peak MB':>12}{'steps':>8}{'deaths':>8}{'clears':>8}")
+    print("=" * 74)
+    for script in scripts:
+        for mode in modes:
+            case = f"{script['name']}/{mode}"
+            runs = [run_isolated(script, mode, args.record_format, args.record_quality)
+                    for _ in range(args.repeat)]
+            result = results[case] = summarize(runs)
+            outcome = result['outcome']
+            peak = f"{result['peak_rss_mb']:.1f}" if result['peak_rss_mb'] is not None else '-'
+            print(f"{case:<26}{result['steps_per_second']:>12.1f}{peak:>12}"
+                  f"{outcome['steps']:>8}{outcome['deaths']:>8}{outcome['completions']:>8}")
+            problems = golden_problems(script, result)
+            if problems and not args.write_expect:
+                failed = True
+                print(f"  ❌ 与 {os.path.basename(script['path'])} 的 expect 不符: {'; '.join(problems)}")
+        if args.write_expect:
+            script['expect'] = results[f"{script['name']}/{modes[0]}"]['outcome']
+            save_script(script)
+            print(f"  已更新 {os.path.basename(script['path'])} 的 expect")
+
+    report = {'environment': environment_info(), 'repeat': args.repeat, 'results': results}
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n结果已保存到 {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.memory_tolerance)
+        print(f"\n与基线 {args.baseline} 比较:")
+        for case, result in results.items():
+            base = baseline.get('results', {}).get(case)
+            if base is None:
+                print(f"  {case}: 基线中没有")
+                continue
+            change = result['steps_per_second'] / base['steps_per_second'] - 1
+            mark = '❌ ' + '; '.join(regressions[case]) if case in regressions else '✅'
+            print(f"  {case}: 步数/秒 {change:+.1%} {mark}")
+        failed = failed or bool(regressions)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
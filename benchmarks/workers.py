@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""
+worker 启动时间和内存：spawn 与预加载的 fork server 对比
+用法: python -m benchmarks.workers [--workers N] [--steps N] [--start-method METHOD]
+
+按每种启动方式同时启动 --workers 个 worker（data.workers.start_workers），每个
+worker 创建 MarioEnv、跑 --steps 步后报告就绪。全部就绪后各自读取
+/proc/self/smaps_rollup 报告内存，此时所有 worker 都还活着，共享的页面按进程数
+分摊：
+
+    ready       从开始启动到该 worker 就绪的时间（取全部 worker 的平均和最大值）
+    RSS         常驻内存，共享页面每个进程都算一次
+    PSS         共享页面按共享的进程数分摊后的内存，所有进程相加就是实际占用
+    USS         只属于这个进程的内存（Private_Clean + Private_Dirty）
+
+fork server 模板进程加载素材的时间单独列出（每台机器只付一次），不算在 worker
+的启动时间里。只支持 Linux。
+"""
+
+import sys
+import time
+import argparse
+import multiprocessing.connection
+
+import benchmarks  # noqa: F401  无头驱动
+
+METHODS = ('spawn', 'forkserver')
+MEMORY_KEYS = ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty')
+
+
+def memory_usage():
+    """{Rss, Pss, Uss}，单位 MB"""
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in MEMORY_KEYS:
+                values[key] = int(rest.split()[0]) / 1024.0
+    return {'Rss': values['Rss'], 'Pss': values['Pss'],
+            'Uss': values['Private_Clean'] + values['Private_Dirty']}
+
+
+def worker(connection, steps):
+    """创建环境、跑 steps 步后报告就绪，收到请求后报告内存，再等待退出"""
+    from data.env import MarioEnv
+
+    env = MarioEnv(render=True)
+    env.reset()
+    for _ in range(steps):
+        obs, done, info = env.step(2)
+        if done:
+            env.reset()
+    connection.send('ready')
+    connection.recv()
+    connection.send(memory_usage())
+    connection.recv()
+    connection.close()
+
+
+def measure(method, count, steps):
+    """按一种启动方式启动 count 个 worker，返回启动时间和内存"""
+    from data import workers
+
+    preload = method == 'forkserver'
+    template_seconds = None
+    if preload:
+        started = time.perf_counter()
+        workers.start_template()
+        template_seconds = time.perf_counter() - started
+
+    pipes = [multiprocessing.Pipe() for _ in range(count)]
+    started = time.perf_counter()
+    processes = workers.start_workers(worker, [(child, steps) for parent, child in pipes],
+                                      preload=preload)
+    for parent, child in pipes:
+        child.close()
+
+    ready = []
+    waiting = [parent for parent, child in pipes]
+    while waiting:
+        for connection in multiprocessing.connection.wait(waiting):
+            connection.recv()
+            ready.append(time.perf_counter() - started)
+            waiting.remove(connection)
+
+    for parent, child in pipes:
+        parent.send('measure')
+    memory = [parent.recv() for parent, child in pipes]
+    for parent, child in pipes:
+        parent.send('exit')
+    for process in processes:
+        process.join()
+
+    def mean(key):
+        return sum(m[key] for m in memory) / count
+
+    return {
+        'workers': count,
+        'template_seconds': template_seconds,
+        'ready_mean': sum(ready) / count,
+        'ready_max': max(ready),
+        'rss_mb': mean('Rss'),
+        'pss_mb': mean('Pss'),
+        'uss_mb': mean('Uss'),
+        'total_pss_mb': sum(m['Pss'] for m in memory),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='worker 启动时间和内存：spawn 与 fork server 对比')
+    parser.add_argument('--workers', type=int, default=8, help='同时启动的 worker 数 (默认: 8)')
+    parser.add_argument('--steps', type=int, default=100, help='每个 worker 就绪前跑的步数 (默认: 100)')
+    parser.add_argument('--start-method', action='append', choices=METHODS,
+                        help='只测这些启动方式（默认全部）')
+
+    args = parser.parse_args()
+    if not sys.platform.startswith('linux'):
+        parser.error("需要 /proc/self/smaps_rollup，只支持 Linux")
+
+    print(f"{args.workers} 个 worker，每个跑 {args.steps} 步后就绪；内存为每个 worker 的平均值 (MB)")
+    print(f"{'method':<12}{'template s':>12}{'ready s':>10}{'max s':>10}"
+          f"{'RSS':>9}{'PSS':>9}{'USS':>9}{'total PSS':>12}")
+    print("=" * 83)
+    for method in args.start_method or METHODS:
+        result = measure(method, args.workers, args.steps)
+        template = f"{result['template_seconds']:.2f}" if result['template_seconds'] is not None else '-'
+        print(f"{method:<12}{template:>12}{result['ready_mean']:>10.2f}{result['ready_max']:>10.2f}"
+              f"{result['rss_mb']:>9.1f}{result['pss_mb']:>9.1f}{result['uss_mb']:>9.1f}"
+              f"{result['total_pss_mb']:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
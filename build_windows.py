@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+"""
+连续帧窗口索引生成工具
+用法: python build_windows.py --length 8 [--root recordings] [--out recordings/windows_8.npz]
+"""
+
+import os
+import argparse
+
+from data.recording_io import discover_recordings
+from data.windows import build_window_index, save_window_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成世界模型训练用的连续帧窗口索引')
+    parser.add_argument('--length', '-k', type=int, required=True, help='窗口长度 (帧数)')
+    parser.add_argument('--root', default='recordings', help='录制根目录 (默认: recordings)')
+    parser.add_argument('--out', help='输出路径 (默认: <root>/windows_<length>.npz)')
+
+    args = parser.parse_args()
+    if args.length <= 0:
+        parser.error('--length 必须大于0')
+    out_path = args.out or os.path.join(args.root, f"windows_{args.length}.npz")
+
+    recording_dirs = discover_recordings(args.root)
+    if not recording_dirs:
+        print(f"错误: 在 {args.root} 下没有找到录制目录")
+        return
+
+    print(f"扫描 {len(recording_dirs)} 个录制目录, 窗口长度 {args.length}...")
+    index = build_window_index(recording_dirs, args.length)
+    save_window_index(out_path, index)
+
+    state_names = index['state_names']
+    offsets = index['strata_offsets']
+    print(f"共 {index['start_row'].size} 个合法窗口, {offsets.size - 1} 个 (动作, 状态) 分组")
+    for k, (action, state) in enumerate(zip(index['strata_action'], index['strata_state'])):
+        print(f"  action={action:2d} state={state_names[state]:<12s} {offsets[k + 1] - offsets[k]} 个窗口")
+    print(f"索引已保存到: {out_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""
+PNG录制转换工具: 把旧的 PNG 帧录制转换成分块存储格式 (chunks/*.npy)
+用法: python convert_recordings.py [--root recordings] [--workers N] [--delete-png]
+
+转换按录制目录在进程池中并行进行。中断后重新运行同一命令即可继续，
+已经写好的完整块不会重新解码；已转换完成的录制会被跳过。
+"""
+
+import os
+import sys
+import shutil
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pygame as pg
+
+from data import frame_store
+from data import manifest
+from data.recording_io import RecordingReader, discover_recordings, write_recording_data
+
+
+def convert_recording(recording_dir, delete_png=False):
+    """转换一个录制目录，返回转换报告"""
+    report = {
+        'recording_dir': recording_dir,
+        'status': 'pending',
+        'total_frames': None,
+        'json_frames': 0,
+        'converted': 0,
+        'missing': [],
+        'error': None,
+    }
+
+    if frame_store.has_store(recording_dir):
+        report['status'] = 'done'
+        return report
+
+    json_path = os.path.join(recording_dir, "recording_data.json")
+    frames_dir = os.path.join(recording_dir, "frames")
+    if not os.path.exists(json_path):
+        report['status'] = 'error'
+        report['error'] = '找不到 recording_data.json'
+        return report
+
+    # 第一遍：确定哪些帧有图片，分配帧序号
+    reader = RecordingReader(json_path)
+    offsets = {}
+    sources = []
+    for frame_info in reader:
+        filename = frame_info.get('frame_filename')
+        if filename is None:
+            continue
+        if os.path.exists(os.path.join(frames_dir, filename)):
+            offsets[frame_info['frame_id']] = len(sources)
+            sources.append(filename)
+        else:
+            report['missing'].append(frame_info['frame_id'])
+
+    recording_info = dict(reader.recording_info or {})
+    report['total_frames'] = recording_info.get('total_frames')
+    report['json_frames'] = reader.frame_count
+
+    # 解码并写入块，已经写好的完整块跳过
+    writer = frame_store.ChunkWriter(os.path.join(recording_dir, frame_store.STORE_DIRNAME))
+    try:
+        for filename in sources[writer.resume():]:
+            surface = pg.image.load(os.path.join(frames_dir, filename))
+            writer.append(frame_store.surface_to_array(surface))
+    except (pg.error, ValueError) as e:
+        report['status'] = 'error'
+        report['error'] = f'解码失败: {e}'
+        return report
+    report['converted'] = len(sources)
+
+    # 在JSON中记录帧序号，最后写 store.json 标记转换完成
+    def with_offsets():
+        for frame_info in RecordingReader(json_path):
+            if frame_info['frame_id'] in offsets:
+                frame_info['frame_offset'] = offsets[frame_info['frame_id']]
+            yield frame_info
+
+    recording_info['frame_storage'] = 'chunk'
+    tmp_path = json_path + '.tmp'
+    write_recording_data(tmp_path, recording_info, with_offsets())
+    os.replace(tmp_path, json_path)
+    writer.close()
+
+    if delete_png and not report['missing']:
+        shutil.rmtree(frames_dir)
+
+    # 更新完整性清单：块文件是新加的，JSON 已改写，PNG 可能已删除
+    if manifest.load_manifest(recording_dir) is None:
+        manifest.write_manifest(recording_dir)
+    else:
+        changed = ["recording_data.json"] + [
+            name for name in manifest.data_files(recording_dir)
+            if name.startswith(frame_store.STORE_DIRNAME + '/')]
+        if delete_png and not report['missing']:
+            changed += [f"frames/{filename}" for filename in sources]
+        manifest.update_manifest(recording_dir, changed=changed)
+
+    report['status'] = 'converted'
+    return report
+
+
+def print_report(report):
+    recording_dir = report['recording_dir']
+    if report['status'] == 'done':
+        print(f"跳过 (已转换): {recording_dir}")
+        return True
+    if report['status'] == 'error':
+        print(f"❌ {recording_dir}: {report['error']}")
+        return False
+
+    ok = True
+    print(f"✅ {recording_dir}: {report['converted']} 帧已转换")
+    if report['total_frames'] is not None and report['total_frames'] != report['json_frames']:
+        print(f"  ⚠️ 帧数不一致: recording_info.total_frames={report['total_frames']}, "
+              f"JSON中实际 {report['json_frames']} 帧")
+        ok = False
+    if report['missing']:
+        missing = report['missing']
+        preview = ', '.join(str(frame_id) for frame_id in missing[:10])
+        print(f"  ⚠️ 缺少 {len(missing)} 张图片, 帧ID: {preview}{' ...' if len(missing) > 10 else ''}")
+        ok = False
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='把PNG录制转换成分块存储格式')
+    parser.add_argument('--root', default='recordings', help='录制根目录 (默认: recordings)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='并行进程数')
+    parser.add_argument('--delete-png', action='store_true',
+                        help='转换成功且没有缺失帧时删除 frames/ 目录')
+
+    args = parser.parse_args()
+
+    recording_dirs = discover_recordings(args.root)
+    if not recording_dirs:
+        print(f"错误: 在 {args.root} 下没有找到录制目录")
+        sys.exit(1)
+
+    print(f"找到 {len(recording_dirs)} 个录制目录")
+    print("=" * 50)
+
+    all_ok = True
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(convert_recording, d, args.delete_png) for d in recording_dirs]
+        for future in as_completed(futures):
+            all_ok = print_report(future.result()) and all_ok
+
+    sys.exit(0 if all_ok else 1)
+
+
+if __name__ == '__main__':
+    main()
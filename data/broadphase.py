@@ -0,0 +1,63 @@
+"""
+敌人之间碰撞的 sweep-and-prune 粗筛。
+
+SweepAndPrune 按 rect.left 排序保存一帧开始时的所有敌人，查询时只检查 x 区间
+可能重叠的几个，不需要把敌人移出精灵组再逐个比较。
+
+结果与原来的 kill() + spritecollideany(enemy, enemy_group) + add() 完全一致：
+处理第 k 个敌人时，精灵组的遍历顺序是它后面还没处理的敌人，接着是已经处理过
+（被移到末尾）的敌人，所以多个敌人同时重叠时取这个轮转顺序中的第一个。
+"""
+
+__author__ = 'justinarmstrong'
+
+import bisect
+
+
+class SweepAndPrune(object):
+    """一帧内的敌人粗筛，sprites 为这一帧遍历精灵组的顺序"""
+    def __init__(self, sprites):
+        self.sprites = list(sprites)
+        self.index = {sprite: i for i, sprite in enumerate(self.sprites)}
+        self.max_width = max([sprite.rect.width for sprite in self.sprites] or [0])
+        self.entries = sorted((sprite.rect.left, i) for i, sprite in enumerate(self.sprites))
+        self.lefts = {i: left for left, i in self.entries}
+
+
+    def move(self, sprite):
+        """sprite 的 rect.left 改变之后更新排序"""
+        i = self.index[sprite]
+        left = sprite.rect.left
+        if left != self.lefts[i]:
+            self.remove(sprite)
+            self.max_width = max(self.max_width, sprite.rect.width)
+            bisect.insort(self.entries, (left, i))
+            self.lefts[i] = left
+
+
+    def remove(self, sprite):
+        """sprite 离开精灵组（被打死、掉出画面）"""
+        i = self.index[sprite]
+        left = self.lefts.pop(i, None)
+        if left is not None:
+            del self.entries[bisect.bisect_left(self.entries, (left, i))]
+
+
+    def first_collision(self, sprite):
+        """与 sprite 的 rect 重叠的其它敌人中，按轮转顺序的第一个；没有时返回 None"""
+        k = self.index[sprite]
+        n = len(self.sprites)
+        rect = sprite.rect
+        start = bisect.bisect_left(self.entries, (rect.left - self.max_width, -1))
+        best = None
+        best_rank = n
+        for left, i in self.entries[start:]:
+            if left >= rect.right:
+                break
+            if i == k:
+                continue
+            rank = (i - k) % n
+            if rank < best_rank and rect.colliderect(self.sprites[i].rect):
+                best = self.sprites[i]
+                best_rank = rank
+        return best
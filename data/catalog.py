@@ -0,0 +1,251 @@
+"""
+录制帧的 SQLite 索引。
+
+把所有录制目录的 recording_data.json / statistics.json 汇总到一个数据库里，
+训练时可以直接用 SQL 抽样，例如“死亡前30帧内、动作为14的所有帧”，
+不需要逐个读取上千个 JSON 文件。索引按 JSON 文件的修改时间和大小增量更新。
+"""
+
+__author__ = 'justinarmstrong'
+
+import os
+import json
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+from . import labels
+from .recording_io import RecordingReader, discover_recordings
+
+CATALOG_FILENAME = "catalog.sqlite"
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    recording_id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    json_mtime_ns INTEGER NOT NULL,
+    json_size INTEGER NOT NULL,
+    user_name TEXT,
+    total_frames INTEGER,
+    duration REAL,
+    recording_time TEXT,
+    truncated INTEGER NOT NULL DEFAULT 0,
+    action_statistics TEXT,
+    state_statistics TEXT
+);
+
+CREATE TABLE IF NOT EXISTS frames (
+    recording_id INTEGER NOT NULL REFERENCES recordings(recording_id),
+    frame_id INTEGER NOT NULL,
+    timestamp REAL,
+    action_code INTEGER NOT NULL,
+    mario_state TEXT NOT NULL,
+    mario_dead INTEGER NOT NULL,
+    nt INTEGER NOT NULL,
+    life_id INTEGER NOT NULL,
+    episode_id INTEGER NOT NULL,
+    frames_to_death INTEGER,
+    frame_file TEXT,
+    frame_offset INTEGER,
+    PRIMARY KEY (recording_id, frame_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_frames_action ON frames(action_code, frames_to_death);
+CREATE INDEX IF NOT EXISTS idx_frames_state ON frames(mario_state, action_code);
+CREATE INDEX IF NOT EXISTS idx_frames_death ON frames(frames_to_death);
+"""
+
+
+def _load_statistics(recording_dir):
+    """读取 statistics.json，不存在或损坏时返回 None"""
+    stats_path = os.path.join(recording_dir, "statistics.json")
+    try:
+        with open(stats_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def scan_recording(recording_dir):
+    """在工作进程中解析一个录制目录，返回写入数据库所需的行
+
+    帧行按 frames 表的列顺序排列。PNG 存储的帧 frame_file 为图片路径，
+    分块存储的帧 frame_offset 为帧序号。
+    """
+    json_path = os.path.join(recording_dir, "recording_data.json")
+    stat = os.stat(json_path)
+
+    recording_info = RecordingReader(json_path).read_header() or {}
+    columns = labels.load_recording_columns(recording_dir)
+    frame_labels = labels.label_columns(columns)
+    stats = _load_statistics(recording_dir) or {}
+
+    state_names = columns['state_names'].tolist()
+    to_death = frame_labels['frames_to_death'].tolist()
+    frame_files = [os.path.join('frames', name) if name else None
+                   for name in columns['frame_filename'].tolist()]
+
+    frames = list(zip(columns['frame_id'].tolist(),
+                      columns['timestamp'].tolist(),
+                      columns['action_code'].tolist(),
+                      [state_names[i] for i in columns['state_id'].tolist()],
+                      columns['mario_dead'].astype(int).tolist(),
+                      frame_labels['nt'].tolist(),
+                      frame_labels['life_id'].tolist(),
+                      frame_labels['episode_id'].tolist(),
+                      [d if d >= 0 else None for d in to_death],
+                      frame_files,
+                      [o if o >= 0 else None for o in columns['frame_offset'].tolist()]))
+
+    recording = {
+        'path': recording_dir,
+        'json_mtime_ns': stat.st_mtime_ns,
+        'json_size': stat.st_size,
+        'user_name': recording_info.get('user_name'),
+        'total_frames': recording_info.get('total_frames'),
+        'duration': recording_info.get('duration'),
+        'recording_time': recording_info.get('recording_time'),
+        'truncated': int(columns['truncated']),
+        'action_statistics': json.dumps(stats.get('action_statistics')),
+        'state_statistics': json.dumps(stats.get('state_statistics'), ensure_ascii=False),
+    }
+    return recording, frames
+
+
+class Catalog(object):
+    """录制帧索引数据库"""
+    def __init__(self, db_path=os.path.join("recordings", CATALOG_FILENAME)):
+        self.db_path = db_path
+        self.base_dir = os.path.dirname(os.path.abspath(db_path))
+        self.connection = sqlite3.connect(db_path)
+        self.connection.row_factory = sqlite3.Row
+
+        # 表结构变化后重建索引
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self.connection.executescript(
+                "DROP TABLE IF EXISTS frames; DROP TABLE IF EXISTS recordings;")
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.connection.executescript(SCHEMA)
+
+
+    def key(self, recording_dir):
+        """数据库中保存的录制目录路径（相对于数据库所在目录）"""
+        return os.path.relpath(os.path.abspath(recording_dir), self.base_dir)
+
+
+    def close(self):
+        self.connection.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def stale_recordings(self, recording_dirs):
+        """返回需要重新索引的录制目录（新增的，或 JSON 有变化的）"""
+        indexed = {row['path']: (row['json_mtime_ns'], row['json_size'])
+                   for row in self.connection.execute(
+                       "SELECT path, json_mtime_ns, json_size FROM recordings")}
+        stale = []
+        for recording_dir in recording_dirs:
+            json_path = os.path.join(recording_dir, "recording_data.json")
+            if not os.path.exists(json_path):
+                continue
+            stat = os.stat(json_path)
+            if indexed.get(self.key(recording_dir)) != (stat.st_mtime_ns, stat.st_size):
+                stale.append(recording_dir)
+        return stale
+
+
+    def remove_missing(self, recording_dirs):
+        """删除已经不存在的录制目录，返回删除的数量"""
+        present = set(self.key(d) for d in recording_dirs)
+        missing = [(row['recording_id'],) for row in self.connection.execute(
+                       "SELECT recording_id, path FROM recordings")
+                   if row['path'] not in present]
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM frames WHERE recording_id = ?", missing)
+            self.connection.executemany(
+                "DELETE FROM recordings WHERE recording_id = ?", missing)
+        return len(missing)
+
+
+    def store(self, recording, frames):
+        """写入（或替换）一个录制目录的所有帧，整个目录在一个事务中完成"""
+        recording = dict(recording, path=self.key(recording['path']))
+        with self.connection:
+            row = self.connection.execute(
+                "SELECT recording_id FROM recordings WHERE path = ?",
+                (recording['path'],)).fetchone()
+            if row is not None:
+                recording_id = row['recording_id']
+                self.connection.execute(
+                    "DELETE FROM frames WHERE recording_id = ?", (recording_id,))
+                self.connection.execute(
+                    "UPDATE recordings SET json_mtime_ns = :json_mtime_ns, "
+                    "json_size = :json_size, user_name = :user_name, "
+                    "total_frames = :total_frames, duration = :duration, "
+                    "recording_time = :recording_time, truncated = :truncated, "
+                    "action_statistics = :action_statistics, "
+                    "state_statistics = :state_statistics WHERE path = :path",
+                    recording)
+            else:
+                recording_id = self.connection.execute(
+                    "INSERT INTO recordings (path, json_mtime_ns, json_size, "
+                    "user_name, total_frames, duration, recording_time, truncated, "
+                    "action_statistics, state_statistics) VALUES (:path, "
+                    ":json_mtime_ns, :json_size, :user_name, :total_frames, "
+                    ":duration, :recording_time, :truncated, :action_statistics, "
+                    ":state_statistics)", recording).lastrowid
+
+            self.connection.executemany(
+                "INSERT INTO frames VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((recording_id,) + frame for frame in frames))
+        return recording_id
+
+
+    def update(self, root="recordings", workers=None, log=print):
+        """增量更新索引，返回 (更新的目录数, 删除的目录数)"""
+        recording_dirs = discover_recordings(root)
+        removed = self.remove_missing(recording_dirs)
+        stale = self.stale_recordings(recording_dirs)
+
+        if stale:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for recording, frames in pool.map(scan_recording, stale):
+                    self.store(recording, frames)
+                    log(f"已索引: {recording['path']} ({len(frames)} 帧)")
+
+        return len(stale), removed
+
+
+    def query(self, sql, params=()):
+        """执行任意查询，返回 sqlite3.Row 列表"""
+        return self.connection.execute(sql, params).fetchall()
+
+
+    def frames_before_death(self, within, action_code=None, mario_state=None):
+        """死亡前 within 帧以内的帧（不含死亡帧本身），可按动作和状态过滤"""
+        sql = ("SELECT r.path, f.* FROM frames f JOIN recordings r USING (recording_id) "
+               "WHERE f.frames_to_death BETWEEN 1 AND ?")
+        params = [within]
+        if action_code is not None:
+            sql += " AND f.action_code = ?"
+            params.append(action_code)
+        if mario_state is not None:
+            sql += " AND f.mario_state = ?"
+            params.append(mario_state)
+        return self.query(sql, params)
+
+
+    def frame_path(self, row):
+        """查询结果中帧图片的路径，没有图片时返回 None"""
+        if row['frame_file'] is None:
+            return None
+        return os.path.join(self.base_dir, row['path'], row['frame_file'])
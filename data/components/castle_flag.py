@@ -15,7 +15,7 @@ class Flag(pg.sprite.Sprite):
         self.rect = self.image.get_rect()
         self.rect.x = x
         self.rect.y = y
-        self.state = 'rising'
+        self.state = c.RISING
         self.y_vel = -2
         self.target_height = y
 
@@ -34,16 +34,16 @@ class Flag(pg.sprite.Sprite):
 
     def update(self, *args):
         """Updates flag position"""
-        if self.state == 'rising':
+        if self.state == c.RISING:
             self.rising()
-        elif self.state == 'resting':
+        elif self.state == c.RESTING:
             self.resting()
 
     def rising(self):
         """State when flag is rising to be on the castle"""
         self.rect.y += self.y_vel
         if self.rect.bottom <= self.target_height:
-            self.state = 'resting'
+            self.state = c.RESTING
 
     def resting(self):
         """State when the flag is stationary doing nothing"""
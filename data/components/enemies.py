@@ -58,18 +58,21 @@ class Enemy(pg.sprite.Sprite):
         return image
 
 
+    # 状态编号 -> 处理方法名，子类可以覆盖对应的方法
+    state_handlers = {
+        c.WALK: 'walking',
+        c.FALL: 'falling',
+        c.JUMPED_ON: 'jumped_on',
+        c.SHELL_SLIDE: 'shell_sliding',
+        c.DEATH_JUMP: 'death_jumping',
+    }
+
+
     def handle_state(self):
         """Enemy behavior based on state"""
-        if self.state == c.WALK:
-            self.walking()
-        elif self.state == c.FALL:
-            self.falling()
-        elif self.state == c.JUMPED_ON:
-            self.jumped_on()
-        elif self.state == c.SHELL_SLIDE:
-            self.shell_sliding()
-        elif self.state == c.DEATH_JUMP:
-            self.death_jumping()
+        handler = self.state_handlers.get(self.state)
+        if handler is not None:
+            getattr(self, handler)()
 
 
     def walking(self):
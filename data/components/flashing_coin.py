@@ -43,6 +43,14 @@ class Coin(pg.sprite.Sprite):
         return image
 
 
+    def reset(self):
+        """回到第一帧，重新开始闪烁"""
+        self.image = self.frames[0]
+        self.timer = 0
+        self.first_half = True
+        self.frame_index = 0
+
+
     def update(self, current_time):
         """Animates flashing coin"""
         if self.first_half:
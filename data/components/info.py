@@ -41,6 +41,28 @@ class OverheadInfo(object):
         self.create_main_menu_labels()
 
 
+    def reset(self, game_info, state):
+        """回到刚创建时的状态：字符图片和固定的标签保留，只重建随游戏变化的
+        分数、时间、金币、生命数和最高分标签"""
+        self.coin_total = game_info[c.COIN_TOTAL]
+        self.time = 401
+        self.current_time = 0
+        self.total_lives = game_info[c.LIVES]
+        self.top_score = game_info[c.TOP_SCORE]
+        self.state = state
+        self.special_state = None
+        self.game_info = game_info
+
+        self.create_score_group()
+        self.create_countdown_clock()
+        self.create_coin_counter()
+        self.flashing_coin.reset()
+        self.life_total_label = []
+        self.create_label(self.life_total_label, str(self.total_lives),
+                          450, 285)
+        self.create_main_menu_labels()
+
+
     def create_image_dict(self):
         """Creates the initial images for the score"""
         self.image_dict = {}
@@ -234,53 +256,69 @@ class OverheadInfo(object):
         self.handle_level_state(level_info)
 
 
-    def handle_level_state(self, level_info):
-        """Updates info based on what state the game is in"""
-        if self.state == c.MAIN_MENU:
-            self.score = level_info[c.SCORE]
-            self.update_score_images(self.score_images, self.score)
-            self.update_score_images(self.main_menu_labels[3], self.top_score)
-            self.update_coin_total(level_info)
-            self.flashing_coin.update(level_info[c.CURRENT_TIME])
+    # 状态编号 -> 处理方法名，handle_level_state 按表分派
+    state_handlers = {
+        c.MAIN_MENU: 'update_main_menu_info',
+        c.LOAD_SCREEN: 'update_score_and_coins',
+        c.LEVEL: 'update_level_info',
+        c.TIME_OUT: 'update_score_and_coins',
+        c.GAME_OVER: 'update_score_and_coins',
+        c.FAST_COUNT_DOWN: 'update_fast_count_down_info',
+        c.END_OF_LEVEL: 'update_end_of_level_info',
+    }
 
-        elif self.state == c.LOAD_SCREEN:
-            self.score = level_info[c.SCORE]
-            self.update_score_images(self.score_images, self.score)
-            self.update_coin_total(level_info)
 
-        elif self.state == c.LEVEL:
-            self.score = level_info[c.SCORE]
-            self.update_score_images(self.score_images, self.score)
-            if level_info[c.LEVEL_STATE] != c.FROZEN \
-                    and self.mario.state != c.WALKING_TO_CASTLE \
-                    and self.mario.state != c.END_OF_LEVEL_FALL \
-                    and not self.mario.dead:
-                self.update_count_down_clock(level_info)
-            self.update_coin_total(level_info)
-            self.flashing_coin.update(level_info[c.CURRENT_TIME])
+    def handle_level_state(self, level_info):
+        """Updates info based on what state the game is in"""
+        handler = self.state_handlers.get(self.state)
+        if handler is not None:
+            getattr(self, handler)(level_info)
+
+
+    def update_main_menu_info(self, level_info):
+        """Score, top score and coins on the main menu"""
+        self.score = level_info[c.SCORE]
+        self.update_score_images(self.score_images, self.score)
+        self.update_score_images(self.main_menu_labels[3], self.top_score)
+        self.update_coin_total(level_info)
+        self.flashing_coin.update(level_info[c.CURRENT_TIME])
+
+
+    def update_score_and_coins(self, level_info):
+        """Score and coins on the load, time out and game over screens"""
+        self.score = level_info[c.SCORE]
+        self.update_score_images(self.score_images, self.score)
+        self.update_coin_total(level_info)
+
+
+    def update_level_info(self, level_info):
+        """Score, clock and coins while the level is being played"""
+        self.score = level_info[c.SCORE]
+        self.update_score_images(self.score_images, self.score)
+        if level_info[c.LEVEL_STATE] != c.FROZEN \
+                and self.mario.state != c.WALKING_TO_CASTLE \
+                and self.mario.state != c.END_OF_LEVEL_FALL \
+                and not self.mario.dead:
+            self.update_count_down_clock(level_info)
+        self.update_coin_total(level_info)
+        self.flashing_coin.update(level_info[c.CURRENT_TIME])
 
-        elif self.state == c.TIME_OUT:
-            self.score = level_info[c.SCORE]
-            self.update_score_images(self.score_images, self.score)
-            self.update_coin_total(level_info)
 
-        elif self.state == c.GAME_OVER:
-            self.score = level_info[c.SCORE]
-            self.update_score_images(self.score_images, self.score)
-            self.update_coin_total(level_info)
+    def update_fast_count_down_info(self, level_info):
+        """Turns the remaining time into score at the end of the level"""
+        level_info[c.SCORE] += 50
+        self.score = level_info[c.SCORE]
+        self.update_count_down_clock(level_info)
+        self.update_score_images(self.score_images, self.score)
+        self.update_coin_total(level_info)
+        self.flashing_coin.update(level_info[c.CURRENT_TIME])
+        if self.time == 0:
+            self.state = c.END_OF_LEVEL
 
-        elif self.state == c.FAST_COUNT_DOWN:
-            level_info[c.SCORE] += 50
-            self.score = level_info[c.SCORE]
-            self.update_count_down_clock(level_info)
-            self.update_score_images(self.score_images, self.score)
-            self.update_coin_total(level_info)
-            self.flashing_coin.update(level_info[c.CURRENT_TIME])
-            if self.time == 0:
-                self.state = c.END_OF_LEVEL
 
-        elif self.state == c.END_OF_LEVEL:
-            self.flashing_coin.update(level_info[c.CURRENT_TIME])
+    def update_end_of_level_info(self, level_info):
+        """Only the coin keeps flashing once the count down is done"""
+        self.flashing_coin.update(level_info[c.CURRENT_TIME])
 
 
     def update_score_images(self, images, score):
@@ -396,6 +396,23 @@ class Mario(pg.sprite.Sprite):
         return image
 
 
+    # 状态编号 -> 处理方法名，handle_state 按表分派
+    state_handlers = {
+        c.STAND: 'standing',
+        c.WALK: 'walking',
+        c.JUMP: 'jumping',
+        c.FALL: 'falling',
+        c.DEATH_JUMP: 'jumping_to_death',
+        c.SMALL_TO_BIG: 'changing_to_big',
+        c.BIG_TO_FIRE: 'changing_to_fire',
+        c.BIG_TO_SMALL: 'changing_to_small',
+        c.FLAGPOLE: 'flag_pole_sliding',
+        c.BOTTOM_OF_POLE: 'sitting_at_bottom_of_pole',
+        c.WALKING_TO_CASTLE: 'walking_to_castle',
+        c.END_OF_LEVEL_FALL: 'falling_at_end_of_level',
+    }
+
+
     def update(self, keys, game_info, fire_group):
         """Updates Mario's states and animations once per frame"""
         self.current_time = game_info[c.CURRENT_TIME]
@@ -406,30 +423,9 @@ class Mario(pg.sprite.Sprite):
 
     def handle_state(self, keys, fire_group):
         """Determines Mario's behavior based on his state"""
-        if self.state == c.STAND:
-            self.standing(keys, fire_group)
-        elif self.state == c.WALK:
-            self.walking(keys, fire_group)
-        elif self.state == c.JUMP:
-            self.jumping(keys, fire_group)
-        elif self.state == c.FALL:
-            self.falling(keys, fire_group)
-        elif self.state == c.DEATH_JUMP:
-            self.jumping_to_death()
-        elif self.state == c.SMALL_TO_BIG:
-            self.changing_to_big()
-        elif self.state == c.BIG_TO_FIRE:
-            self.changing_to_fire()
-        elif self.state == c.BIG_TO_SMALL:
-            self.changing_to_small()
-        elif self.state == c.FLAGPOLE:
-            self.flag_pole_sliding()
-        elif self.state == c.BOTTOM_OF_POLE:
-            self.sitting_at_bottom_of_pole()
-        elif self.state == c.WALKING_TO_CASTLE:
-            self.walking_to_castle()
-        elif self.state == c.END_OF_LEVEL_FALL:
-            self.falling_at_end_of_level()
+        handler = self.state_handlers.get(self.state)
+        if handler is not None:
+            getattr(self, handler)(keys, fire_group)
 
 
     def standing(self, keys, fire_group):
@@ -678,7 +674,7 @@ class Mario(pg.sprite.Sprite):
                 self.shoot_fireball(fire_group)
 
 
-    def jumping_to_death(self):
+    def jumping_to_death(self, *args):
         """Called when Mario is in a DEATH_JUMP state"""
         if self.death_timer == 0:
             self.death_timer = self.current_time
@@ -699,7 +695,7 @@ class Mario(pg.sprite.Sprite):
         self.in_transition_state = True
 
 
-    def changing_to_big(self):
+    def changing_to_big(self, *args):
         """Changes Mario's image attribute based on time while
         transitioning to big"""
         self.in_transition_state = True
@@ -794,7 +790,7 @@ class Mario(pg.sprite.Sprite):
         self.rect.x = left
 
 
-    def changing_to_fire(self):
+    def changing_to_fire(self, *args):
         """Called when Mario is in a BIG_TO_FIRE state (i.e. when
         he obtains a fire flower"""
         self.in_transition_state = True
@@ -848,7 +844,7 @@ class Mario(pg.sprite.Sprite):
             self.transition_timer = 0
 
 
-    def changing_to_small(self):
+    def changing_to_small(self, *args):
         """Mario's state and animation when he shrinks from big to small
         after colliding with an enemy"""
         self.in_transition_state = True
@@ -941,7 +937,7 @@ class Mario(pg.sprite.Sprite):
         self.rect.x = left
 
 
-    def flag_pole_sliding(self):
+    def flag_pole_sliding(self, *args):
         """State where Mario is sliding down the flag pole"""
         self.state = c.FLAGPOLE
         self.in_transition_state = True
@@ -969,7 +965,7 @@ class Mario(pg.sprite.Sprite):
             self.image = self.right_frames[10]
 
 
-    def sitting_at_bottom_of_pole(self):
+    def sitting_at_bottom_of_pole(self, *args):
         """State when mario is at the bottom of the flag pole"""
         if self.flag_pole_timer == 0:
             self.flag_pole_timer = self.current_time
@@ -996,7 +992,7 @@ class Mario(pg.sprite.Sprite):
         self.state = c.BOTTOM_OF_POLE
 
 
-    def walking_to_castle(self):
+    def walking_to_castle(self, *args):
         """State when Mario walks to the castle to end the level"""
         self.max_x_vel = 5
         self.x_accel = c.WALK_ACCEL
@@ -1068,6 +1064,13 @@ class Mario(pg.sprite.Sprite):
             self.invincible_animation_timer = self.current_time
 
 
+    def reset_image_alpha(self):
+        """清除受伤闪烁留下的透明度，图片回到刚创建时的状态"""
+        for frames in self.all_images:
+            for image in frames:
+                image.set_alpha(None)
+
+
     def check_if_fire(self):
         if self.fire and self.invincible == False:
             self.right_frames = self.fire_frames[0]
@@ -55,8 +55,15 @@ class Powerup(pg.sprite.Sprite):
         self.handle_state()
 
 
+    # 状态编号 -> 处理方法名，每种道具有自己的表
+    state_handlers = {}
+
+
     def handle_state(self):
-        pass
+        """Handles behavior based on state"""
+        handler = self.state_handlers.get(self.state)
+        if handler is not None:
+            getattr(self, handler)()
 
 
     def revealing(self, *args):
@@ -95,14 +102,11 @@ class Mushroom(Powerup):
         self.frames.append(self.get_image(0, 0, 16, 16))
 
 
-    def handle_state(self):
-        """Handles behavior based on state"""
-        if self.state == c.REVEAL:
-            self.revealing()
-        elif self.state == c.SLIDE:
-            self.sliding()
-        elif self.state == c.FALL:
-            self.falling()
+    state_handlers = {
+        c.REVEAL: 'revealing',
+        c.SLIDE: 'sliding',
+        c.FALL: 'falling',
+    }
 
 
 class LifeMushroom(Mushroom):
@@ -134,12 +138,10 @@ class FireFlower(Powerup):
             self.get_image(48, 32, 16, 16))
 
 
-    def handle_state(self):
-        """Handle behavior based on state"""
-        if self.state == c.REVEAL:
-            self.revealing()
-        elif self.state == c.RESTING:
-            self.resting()
+    state_handlers = {
+        c.REVEAL: 'revealing',
+        c.RESTING: 'resting',
+    }
 
 
     def revealing(self):
@@ -189,12 +191,10 @@ class Star(Powerup):
         self.frames.append(self.get_image(49, 48, 15, 16))
 
 
-    def handle_state(self):
-        """Handles behavior based on state"""
-        if self.state == c.REVEAL:
-            self.revealing()
-        elif self.state == c.BOUNCE:
-            self.bouncing()
+    state_handlers = {
+        c.REVEAL: 'revealing',
+        c.BOUNCE: 'bouncing',
+    }
 
 
     def revealing(self):
@@ -303,14 +303,18 @@ class FireBall(pg.sprite.Sprite):
         self.check_if_off_screen(viewport)
 
 
+    state_handlers = {
+        c.FLYING: 'animation',
+        c.BOUNCING: 'animation',
+        c.EXPLODING: 'animation',
+    }
+
+
     def handle_state(self):
         """Handles behavior based on state"""
-        if self.state == c.FLYING:
-            self.animation()
-        elif self.state == c.BOUNCING:
-            self.animation()
-        elif self.state == c.EXPLODING:
-            self.animation()
+        handler = self.state_handlers.get(self.state)
+        if handler is not None:
+            getattr(self, handler)()
 
 
     def animation(self):
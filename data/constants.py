@@ -50,56 +50,68 @@ MAX_WALK_SPEED = 6
 
 
 #Mario States
+#状态都用整数编号，STATE_NAMES 记录每个编号原来的字符串名（录制数据中仍使用字符串）
 
-STAND = 'standing'
-WALK = 'walk'
-JUMP = 'jump'
-FALL = 'fall'
-SMALL_TO_BIG = 'small to big'
-BIG_TO_FIRE = 'big to fire'
-BIG_TO_SMALL = 'big to small'
-FLAGPOLE = 'flag pole'
-WALKING_TO_CASTLE = 'walking to castle'
-END_OF_LEVEL_FALL = 'end of level fall'
+STAND = 1
+WALK = 2
+JUMP = 3
+FALL = 4
+SMALL_TO_BIG = 5
+BIG_TO_FIRE = 6
+BIG_TO_SMALL = 7
+FLAGPOLE = 8
+WALKING_TO_CASTLE = 9
+END_OF_LEVEL_FALL = 10
 
 
 #GOOMBA Stuff
 
 LEFT = 'left'
 RIGHT = 'right'
-JUMPED_ON = 'jumped on'
-DEATH_JUMP = 'death jump'
+JUMPED_ON = 11
+DEATH_JUMP = 12
 
 #KOOPA STUFF
 
-SHELL_SLIDE = 'shell slide'
+SHELL_SLIDE = 13
 
 #BRICK STATES
 
-RESTING = 'resting'
-BUMPED = 'bumped'
+RESTING = 14
+BUMPED = 15
 
 #COIN STATES
-OPENED = 'opened'
+OPENED = 16
 
 #MUSHROOM STATES
 
-REVEAL = 'reveal'
-SLIDE = 'slide'
+REVEAL = 17
+SLIDE = 18
 
 #COIN STATES
 
-SPIN = 'spin'
+SPIN = 19
 
 #STAR STATES
 
-BOUNCE = 'bounce'
+BOUNCE = 20
 
 #FIRE STATES
 
-FLYING = 'flying'
-BOUNCING = 'bouncing'
-EXPLODING = 'exploding'
+FLYING = 21
+BOUNCING = 22
+EXPLODING = 23
+
+#CASTLE FLAG STATES
+
+RISING = 24
+
+#MARIO POWER STATES (关卡中途开始时的能力)
+
+SMALL = 'small'
+BIG = 'big'
+FIRE = 'fire'
+MARIO_POWERS = (SMALL, BIG, FIRE)
 
 #Brick and coin box contents
 
@@ -119,30 +131,30 @@ KOOPA = 'koopa'
 
 #LEVEL STATES
 
-FROZEN = 'frozen'
-NOT_FROZEN = 'not frozen'
-IN_CASTLE = 'in castle'
-FLAG_AND_FIREWORKS = 'flag and fireworks'
+FROZEN = 25
+NOT_FROZEN = 26
+IN_CASTLE = 27
+FLAG_AND_FIREWORKS = 28
 
 #FLAG STATE
-TOP_OF_POLE = 'top of pole'
-SLIDE_DOWN = 'slide down'
-BOTTOM_OF_POLE = 'bottom of pole'
+TOP_OF_POLE = 29
+SLIDE_DOWN = 30
+BOTTOM_OF_POLE = 31
 
 #1UP score
 ONEUP = '379'
 
 #MAIN MENU CURSOR STATES
-PLAYER1 = '1 player'
-PLAYER2 = '2 player'
+PLAYER1 = 32
+PLAYER2 = 33
 
 #OVERHEAD INFO STATES
-MAIN_MENU = 'main menu'
-LOAD_SCREEN = 'loading screen'
-LEVEL = 'level'
-GAME_OVER = 'game over'
-FAST_COUNT_DOWN = 'fast count down'
-END_OF_LEVEL = 'end of level'
+MAIN_MENU = 34
+LOAD_SCREEN = 35
+LEVEL = 36
+GAME_OVER = 37
+FAST_COUNT_DOWN = 38
+END_OF_LEVEL = 39
 
 
 #GAME INFO DICTIONARY KEYS
@@ -155,23 +167,69 @@ LEVEL_STATE = 'level state'
 CAMERA_START_X = 'camera start x'
 MARIO_DEAD = 'mario dead'
 
-#STATES FOR ENTIRE GAME
-MAIN_MENU = 'main menu'
-LOAD_SCREEN = 'load screen'
-TIME_OUT = 'time out'
-GAME_OVER = 'game over'
-LEVEL1 = 'level1'
+#STATES FOR ENTIRE GAME (MAIN_MENU, LOAD_SCREEN, GAME_OVER 见上)
+TIME_OUT = 40
+LEVEL1 = 41
 
 #SOUND STATEZ
-NORMAL = 'normal'
-STAGE_CLEAR = 'stage clear'
-WORLD_CLEAR = 'world clear'
-TIME_WARNING = 'time warning'
-SPED_UP_NORMAL = 'sped up normal'
-MARIO_INVINCIBLE = 'mario invincible'
-
-
-
-
-
-
+NORMAL = 42
+STAGE_CLEAR = 43
+WORLD_CLEAR = 44
+TIME_WARNING = 45
+SPED_UP_NORMAL = 46
+MARIO_INVINCIBLE = 47
+MARIO_DEATH = 48
+
+
+#STATE ID -> NAME (原来的字符串值，编号和名字都不再改变)
+STATE_NAMES = {
+    STAND: 'standing',
+    WALK: 'walk',
+    JUMP: 'jump',
+    FALL: 'fall',
+    SMALL_TO_BIG: 'small to big',
+    BIG_TO_FIRE: 'big to fire',
+    BIG_TO_SMALL: 'big to small',
+    FLAGPOLE: 'flag pole',
+    WALKING_TO_CASTLE: 'walking to castle',
+    END_OF_LEVEL_FALL: 'end of level fall',
+    JUMPED_ON: 'jumped on',
+    DEATH_JUMP: 'death jump',
+    SHELL_SLIDE: 'shell slide',
+    RESTING: 'resting',
+    BUMPED: 'bumped',
+    OPENED: 'opened',
+    REVEAL: 'reveal',
+    SLIDE: 'slide',
+    SPIN: 'spin',
+    BOUNCE: 'bounce',
+    FLYING: 'flying',
+    BOUNCING: 'bouncing',
+    EXPLODING: 'exploding',
+    RISING: 'rising',
+    FROZEN: 'frozen',
+    NOT_FROZEN: 'not frozen',
+    IN_CASTLE: 'in castle',
+    FLAG_AND_FIREWORKS: 'flag and fireworks',
+    TOP_OF_POLE: 'top of pole',
+    SLIDE_DOWN: 'slide down',
+    BOTTOM_OF_POLE: 'bottom of pole',
+    PLAYER1: '1 player',
+    PLAYER2: '2 player',
+    MAIN_MENU: 'main menu',
+    LOAD_SCREEN: 'load screen',
+    LEVEL: 'level',
+    GAME_OVER: 'game over',
+    FAST_COUNT_DOWN: 'fast count down',
+    END_OF_LEVEL: 'end of level',
+    TIME_OUT: 'time out',
+    LEVEL1: 'level1',
+    NORMAL: 'normal',
+    STAGE_CLEAR: 'stage clear',
+    WORLD_CLEAR: 'world clear',
+    TIME_WARNING: 'time warning',
+    SPED_UP_NORMAL: 'sped up normal',
+    MARIO_INVINCIBLE: 'mario invincible',
+    MARIO_DEATH: 'mario dead',
+}
+STATE_IDS = {name: state for state, name in STATE_NAMES.items()}
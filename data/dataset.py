@@ -0,0 +1,188 @@
+"""
+随机访问的帧数据集。
+
+把一个或多个录制目录当作可按下标访问的数据集，每一项是 (帧, 动作编码, 标签)。
+分块存储（--format chunk）的录制直接从内存映射的块文件里取帧，
+PNG 录制按文件名解码。iter_batches 用线程池预取后面的批次，
+帧数据写入可复用的缓冲区，训练时不会为每一批重新分配内存。
+不同 --quality 的录制帧尺寸不同，同一批里只放同一尺寸的帧。
+"""
+
+__author__ = 'justinarmstrong'
+
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pygame as pg
+
+from . import labels
+from . import frame_store
+from .recording_io import discover_recordings
+
+
+def png_shape(path):
+    """PNG 帧解码后的尺寸 (高, 宽, 3)"""
+    width, height = pg.image.load(path).get_size()
+    return (height, width, 3)
+
+
+class FrameDataset(object):
+    """由录制目录组成的帧数据集，只包含保存了图片的帧
+
+    frame_shapes 为数据集中出现的帧尺寸，shape_id[i] 是第 i 帧的尺寸在其中的编号。
+    """
+    def __init__(self, recording_dirs):
+        self.recording_dirs = list(recording_dirs)
+        self.sources = []
+        self.state_names = []
+        self.frame_shapes = []
+        state_index = {}
+        shape_index = {}
+
+        parts = {key: [] for key in ('recording', 'row', 'frame_id', 'action_code',
+                                     'mario_dead', 'nt', 'life_id', 'state_id', 'shape_id')}
+
+        for recording, recording_dir in enumerate(self.recording_dirs):
+            columns = labels.load_recording_columns(recording_dir)
+            frame_labels = labels.label_columns(columns)
+
+            if frame_store.has_store(recording_dir):
+                store = frame_store.FrameStore(
+                    os.path.join(recording_dir, frame_store.STORE_DIRNAME))
+                saved = np.flatnonzero(columns['frame_offset'] >= 0)
+                self.sources.append((store, columns['frame_offset'][saved]))
+                shape = store.frame_shape
+            else:
+                frames_dir = os.path.join(recording_dir, "frames")
+                saved = np.flatnonzero(columns['frame_filename'] != '')
+                self.sources.append((frames_dir, columns['frame_filename'][saved]))
+                shape = png_shape(os.path.join(frames_dir, str(columns['frame_filename'][saved[0]]))) \
+                    if saved.size else None
+
+            # 同一个录制的帧尺寸都相同（分块存储读 store.json，PNG 读第一张图）
+            if saved.size and shape not in shape_index:
+                shape_index[shape] = len(shape_index)
+                self.frame_shapes.append(shape)
+
+            # 各录制的状态编号统一成数据集内的编号
+            local_names = columns['state_names'].tolist()
+            for name in local_names:
+                if name not in state_index:
+                    state_index[name] = len(state_index)
+                    self.state_names.append(name)
+            remap = np.array([state_index[name] for name in local_names], dtype=np.int16)
+
+            parts['recording'].append(np.full(saved.size, recording, dtype=np.int32))
+            parts['row'].append(np.arange(saved.size, dtype=np.int64))
+            parts['frame_id'].append(columns['frame_id'][saved])
+            parts['action_code'].append(columns['action_code'][saved])
+            parts['mario_dead'].append(columns['mario_dead'][saved])
+            parts['nt'].append(frame_labels['nt'][saved])
+            parts['life_id'].append(frame_labels['life_id'][saved])
+            parts['state_id'].append(remap[columns['state_id'][saved]]
+                                     if remap.size else np.zeros(0, dtype=np.int16))
+            parts['shape_id'].append(np.full(saved.size, shape_index.get(shape, -1), dtype=np.int16))
+
+        for key, arrays in parts.items():
+            setattr(self, key, np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.int64))
+
+
+    @classmethod
+    def from_root(cls, root="recordings"):
+        """根目录下所有录制组成的数据集"""
+        return cls(discover_recordings(root))
+
+
+    def __len__(self):
+        return self.action_code.size
+
+
+    def frame_labels(self, index):
+        return {
+            'recording_dir': self.recording_dirs[self.recording[index]],
+            'frame_id': int(self.frame_id[index]),
+            'mario_state': self.state_names[self.state_id[index]],
+            'mario_dead': bool(self.mario_dead[index]),
+            'nt': int(self.nt[index]),
+            'life_id': int(self.life_id[index]),
+        }
+
+
+    def read_frame(self, index, out=None):
+        """读取一帧 (高, 宽, 3) uint8
+
+        分块存储的帧在不传 out 时返回只读的内存映射视图，不会复制数据。
+        """
+        source, keys = self.sources[self.recording[index]]
+        key = keys[self.row[index]]
+
+        if isinstance(source, frame_store.FrameStore):
+            frame = source[int(key)]
+        else:
+            surface = pg.image.load(os.path.join(source, str(key)))
+            frame = frame_store.surface_to_array(surface)
+
+        if out is None:
+            return frame
+        if frame.shape != out.shape:
+            raise ValueError(f"帧尺寸不一致: {frame.shape} != {out.shape}")
+        out[...] = frame
+        return out
+
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"下标超出范围: {index}")
+        return self.read_frame(index), int(self.action_code[index]), self.frame_labels(index)
+
+
+    def iter_batches(self, indices, batch_size=32, workers=4, prefetch=None):
+        """按给定下标顺序返回 (帧, 动作编码, nt) 批次
+
+        后台线程提前读取 prefetch 个批次。帧数组来自复用的缓冲区，
+        只在取下一批之前有效，需要保留时请自行复制。
+        帧尺寸不止一种时按尺寸分组（按尺寸第一次出现的顺序），组内保持给定的顺序。
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        if indices.size == 0:
+            return
+        prefetch = prefetch or workers
+
+        shape_ids = self.shape_id[indices]
+        present, first = np.unique(shape_ids, return_index=True)
+        groups = [(int(shape), indices[shape_ids == shape]) for shape in present[np.argsort(first)]]
+        batches = ((shape, group[start:start + batch_size])
+                   for shape, group in groups
+                   for start in range(0, group.size, batch_size))
+        # 每种尺寸一组缓冲区，用到时才分配，每组最多 prefetch 个
+        free_buffers = {shape: [] for shape, group in groups}
+
+        def load(batch, buffer):
+            for i, index in enumerate(batch.tolist()):
+                self.read_frame(index, buffer[i])
+            return buffer[:batch.size], self.action_code[batch], self.nt[batch]
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+
+            def submit_next():
+                shape, batch = next(batches, (None, None))
+                if batch is not None:
+                    buffers = free_buffers[shape]
+                    buffer = buffers.pop() if buffers else \
+                        np.empty((batch_size,) + self.frame_shapes[shape], dtype=np.uint8)
+                    pending.append((shape, buffer, pool.submit(load, batch, buffer)))
+
+            for _ in range(prefetch):
+                submit_next()
+
+            while pending:
+                shape, buffer, future = pending.popleft()
+                result = future.result()
+                yield result
+                # 调用方已经用完这一批，缓冲区可以复用
+                free_buffers[shape].append(buffer)
+                submit_next()
@@ -0,0 +1,156 @@
+"""
+程序控制的游戏环境。
+
+MarioEnv 直接用动作编码（与录制中的 action_code 相同，0-31）驱动 Level1，
+不经过 pygame 事件队列。无头运行时先设置 SDL_VIDEODRIVER=dummy 和
+SDL_AUDIODRIVER=dummy，并在项目根目录下运行（资源按相对路径加载）。
+
+    env = MarioEnv(action_repeat=4)
+    obs = env.reset()
+    while True:
+        obs, done, info = env.step(2)   # 一直向右
+        if done:
+            break
+"""
+
+__author__ = 'justinarmstrong'
+
+import numpy as np
+
+from . import setup, tools
+from . import constants as c
+from . import savestate
+from .frame_view import FrameBuffer
+from .observation import ObservationEncoder
+from .states import level1
+
+
+def new_game_info():
+    """新游戏的 game_info，与主菜单开始游戏时相同"""
+    return {c.COIN_TOTAL: 0,
+            c.SCORE: 0,
+            c.LIVES: 3,
+            c.TOP_SCORE: 0,
+            c.CURRENT_TIME: 0.0,
+            c.LEVEL_STATE: None,
+            c.CAMERA_START_X: 0,
+            c.MARIO_DEAD: False}
+
+
+class MarioEnv(object):
+    """用动作编码逐步运行 Level1
+
+    action_repeat: 每次 step 重复执行同一动作的逻辑步数，只有最后一步绘制画面。
+    render: 为 False 时完全不绘制，step 返回的观测为 None。
+    obs_mode: 'pixels' 返回画面；'symbolic' 返回 ObservationEncoder 编码的向量，
+        此时不绘制画面。
+    tile_columns: symbolic 模式下附加的地形格列数，见 observation.py。
+    crop: 只返回画面中的 (x, y, w, h) 区域。
+    grayscale: 返回 (H, W) uint8 灰度画面。
+    fast_forward: 碰到旗杆时立即结束关卡并结算分数，不等滑旗和城堡动画。
+
+    画面直接绘制到 numpy 数组上，返回的画面观测是这块内存的只读视图（灰度时为
+    复用的缓冲区），下一次 step 会覆盖其内容，需要保留时请复制。
+    """
+    def __init__(self, action_repeat=1, render=True, obs_mode='pixels', k=5,
+                 crop=None, grayscale=False, fast_forward=True, tile_columns=0):
+        if obs_mode not in ('pixels', 'symbolic'):
+            raise ValueError(f"未知的观测模式: {obs_mode}")
+        self.action_repeat = action_repeat
+        self.obs_mode = obs_mode
+        self.render = render and obs_mode == 'pixels'
+        self.encoder = ObservationEncoder(k, tile_columns) if obs_mode == 'symbolic' else None
+        self.crop = crop
+        self.grayscale = grayscale
+        self.input = tools.ActionInput()
+        self.control = tools.Control(setup.ORIGINAL_CAPTION, input_provider=self.input)
+        self.control.fast_forward = fast_forward
+        self.frame = FrameBuffer(setup.SCREEN.get_size())
+        self.control.screen = self.frame.surface
+        height, width = self.frame.region(crop).shape[:2]
+        self.gray_buffer = np.zeros((height, width), dtype=np.uint8) if grayscale else None
+        self.control.setup_states({c.LEVEL1: level1.Level1()}, c.LEVEL1)
+        self.level = self.control.state
+        self.steps = 0
+        self.done = True
+
+
+    def reset(self, state=None, start_x=None, power=c.SMALL):
+        """开始新的一局；state 为存档（字节串或 .sav 路径）时从存档继续
+
+        不用存档时可以用 start_x 和 power（c.SMALL / c.BIG / c.FIRE）从关卡中任意
+        位置开始，见 Level1.set_start_state。
+        """
+        self.input.set_action(0)
+        self.control.done = False
+        if state is None:
+            self.control.set_time(0.0)
+            self.control.state_name = c.LEVEL1
+            self.control.state = self.level
+            self.level.startup(self.control.current_time, new_game_info())
+            if start_x is not None or power != c.SMALL:
+                x = start_x if start_x is not None else self.level.mario.rect.x
+                self.level.set_start_state(x, power)
+            self.steps = 0
+        else:
+            if not isinstance(state, dict):
+                state = savestate.load_snapshot(state)
+            savestate.restore(self.control, state)
+            self.steps = state['frame_id'] or 0
+        self.level.done = False
+        self.done = False
+
+        if self.render:
+            self.level.blit_everything(self.control.screen)
+        return self.observation()
+
+
+    def step(self, action_code):
+        """执行一个动作，返回 (观测, 是否结束, 信息)
+
+        马里奥死亡或关卡结束（时间到、过关）时 done 为 True，之后需要重新 reset。
+        """
+        if self.done:
+            raise RuntimeError("环境已结束，请先调用 reset()")
+
+        self.input.set_action(action_code)
+        for repeat in range(self.action_repeat):
+            last = repeat == self.action_repeat - 1
+            self.control.update(render=self.render and last)
+            self.steps += 1
+            if self.level.mario.dead or self.level.done:
+                self.done = True
+                break
+
+        return self.observation(), self.done, self.info()
+
+
+    def observation(self):
+        """当前画面 (H, W, 3) uint8 或符号化向量；不绘制画面时为 None"""
+        if self.encoder is not None:
+            return self.encoder.encode(self.level)
+        if not self.render:
+            return None
+        if self.grayscale:
+            return self.frame.grayscale(self.gray_buffer, self.crop)
+        return self.frame.region(self.crop)
+
+
+    def info(self):
+        mario_state, mario_dead = self.level.get_mario_info()
+        return {
+            'steps': self.steps,
+            'current_time': self.control.current_time,
+            'mario_state': mario_state,
+            'mario_dead': mario_dead,
+            'mario_x': self.level.mario.rect.x,
+            'score': self.level.game_info[c.SCORE],
+            'coins': self.level.game_info[c.COIN_TOTAL],
+            'level_state': c.STATE_NAMES[self.level.state],
+            'level_complete': self.level.done and not self.level.mario.dead,
+        }
+
+
+    def snapshot(self):
+        """当前状态的存档，可以传给 reset(state=...)"""
+        return savestate.snapshot(self.level, self.control.current_time, self.steps)
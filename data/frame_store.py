@@ -0,0 +1,177 @@
+"""
+紧凑的分块帧存储。
+
+帧按顺序追加到 chunks/ 目录下的 .npy 文件中，每个文件保存 CHUNK_FRAMES 帧，
+形状为 (帧数, 高, 宽, 3) 的 uint8 数组。读取时用内存映射打开，
+按帧序号（frame_offset）随机访问不需要解码图片，也不需要逐个打开文件。
+"""
+
+__author__ = 'justinarmstrong'
+
+import os
+import json
+import threading
+from collections import OrderedDict
+import numpy as np
+import pygame as pg
+
+STORE_DIRNAME = "chunks"
+META_FILENAME = "store.json"
+CHUNK_FRAMES = 256
+MAX_OPEN_CHUNKS = 64
+
+
+def chunk_filename(chunk_index):
+    return f"chunk_{chunk_index:06d}.npy"
+
+
+def surface_to_array(surface):
+    """把 pygame surface 转换成 (高, 宽, 3) 的 uint8 数组"""
+    return np.ascontiguousarray(pg.surfarray.pixels3d(surface).transpose(1, 0, 2))
+
+
+def has_store(recording_dir):
+    return os.path.exists(os.path.join(recording_dir, STORE_DIRNAME, META_FILENAME))
+
+
+class ChunkWriter(object):
+    """按顺序写入帧，每满 chunk_frames 帧写出一个块文件"""
+    def __init__(self, store_dir, chunk_frames=CHUNK_FRAMES):
+        self.store_dir = store_dir
+        self.chunk_frames = chunk_frames
+        self.frame_shape = None
+        self.buffer = None
+        self.count = 0
+        os.makedirs(store_dir, exist_ok=True)
+
+
+    def append(self, frame):
+        """追加一帧，返回该帧的序号 frame_offset"""
+        if self.buffer is None:
+            self.frame_shape = frame.shape
+            self.buffer = np.empty((self.chunk_frames,) + frame.shape, dtype=np.uint8)
+        elif frame.shape != self.frame_shape:
+            raise ValueError(f"帧尺寸不一致: {frame.shape} != {self.frame_shape}")
+
+        offset = self.count
+        self.buffer[offset % self.chunk_frames] = frame
+        self.count += 1
+        if self.count % self.chunk_frames == 0:
+            self.flush_chunk(self.chunk_frames)
+        return offset
+
+
+    def flush_chunk(self, size):
+        chunk_index = (self.count - 1) // self.chunk_frames
+        path = os.path.join(self.store_dir, chunk_filename(chunk_index))
+        # 先写临时文件，中断时不会留下写了一半的块
+        tmp_path = path + '.tmp.npy'
+        np.save(tmp_path, self.buffer[:size])
+        os.replace(tmp_path, path)
+
+
+    def resume(self):
+        """接着上次中断的位置继续写，返回已经写好的帧数
+
+        只保留完整的块，最后一个不满的块会重新写。
+        """
+        chunk_index = 0
+        while True:
+            path = os.path.join(self.store_dir, chunk_filename(chunk_index))
+            if not os.path.exists(path):
+                break
+            try:
+                chunk = np.load(path, mmap_mode='r')
+            except (OSError, ValueError):
+                break
+            if chunk.shape[0] != self.chunk_frames:
+                break
+            if self.buffer is None:
+                self.frame_shape = chunk.shape[1:]
+                self.buffer = np.empty(chunk.shape, dtype=np.uint8)
+            chunk_index += 1
+
+        self.count = chunk_index * self.chunk_frames
+        return self.count
+
+
+    def close(self):
+        """写出最后一个不满的块和元数据"""
+        remainder = self.count % self.chunk_frames
+        if remainder:
+            self.flush_chunk(remainder)
+
+        meta = {
+            'count': self.count,
+            'chunk_frames': self.chunk_frames,
+            'frame_shape': list(self.frame_shape) if self.frame_shape else None,
+        }
+        meta_path = os.path.join(self.store_dir, META_FILENAME)
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(meta_path + '.tmp', meta_path)
+        self.buffer = None
+
+
+class FrameStore(object):
+    """以内存映射方式随机读取分块帧存储
+
+    store[offset] 返回只读的帧视图，数据只在被访问时才从磁盘读入。
+    同时打开的块文件数量有上限，超过时关闭最久没用过的块。
+    """
+    def __init__(self, store_dir, max_open=MAX_OPEN_CHUNKS):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, META_FILENAME), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.count = meta['count']
+        self.chunk_frames = meta['chunk_frames']
+        self.frame_shape = tuple(meta['frame_shape']) if meta['frame_shape'] else None
+        self.max_open = max_open
+        self.chunks = OrderedDict()
+        self.lock = threading.Lock()
+
+
+    def __len__(self):
+        return self.count
+
+
+    def chunk(self, chunk_index):
+        with self.lock:
+            chunk = self.chunks.get(chunk_index)
+            if chunk is not None:
+                self.chunks.move_to_end(chunk_index)
+                return chunk
+            path = os.path.join(self.store_dir, chunk_filename(chunk_index))
+            chunk = np.load(path, mmap_mode='r')
+            self.chunks[chunk_index] = chunk
+            if len(self.chunks) > self.max_open:
+                self.chunks.popitem(last=False)
+            return chunk
+
+
+    def __getitem__(self, offset):
+        if not 0 <= offset < self.count:
+            raise IndexError(f"帧序号超出范围: {offset}")
+        return self.chunk(offset // self.chunk_frames)[offset % self.chunk_frames]
+
+
+    def read_range(self, offset, count, out=None):
+        """读取连续的 count 帧
+
+        不跨块时返回内存映射视图；跨块时拼接到 out（或新数组）中。
+        """
+        if count <= 0 or offset < 0 or offset + count > self.count:
+            raise IndexError(f"帧范围超出范围: {offset}+{count}")
+        chunk_index, start = divmod(offset, self.chunk_frames)
+        if start + count <= self.chunk_frames and out is None:
+            return self.chunk(chunk_index)[start:start + count]
+
+        if out is None:
+            out = np.empty((count,) + self.frame_shape, dtype=np.uint8)
+        done = 0
+        while done < count:
+            chunk_index, start = divmod(offset + done, self.chunk_frames)
+            size = min(count - done, self.chunk_frames - start)
+            out[done:done + size] = self.chunk(chunk_index)[start:start + size]
+            done += size
+        return out
@@ -0,0 +1,138 @@
+"""
+画面的零拷贝 numpy 视图。
+
+常见的 32 位画面在内存中按 B, G, R, X 排列（is_bgrx）。FrameBuffer 先分配一个 (H, W, 4) 的
+numpy 数组，再用 pg.image.frombuffer 在这块内存上建一个 surface 作为绘制目标，
+画面画完后 rgb 就是指向同一块内存的只读 (H, W, 3) 视图：不复制、不分配，也不需要
+锁定 surface。下一次绘制会覆盖视图的内容，需要保留的观测应当自己复制。
+
+显示窗口等不是自己分配的 surface 用 FrameView：视图存在期间 surface 被锁定、不能
+再 blit，所以只在 with 块中使用。
+
+灰度和裁剪结果写入调用方预先分配的数组，每步不分配与画面同样大的内存。
+"""
+
+__author__ = 'justinarmstrong'
+
+import sys
+
+import numpy as np
+import pygame as pg
+
+GRAY_WEIGHTS = (0.299, 0.587, 0.114)
+
+
+def is_bgrx(surface):
+    """surface 的像素在内存中是否按 B, G, R, X 排列；只有这样才能按原始字节复制"""
+    return surface.get_bytesize() == 4 and surface.get_shifts()[:3] == (16, 8, 0) \
+        and sys.byteorder == 'little'
+
+
+def crop_slices(rect):
+    """pygame Rect 或 (x, y, w, h) 转为行、列切片"""
+    x, y, w, h = rect
+    return slice(y, y + h), slice(x, x + w)
+
+
+class _FrameOps(object):
+    """基于 array() 返回的 (H, W, 3) 视图的复制、灰度操作"""
+    def array(self):
+        raise NotImplementedError
+
+
+    def region(self, rect=None):
+        view = self.array()
+        return view if rect is None else view[crop_slices(rect)]
+
+
+    def copy_to(self, out, rect=None):
+        """把整幅画面（或 rect 区域）复制到预先分配的 (h, w, 3) uint8 数组"""
+        np.copyto(out, self.region(rect))
+        return out
+
+
+    def buffer(self, name, shape):
+        """内部的 float32 缓冲区，只在第一次或尺寸变化时分配"""
+        buf = self.scratch.get(name)
+        if buf is None or buf.shape != shape:
+            buf = self.scratch[name] = np.empty(shape, dtype=np.float32)
+        return buf
+
+
+    def grayscale(self, out, rect=None):
+        """把画面（或 rect 区域）转为灰度写入预先分配的 (h, w) 数组（uint8 或 float32）"""
+        view = self.region(rect)
+        target = out if out.dtype == np.float32 else self.buffer('gray', out.shape)
+        channel = self.buffer('channel', out.shape)
+        np.multiply(view[..., 0], GRAY_WEIGHTS[0], out=target, casting='unsafe')
+        for c in (1, 2):
+            np.multiply(view[..., c], GRAY_WEIGHTS[c], out=channel, casting='unsafe')
+            target += channel
+        if target is not out:
+            np.copyto(out, target, casting='unsafe')
+        return out
+
+
+class FrameBuffer(_FrameOps):
+    """由 numpy 数组提供像素内存的绘制目标"""
+    def __init__(self, size):
+        width, height = size
+        self.pixels = np.zeros((height, width, 4), dtype=np.uint8)  # B, G, R, X
+        self.surface = pg.image.frombuffer(self.pixels, size, 'BGRA')
+        self.rgb = self.pixels[..., 2::-1]
+        self.rgb.flags.writeable = False
+        self.scratch = {}
+
+
+    def array(self):
+        """当前画面的只读 (H, W, 3) 视图，始终指向同一块内存"""
+        return self.rgb
+
+
+class FrameView(_FrameOps):
+    """任意 surface 的临时视图，用法: with FrameView(surface) as frame: ..."""
+    def __init__(self, surface):
+        self.surface = surface
+        self.view = None
+        self.scratch = {}
+
+
+    def array(self):
+        """surface 像素的只读 (H, W, 3) 视图，release() 前一直有效"""
+        if self.view is None:
+            view = pg.surfarray.pixels3d(self.surface).transpose(1, 0, 2)
+            view.flags.writeable = False
+            self.view = view
+        return self.view
+
+
+    def copy_raw(self, out):
+        """把 B, G, R, X 排列的 surface 的原始像素整块复制到 (H, W, 4) uint8 数组
+
+        其它像素格式（例如 RGBX 掩码）按字节复制会把红蓝通道对调，抛出 ValueError。
+        """
+        if not is_bgrx(self.surface):
+            raise ValueError(f"surface 的像素不是 B, G, R, X 排列 (shifts={self.surface.get_shifts()})")
+        raw = np.asarray(self.surface.get_view('2')).T
+        np.copyto(out.view(np.uint32).reshape(raw.shape), raw)
+        del raw
+        return out
+
+
+    def release(self):
+        """放开视图，解除 surface 的锁定
+
+        调用方如果还持有 array() 返回的数组，surface 仍然处于锁定状态，这时抛出
+        RuntimeError，需要保留的画面应当先复制一份。
+        """
+        self.view = None
+        if self.surface.get_locked():
+            raise RuntimeError("画面仍被引用（surface 处于锁定状态），请复制需要保留的数据")
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
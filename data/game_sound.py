@@ -10,6 +10,11 @@ class Sound(object):
         """Initialize the class"""
         self.sfx_dict = setup.SFX
         self.music_dict = setup.MUSIC
+        self.reset(overhead_info)
+
+
+    def reset(self, overhead_info):
+        """新的一条命：换上信息栏并重新开始播放音乐"""
         self.overhead_info = overhead_info
         self.game_info = overhead_info.game_info
         self.set_music_mixer()
@@ -34,59 +39,65 @@ class Sound(object):
         self.mario = mario
         self.handle_state()
 
+    # 状态编号 -> 处理方法名；WORLD_CLEAR、MARIO_DEATH、GAME_OVER 不需要处理
+    state_handlers = {
+        c.NORMAL: 'playing_normal',
+        c.FLAGPOLE: 'playing_flagpole',
+        c.STAGE_CLEAR: 'playing_stage_clear',
+        c.FAST_COUNT_DOWN: 'counting_down',
+        c.TIME_WARNING: 'playing_time_warning',
+        c.SPED_UP_NORMAL: 'playing_sped_up',
+        c.MARIO_INVINCIBLE: 'playing_invincible',
+    }
+
     def  handle_state(self):
         """Handles the state of the soundn object"""
-        if self.state == c.NORMAL:
-            if self.mario.dead:
-                self.play_music('death', c.MARIO_DEAD)
-            elif self.mario.invincible \
-                    and self.mario.losing_invincibility == False:
-                self.play_music('invincible', c.MARIO_INVINCIBLE)
-            elif self.mario.state == c.FLAGPOLE:
-                self.play_music('flagpole', c.FLAGPOLE)
-            elif self.overhead_info.time == 100:
-                self.play_music('out_of_time', c.TIME_WARNING)
-
-
-        elif self.state == c.FLAGPOLE:
-            if self.mario.state == c.WALKING_TO_CASTLE:
-                self.play_music('stage_clear', c.STAGE_CLEAR)
-
-        elif self.state == c.STAGE_CLEAR:
-            if self.mario.in_castle:
-                self.sfx_dict['count_down'].play()
-                self.state = c.FAST_COUNT_DOWN
-
-        elif self.state == c.FAST_COUNT_DOWN:
-            if self.overhead_info.time == 0:
-                self.sfx_dict['count_down'].stop()
-                self.state = c.WORLD_CLEAR
-
-        elif self.state == c. TIME_WARNING:
-            if pg.mixer.music.get_busy() == 0:
-                self.play_music('main_theme_sped_up', c.SPED_UP_NORMAL)
-            elif self.mario.dead:
-                self.play_music('death', c.MARIO_DEAD)
-
-        elif self.state == c.SPED_UP_NORMAL:
-            if self.mario.dead:
-                self.play_music('death', c.MARIO_DEAD)
-            elif self.mario.state == c.FLAGPOLE:
-                self.play_music('flagpole', c.FLAGPOLE)
-
-        elif self.state == c.MARIO_INVINCIBLE:
-            if (self.mario.current_time - self.mario.invincible_start_timer) > 11000:
-                self.play_music('main_theme', c.NORMAL)
-            elif self.mario.dead:
-                self.play_music('death', c.MARIO_DEAD)
-
-
-        elif self.state == c.WORLD_CLEAR:
-            pass
-        elif self.state == c.MARIO_DEAD:
-            pass
-        elif self.state == c.GAME_OVER:
-            pass
+        handler = self.state_handlers.get(self.state)
+        if handler is not None:
+            getattr(self, handler)()
+
+    def playing_normal(self):
+        if self.mario.dead:
+            self.play_music('death', c.MARIO_DEATH)
+        elif self.mario.invincible \
+                and self.mario.losing_invincibility == False:
+            self.play_music('invincible', c.MARIO_INVINCIBLE)
+        elif self.mario.state == c.FLAGPOLE:
+            self.play_music('flagpole', c.FLAGPOLE)
+        elif self.overhead_info.time == 100:
+            self.play_music('out_of_time', c.TIME_WARNING)
+
+    def playing_flagpole(self):
+        if self.mario.state == c.WALKING_TO_CASTLE:
+            self.play_music('stage_clear', c.STAGE_CLEAR)
+
+    def playing_stage_clear(self):
+        if self.mario.in_castle:
+            self.sfx_dict['count_down'].play()
+            self.state = c.FAST_COUNT_DOWN
+
+    def counting_down(self):
+        if self.overhead_info.time == 0:
+            self.sfx_dict['count_down'].stop()
+            self.state = c.WORLD_CLEAR
+
+    def playing_time_warning(self):
+        if pg.mixer.music.get_busy() == 0:
+            self.play_music('main_theme_sped_up', c.SPED_UP_NORMAL)
+        elif self.mario.dead:
+            self.play_music('death', c.MARIO_DEATH)
+
+    def playing_sped_up(self):
+        if self.mario.dead:
+            self.play_music('death', c.MARIO_DEATH)
+        elif self.mario.state == c.FLAGPOLE:
+            self.play_music('flagpole', c.FLAGPOLE)
+
+    def playing_invincible(self):
+        if (self.mario.current_time - self.mario.invincible_start_timer) > 11000:
+            self.play_music('main_theme', c.NORMAL)
+        elif self.mario.dead:
+            self.play_music('death', c.MARIO_DEATH)
 
     def play_music(self, key, state):
         """Plays new music"""
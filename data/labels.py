@@ -0,0 +1,200 @@
+"""
+帧标签的批量计算。
+
+把录制数据转成 numpy 列（action_code、mario_dead、状态id 等），
+nt 标签、动作/状态统计、生命段和回合边界都用数组运算一次算完，
+不再逐帧在 Python 里查字典。结果与逐帧计算完全一致。
+"""
+
+__author__ = 'justinarmstrong'
+
+import os
+import numpy as np
+from .recording_io import RecordingReader
+
+LIFE_GAP = 0.5      # 游戏时间间隔超过该值(秒)说明中间离开了关卡（加载画面等）
+EPISODE_GAP = 5.0   # 间隔超过该值(秒)视为新的一局
+CACHE_FILENAME = "labels_cache.npz"
+CACHE_VERSION = 3
+
+
+def load_columns(frames):
+    """把帧记录转换成 numpy 列
+
+    frames 可以是帧字典的列表，也可以是 RecordingReader 这样的流式迭代器。
+    状态名按首次出现的顺序编号，state_names[state_id] 为对应的状态名。
+    没有保存图片的帧 frame_filename 为空字符串；不是分块存储的帧 frame_offset 为 -1。
+    没有 game_time 的旧录制用 timestamp 代替。
+    """
+    frame_ids = []
+    timestamps = []
+    game_times = []
+    action_codes = []
+    dead = []
+    state_ids = []
+    filenames = []
+    offsets = []
+    state_index = {}
+
+    for frame_info in frames:
+        frame_ids.append(frame_info['frame_id'])
+        timestamp = frame_info.get('timestamp', 0.0)
+        timestamps.append(timestamp)
+        game_times.append(frame_info.get('game_time', timestamp))
+        action_codes.append(frame_info['action_code'])
+        dead.append(frame_info['mario_dead'])
+        state = frame_info['mario_state']
+        if state not in state_index:
+            state_index[state] = len(state_index)
+        state_ids.append(state_index[state])
+        filenames.append(frame_info.get('frame_filename') or '')
+        offsets.append(frame_info.get('frame_offset', -1))
+
+    return {
+        'frame_id': np.array(frame_ids, dtype=np.int64),
+        'timestamp': np.array(timestamps, dtype=np.float64),
+        'game_time': np.array(game_times, dtype=np.float64),
+        'action_code': np.array(action_codes, dtype=np.int16),
+        'mario_dead': np.array(dead, dtype=bool),
+        'state_id': np.array(state_ids, dtype=np.int16),
+        'frame_filename': np.array(filenames, dtype=str),
+        'frame_offset': np.array(offsets, dtype=np.int64),
+        'state_names': np.array(list(state_index), dtype=str),
+    }
+
+
+def load_recording_columns(recording_dir, use_cache=True):
+    """读取一个录制目录的列数据
+
+    第一次解析 recording_data.json 后把列保存到 labels_cache.npz，
+    之后只要 JSON 文件的修改时间和大小不变就直接读取缓存。
+    """
+    json_path = os.path.join(recording_dir, "recording_data.json")
+    cache_path = os.path.join(recording_dir, CACHE_FILENAME)
+    stat = os.stat(json_path)
+    source = np.array([CACHE_VERSION, stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+
+    if use_cache and os.path.exists(cache_path):
+        try:
+            with np.load(cache_path) as cache:
+                if np.array_equal(cache['source'], source):
+                    return {key: cache[key] for key in cache.files if key != 'source'}
+        except (OSError, ValueError, KeyError):
+            pass
+
+    reader = RecordingReader(json_path)
+    columns = load_columns(reader)
+    columns['truncated'] = np.array(reader.truncated)
+
+    if use_cache:
+        tmp_path = cache_path + '.tmp.npz'
+        np.savez(tmp_path, source=source, **columns)
+        os.replace(tmp_path, cache_path)
+
+    return columns
+
+
+def death_status(mario_dead):
+    """计算nt标签：死亡序列的最后一帧（包括只有一帧的死亡）为0，其余为1"""
+    mario_dead = np.asarray(mario_dead, dtype=bool)
+    next_dead = np.zeros_like(mario_dead)
+    next_dead[:-1] = mario_dead[1:]
+    return np.where(mario_dead & ~next_dead, 0, 1).astype(np.int8)
+
+
+def _first_seen_counts(values):
+    """返回 (取值, 次数)，按首次出现的顺序排列"""
+    values = np.asarray(values)
+    if values.size == 0:
+        return values, np.zeros(0, dtype=np.int64)
+    uniques, first_index, counts = np.unique(values, return_index=True,
+                                             return_counts=True)
+    order = np.argsort(first_index, kind='stable')
+    return uniques[order], counts[order]
+
+
+def action_histogram(action_code):
+    """动作统计 {str(action_code): 次数}，键顺序与逐帧累加时相同"""
+    codes, counts = _first_seen_counts(action_code)
+    return {str(int(code)): int(count) for code, count in zip(codes, counts)}
+
+
+def state_histogram(state_id, state_names):
+    """状态统计 {状态名: 次数}，键顺序与逐帧累加时相同"""
+    ids, counts = _first_seen_counts(state_id)
+    return {str(state_names[i]): int(count) for i, count in zip(ids, counts)}
+
+
+def life_starts(mario_dead, game_time):
+    """每条命第一帧的掩码
+
+    死亡后重新活过来，或游戏时间出现跳变（中间是加载画面等不录制的状态）时开始新的一条命。
+    """
+    mario_dead = np.asarray(mario_dead, dtype=bool)
+    starts = np.zeros(mario_dead.shape, dtype=bool)
+    if starts.size == 0:
+        return starts
+    gaps = np.diff(game_time) > LIFE_GAP
+    starts[0] = True
+    starts[1:] = (mario_dead[:-1] & ~mario_dead[1:]) | gaps
+    return starts
+
+
+def episode_starts(mario_dead, game_time):
+    """每一局第一帧的掩码
+
+    游戏时间间隔超过 EPISODE_GAP，或者关卡重新开始但之前没有死亡（通关、回到菜单）时开始新的一局。
+    """
+    mario_dead = np.asarray(mario_dead, dtype=bool)
+    starts = np.zeros(mario_dead.shape, dtype=bool)
+    if starts.size == 0:
+        return starts
+    gaps = np.diff(game_time)
+    starts[0] = True
+    starts[1:] = (gaps > EPISODE_GAP) | ((gaps > LIFE_GAP) & ~mario_dead[:-1])
+    return starts
+
+
+def segment_ids(starts):
+    """把起始帧掩码转换成从0开始的段编号"""
+    return np.cumsum(starts, dtype=np.int32) - 1
+
+
+def frames_to_death(mario_dead, life_id):
+    """每帧距离本条命死亡（第一帧 mario_dead）还有多少帧
+
+    死亡帧为0；这条命没有以死亡结束（通关、录制结束）的帧为 -1。
+    """
+    mario_dead = np.asarray(mario_dead, dtype=bool)
+    n = mario_dead.size
+    result = np.full(n, -1, dtype=np.int32)
+    if n == 0:
+        return result
+
+    onset = mario_dead.copy()
+    onset[1:] &= ~mario_dead[:-1]
+    onset_index = np.flatnonzero(onset)
+    if onset_index.size == 0:
+        return result
+
+    index = np.arange(n)
+    nearest = np.searchsorted(onset_index, index)
+    has_next = nearest < onset_index.size
+    target = onset_index[np.minimum(nearest, onset_index.size - 1)]
+    valid = has_next & (life_id[target] == life_id)
+    result[valid] = (target - index)[valid]
+    result[mario_dead] = 0
+    return result
+
+
+def label_columns(columns):
+    """一次算出所有标签，返回新的列字典"""
+    dead = columns['mario_dead']
+    game_time = columns['game_time']
+    life_id = segment_ids(life_starts(dead, game_time))
+    return {
+        'nt': death_status(dead),
+        'life_id': life_id,
+        'episode_id': segment_ids(episode_starts(dead, game_time)),
+        'frames_to_death': frames_to_death(dead, life_id),
+    }
@@ -4,20 +4,35 @@ from . import setup,tools
 from .states import main_menu,load_screen,level1
 from . import constants as c
 from .recorder import Recorder
+from . import profiler
+from . import tracing
 
 
-def main(recording_mode=False, frame_skip=1, quality='medium'):
+def main(recording_mode=False, frame_skip=1, quality='medium', storage='png',
+         savestate_interval=0, speed=1, render_every=1, turbo=False,
+         profile=False, profile_dump=None, trace=None):
     """Add states to control here.
     
     Args:
         recording_mode (bool): 是否开启录制模式
         frame_skip (int): 帧跳过间隔，1=每帧都保存，2=每2帧保存一次
         quality (str): 图片质量 'low', 'medium', 'high'
+        storage (str): 图片存储格式 'png' 每帧一个文件, 'chunk' 分块npy
+        savestate_interval (int): 每隔多少帧保存一次关卡存档，0=不保存
+        speed (int): 每显示一帧运行多少个逻辑步（游戏速度倍数）
+        render_every (int): 每隔多少个显示帧绘制一次画面
+        turbo (bool): 不限帧率，尽快运行
+        profile (bool): 统计每帧各阶段的耗时，退出时打印报告
+        profile_dump (str): 同时用 cProfile 记录，结果写入这个文件（隐含 profile）
+        trace (str): 记录帧时间线，退出时以 Chrome trace-event JSON 写入这个文件
     """
     # 创建录制器
-    recorder = Recorder(recording_mode, frame_skip, quality)
+    recorder = Recorder(recording_mode, frame_skip, quality, storage, savestate_interval)
     
     run_it = tools.Control(setup.ORIGINAL_CAPTION, recorder)
+    run_it.speed = speed
+    run_it.render_every = render_every
+    run_it.turbo = turbo
     state_dict = {c.MAIN_MENU: main_menu.Menu(),
                   c.LOAD_SCREEN: load_screen.LoadScreen(),
                   c.TIME_OUT: load_screen.TimeOut(),
@@ -25,7 +40,21 @@ def main(recording_mode=False, frame_skip=1, quality='medium'):
                   c.LEVEL1: level1.Level1()}
 
     run_it.setup_states(state_dict, c.MAIN_MENU)
-    run_it.main()
-
-
-
+    frame_profiler = None
+    if profile or profile_dump:
+        frame_profiler = profiler.FrameProfiler(profile_dump)
+        frame_profiler.install(run_it)
+    frame_tracer = None
+    if trace:
+        frame_tracer = tracing.FrameTracer()
+        frame_tracer.install()
+    try:
+        run_it.main()
+    finally:
+        if frame_tracer:
+            frame_tracer.uninstall()
+            count = frame_tracer.write(trace)
+            print(f"时间线已写入 {trace}（{count} 个事件），可以用 Perfetto 打开")
+        if frame_profiler:
+            frame_profiler.uninstall()
+            print(frame_profiler.report(budget=1000.0 / run_it.fps))
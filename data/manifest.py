@@ -0,0 +1,236 @@
+"""
+录制完整性清单。
+
+录制结束时在录制目录下写入 manifest.json，记录每个数据文件（recording_data.json、
+statistics.json、每张PNG或每个块文件、关卡存档）的大小和 sha256。verify_recordings 用线程池
+并行计算哈希，找出缺失、被截断或内容变化的文件；没有清单的旧录制只做结构检查
+（JSON是否完整、引用的图片是否存在、PNG是否以IEND结尾）。
+"""
+
+__author__ = 'justinarmstrong'
+
+import os
+import json
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from . import frame_store
+from .recording_io import RecordingReader
+
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+DATA_FILES = ("recording_data.json", "statistics.json")
+DATA_DIRS = ("frames", frame_store.STORE_DIRNAME, "savestates")
+HASH_BLOCK_SIZE = 1 << 20
+PNG_TRAILER = b'\x00\x00\x00\x00IEND\xaeB`\x82'
+
+
+def data_files(recording_dir):
+    """录制目录中需要校验的文件（相对路径，排序后返回）"""
+    files = [name for name in DATA_FILES
+             if os.path.isfile(os.path.join(recording_dir, name))]
+    for dirname in DATA_DIRS:
+        directory = os.path.join(recording_dir, dirname)
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            if name.endswith('.tmp') or '.tmp.' in name:
+                continue
+            files.append(f"{dirname}/{name}")
+    return sorted(files)
+
+
+def file_digest(path):
+    """返回 (文件大小, sha256)"""
+    sha = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+            sha.update(block)
+            size += len(block)
+    return size, sha.hexdigest()
+
+
+def png_complete(path):
+    """PNG文件是否以IEND块结尾（被截断的PNG没有）"""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() < len(PNG_TRAILER):
+                return False
+            f.seek(-len(PNG_TRAILER), os.SEEK_END)
+            return f.read() == PNG_TRAILER
+    except OSError:
+        return False
+
+
+def load_manifest(recording_dir):
+    """读取清单，不存在或损坏时返回 None"""
+    try:
+        with open(os.path.join(recording_dir, MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_manifest(recording_dir, manifest):
+    manifest_path = os.path.join(recording_dir, MANIFEST_FILENAME)
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+
+def write_manifest(recording_dir, workers=None):
+    """计算录制目录中所有数据文件的大小和哈希，写入 manifest.json"""
+    files = data_files(recording_dir)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        digests = pool.map(file_digest, (os.path.join(recording_dir, f) for f in files))
+        entries = {name: {'size': size, 'sha256': sha}
+                   for name, (size, sha) in zip(files, digests)}
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'files': entries,
+    }
+    save_manifest(recording_dir, manifest)
+    return manifest
+
+
+def update_manifest(recording_dir, renamed=None, changed=()):
+    """重命名或修改文件后更新清单，只重新计算 changed 中文件的哈希
+
+    renamed 为 {旧相对路径: 新相对路径}。没有清单时什么都不做。
+    """
+    manifest = load_manifest(recording_dir)
+    if manifest is None:
+        return None
+
+    entries = manifest['files']
+    for old, new in (renamed or {}).items():
+        if old in entries:
+            entries[new] = entries.pop(old)
+    for name in changed:
+        path = os.path.join(recording_dir, name)
+        if os.path.exists(path):
+            size, sha = file_digest(path)
+            entries[name] = {'size': size, 'sha256': sha}
+        else:
+            entries.pop(name, None)
+
+    manifest['files'] = dict(sorted(entries.items()))
+    save_manifest(recording_dir, manifest)
+    return manifest
+
+
+def _check_file(path, expected):
+    """校验一个文件，返回问题类型，正常时返回 None"""
+    if not os.path.exists(path):
+        return 'missing'
+    if expected is None:
+        return None if not path.endswith('.png') or png_complete(path) else 'truncated'
+    if os.path.getsize(path) != expected['size']:
+        return 'size_mismatch'
+    if file_digest(path)[1] != expected['sha256']:
+        return 'hash_mismatch'
+    return None
+
+
+def _check_structure(recording_dir):
+    """没有清单时的结构检查，返回 (问题列表, 需要检查的图片)"""
+    problems = []
+    json_path = os.path.join(recording_dir, "recording_data.json")
+    if not os.path.exists(json_path):
+        return ['recording_data.json 不存在'], []
+
+    reader = RecordingReader(json_path)
+    frames = []
+    max_offset = -1
+    try:
+        for frame_info in reader:
+            if frame_info.get('frame_filename'):
+                frames.append(f"frames/{frame_info['frame_filename']}")
+            max_offset = max(max_offset, frame_info.get('frame_offset', -1))
+    except (OSError, ValueError) as e:
+        return [f'recording_data.json 无法读取: {e}'], []
+
+    if reader.truncated:
+        problems.append(f'recording_data.json 不完整 (只有 {reader.frame_count} 帧)')
+    total = (reader.recording_info or {}).get('total_frames')
+    if total is not None and total != reader.frame_count:
+        problems.append(f'帧数不一致: total_frames={total}, JSON中 {reader.frame_count} 帧')
+
+    if max_offset >= 0:
+        if not frame_store.has_store(recording_dir):
+            problems.append('chunks/store.json 不存在')
+        else:
+            try:
+                store = frame_store.FrameStore(os.path.join(recording_dir, frame_store.STORE_DIRNAME))
+            except (OSError, ValueError) as e:
+                store = None
+                problems.append(f'chunks/store.json 无法读取: {e}')
+            if store is not None and max_offset >= len(store):
+                problems.append(f'块存储只有 {len(store)} 帧, JSON引用到第 {max_offset} 帧')
+            chunks = (len(store) + store.chunk_frames - 1) // store.chunk_frames if store is not None else 0
+            for chunk_index in range(chunks):
+                try:
+                    store.chunk(chunk_index)
+                except (OSError, ValueError) as e:
+                    problems.append(f'{frame_store.chunk_filename(chunk_index)}: {e}')
+        # 已转换成块存储的录制，原PNG可能已经删除
+        frames = [f for f in frames if os.path.exists(os.path.join(recording_dir, f))]
+
+    return problems, frames
+
+
+def verify_recordings(recording_dirs, workers=None):
+    """并行校验多个录制目录，按输入顺序返回报告列表
+
+    所有录制的文件校验都提交到同一个线程池，小录制和大录制可以同时进行。
+    报告中 problems 为 [(相对路径, 问题类型)]，structure 为结构检查发现的问题。
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        jobs = []
+        for recording_dir in recording_dirs:
+            manifest = load_manifest(recording_dir)
+            job = {'recording_dir': recording_dir, 'manifest': manifest,
+                   'structure': None, 'checks': []}
+            if manifest is not None:
+                for name, expected in manifest['files'].items():
+                    path = os.path.join(recording_dir, name)
+                    job['checks'].append((name, pool.submit(_check_file, path, expected)))
+            else:
+                job['structure'] = pool.submit(_check_structure, recording_dir)
+            jobs.append(job)
+
+        # 没有清单的录制，结构检查完成后再检查其中的图片
+        for job in jobs:
+            if job['structure'] is not None:
+                job['structure'], names = job['structure'].result()
+                for name in names:
+                    path = os.path.join(job['recording_dir'], name)
+                    job['checks'].append((name, pool.submit(_check_file, path, None)))
+
+        reports = []
+        for job in jobs:
+            problems = [(name, future.result()) for name, future in job['checks']]
+            problems = [(name, problem) for name, problem in problems if problem is not None]
+            structure = job['structure'] or []
+            unlisted = []
+            if job['manifest'] is not None:
+                listed = job['manifest']['files']
+                unlisted = [f for f in data_files(job['recording_dir']) if f not in listed]
+            reports.append({
+                'recording_dir': job['recording_dir'],
+                'has_manifest': job['manifest'] is not None,
+                'files': len(job['checks']),
+                'problems': problems,
+                'structure': structure,
+                'unlisted': unlisted,
+                'ok': not problems and not structure,
+            })
+    return reports
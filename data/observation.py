@@ -0,0 +1,140 @@
+"""
+符号化观测。
+
+不需要画面的智能体可以用 ObservationEncoder 把 Level1 的状态编码成固定布局的
+float32 向量，不必调用 blit_everything。向量由两部分组成：
+
+- 马里奥: 位置和尺寸、速度、状态编号、大/火焰/无敌等标志、视口位置、剩余时间
+- 物体: 敌人、龟壳、道具、砖块（含问号砖）四类，每类取离马里奥最近的 k 个，
+  每个物体为 (存在, dx, dy, 宽, 高, x速度, y速度, 种类)，dx/dy 为物体中心相对马里奥
+  中心的偏移；不足 k 个时剩余位置全为0
+- 前方地面: 马里奥前方 1-4 格处最高的地形表面比马里奥脚下高多少像素，是坑时为
+  PIT（来自 Level1.solid_map）
+- 地形格（可选）: tile_columns > 0 时附加从马里奥所在列开始 tile_columns 列的
+  占用格，按行展开，1 为有地形
+
+feature_names() 返回每一维的名字，便于调试和保存数据集时记录布局。
+"""
+
+__author__ = 'justinarmstrong'
+
+import heapq
+
+import numpy as np
+
+from . import constants as c
+from .tilemap import TILE_SIZE
+
+MARIO_STATES = (c.STAND, c.WALK, c.JUMP, c.FALL, c.SMALL_TO_BIG, c.BIG_TO_FIRE,
+                c.BIG_TO_SMALL, c.FLAGPOLE, c.WALKING_TO_CASTLE, c.END_OF_LEVEL_FALL,
+                c.DEATH_JUMP)
+MARIO_STATE_IDS = {state: i + 1 for i, state in enumerate(MARIO_STATES)}  # 0 = 未知
+
+MARIO_FEATURES = ('x', 'y', 'width', 'height', 'x_vel', 'y_vel', 'state',
+                  'big', 'fire', 'invincible', 'hurt_invincible', 'crouching',
+                  'dead', 'facing_right', 'viewport_x', 'time')
+OBJECT_FEATURES = ('present', 'dx', 'dy', 'width', 'height', 'x_vel', 'y_vel', 'kind')
+CATEGORIES = ('enemy', 'shell', 'powerup', 'brick')
+
+# 物体种类编号，0 = 未知
+OBJECT_KINDS = {
+    c.GOOMBA: 1,
+    c.KOOPA: 2,
+    c.MUSHROOM: 1,
+    c.LIFE_MUSHROOM: 2,
+    c.FIREFLOWER: 3,
+    c.STAR: 4,
+    c.FIREBALL: 5,
+}
+BRICK, COIN_BOX, USED_BOX = 1, 2, 3
+
+GROUND_AHEAD = (1, 2, 3, 4)  # 以格为单位的距离
+PIT = -c.SCREEN_HEIGHT
+
+
+def brick_kind(sprite):
+    if sprite.state == c.OPENED:
+        return USED_BOX
+    return BRICK if getattr(sprite, 'name', None) == 'brick' else COIN_BOX
+
+
+class ObservationEncoder(object):
+    """把 Level1 编码成长度为 size 的 float32 向量
+
+    k 为每类物体保留的个数，tile_columns 为附加的地形格列数。encode 可以传入预先
+    分配的 out 数组，避免每步分配。
+    """
+    def __init__(self, k=5, tile_columns=0):
+        self.k = k
+        self.tile_columns = tile_columns
+        self.tile_rows = -(-c.SCREEN_HEIGHT // TILE_SIZE)
+        self.object_size = len(OBJECT_FEATURES)
+        self.objects_offset = len(MARIO_FEATURES)
+        self.terrain_offset = self.objects_offset + len(CATEGORIES) * k * self.object_size
+        self.tiles_offset = self.terrain_offset + len(GROUND_AHEAD)
+        self.size = self.tiles_offset + self.tile_rows * tile_columns
+
+
+    def feature_names(self):
+        names = [f"mario_{name}" for name in MARIO_FEATURES]
+        for category in CATEGORIES:
+            for i in range(self.k):
+                names.extend(f"{category}{i}_{name}" for name in OBJECT_FEATURES)
+        names.extend(f"ground_ahead{n}" for n in GROUND_AHEAD)
+        for row in range(self.tile_rows):
+            names.extend(f"tile{row}_{column}" for column in range(self.tile_columns))
+        return names
+
+
+    def encode(self, level, out=None):
+        if out is None:
+            out = np.zeros(self.size, dtype=np.float32)
+        else:
+            out.fill(0)
+
+        mario = level.mario
+        rect = mario.rect
+        out[:len(MARIO_FEATURES)] = (
+            rect.x, rect.y, rect.width, rect.height,
+            mario.x_vel, mario.y_vel, MARIO_STATE_IDS.get(mario.state, 0),
+            mario.big, mario.fire, mario.invincible, mario.hurt_invincible,
+            mario.crouching, mario.dead, mario.facing_right,
+            level.viewport.x, level.overhead_info_display.time)
+
+        offset = self.objects_offset
+        groups = (
+            (level.enemy_group, None),
+            (level.shell_group, None),
+            (level.powerup_group, None),
+            (level.brick_group.sprites() + level.coin_box_group.sprites(), brick_kind),
+        )
+        for sprites, kind in groups:
+            self.encode_nearest(out, offset, rect.centerx, rect.centery, sprites, kind)
+            offset += self.k * self.object_size
+
+        self.encode_terrain(out, level.solid_map, rect)
+        return out
+
+
+    def encode_terrain(self, out, solid_map, rect):
+        """前方地面高度和马里奥附近的地形格"""
+        for i, n in enumerate(GROUND_AHEAD):
+            top = solid_map.first_solid_below(rect.centerx + n * TILE_SIZE, 0)
+            out[self.terrain_offset + i] = PIT if top is None else rect.bottom - top
+        if self.tile_columns:
+            tiles = solid_map.tile_columns(rect.centerx, self.tile_columns)
+            out[self.tiles_offset:] = tiles[:self.tile_rows].ravel()
+
+
+    def encode_nearest(self, out, offset, cx, cy, sprites, kind):
+        """按到马里奥中心的距离取最近的 k 个物体写入 out[offset:]"""
+        nearest = heapq.nsmallest(
+            self.k, sprites,
+            key=lambda s: (s.rect.centerx - cx) ** 2 + (s.rect.centery - cy) ** 2)
+        for sprite in nearest:
+            r = sprite.rect
+            out[offset:offset + self.object_size] = (
+                1, r.centerx - cx, r.centery - cy, r.width, r.height,
+                getattr(sprite, 'x_vel', 0), getattr(sprite, 'y_vel', 0),
+                kind(sprite) if kind else OBJECT_KINDS.get(getattr(sprite, 'name', None), 0))
+            offset += self.object_size
@@ -0,0 +1,27 @@
+"""
+worker 模板进程的预加载。
+
+和 setup.py 一样，导入这个模块本身就是在做事：初始化显示、解码全部图片、加载
+全部音效（setup），导入游戏和环境的所有模块，放大关卡背景，构造存档用的素材表，
+最后做一次完整回收并 gc.freeze()。
+
+它由 workers.py 启动的 fork server 进程导入，之后从这个进程 fork 出来的 worker
+直接继承这些内存，在写入之前与模板进程共享同一份物理页（写时复制）。冻结后的
+对象不再被垃圾回收扫描，回收时就不会写它们的 gc 头，页面也不会因此被复制。
+普通进程不要导入这个模块。
+"""
+
+__author__ = 'justinarmstrong'
+
+import gc
+
+from . import setup
+from . import savestate
+from . import env  # noqa: F401  连带导入 tools、observation、frame_view 等
+from .states import level1
+
+level1.scaled_background()
+savestate.asset_table()
+
+gc.collect()
+gc.freeze()
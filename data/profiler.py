@@ -0,0 +1,199 @@
+"""
+逐帧的分阶段耗时统计（--profile）。
+
+FrameProfiler.install(control) 把下面这些方法在类上换成计时的包装，uninstall()
+换回原来的方法；不开 --profile 时代码路径上没有任何额外开销。
+
+    event_loop          Control.event_loop
+    mario               Mario.update
+    sprite_groups       精灵组的 update（敌人、龟壳、砖块、道具等）
+    mario_collisions    Level1.adjust_mario_position
+    enemy_collisions    Level1.adjust_enemy_position
+    shell_collisions    Level1.adjust_shell_position
+    powerup_collisions  Level1.adjust_powerup_position
+    blit                Level1.blit_everything（不含 overhead_draw）
+    overhead_update     OverheadInfo.update
+    overhead_draw       OverheadInfo.draw
+    sound               Sound.update
+    recorder            Recorder.record_frame / record_savestate
+    display             pg.display.update
+    idle                clock.tick 中等待下一帧的时间
+
+每个阶段记录的是自身时间：嵌套调用的阶段（如 blit 中的 overhead_draw）只算在
+最内层。整帧时间减去各阶段之和记为 other，减去 idle 记为 busy（与帧预算比较的
+是 busy）。Control.main 每显示一帧调用一次 end_frame()，第一帧（启动）不计入。
+report() 给出各阶段的平均值和百分位数。
+"""
+
+__author__ = 'justinarmstrong'
+
+import cProfile
+from array import array
+from time import perf_counter
+
+import numpy as np
+import pygame as pg
+
+from . import tools
+from . import game_sound
+from .components import info, mario
+from .recorder import Recorder
+from .states import level1
+
+PHASES = ('event_loop', 'mario', 'sprite_groups', 'mario_collisions',
+          'enemy_collisions', 'shell_collisions', 'powerup_collisions', 'blit',
+          'overhead_update', 'overhead_draw', 'sound', 'recorder', 'display', 'idle')
+
+# (所在的类或模块, 属性名, 阶段)
+TARGETS = (
+    (tools.Control, 'event_loop', 'event_loop'),
+    (mario.Mario, 'update', 'mario'),
+    (pg.sprite.Group, 'update', 'sprite_groups'),
+    (level1.Level1, 'adjust_mario_position', 'mario_collisions'),
+    (level1.Level1, 'adjust_enemy_position', 'enemy_collisions'),
+    (level1.Level1, 'adjust_shell_position', 'shell_collisions'),
+    (level1.Level1, 'adjust_powerup_position', 'powerup_collisions'),
+    (level1.Level1, 'blit_everything', 'blit'),
+    (info.OverheadInfo, 'update', 'overhead_update'),
+    (info.OverheadInfo, 'draw', 'overhead_draw'),
+    (game_sound.Sound, 'update', 'sound'),
+    (Recorder, 'record_frame', 'recorder'),
+    (Recorder, 'record_savestate', 'recorder'),
+    (pg.display, 'update', 'display'),
+)
+
+PERCENTILES = (50, 90, 99)
+
+
+def patch_method(owner, name, make_wrapper):
+    """把 owner.name 换成 make_wrapper(原方法)，返回 restore_methods 需要的记录"""
+    own = name in vars(owner)
+    original = getattr(owner, name)
+    setattr(owner, name, make_wrapper(original))
+    return owner, name, original, own
+
+
+def restore_methods(records):
+    """按相反的顺序恢复 patch_method 换掉的方法"""
+    for owner, name, original, own in reversed(records):
+        if own:
+            setattr(owner, name, original)
+        else:
+            delattr(owner, name)
+
+
+class _TimedClock(object):
+    """包装 pg.time.Clock，tick 中的等待计入 idle"""
+    def __init__(self, clock, tick):
+        self.clock = clock
+        self.tick = tick
+
+    def __getattr__(self, name):
+        return getattr(self.clock, name)
+
+
+class FrameProfiler(object):
+    """按阶段统计每一帧的耗时；dump 为文件名时同时用 cProfile 记录并写入该文件"""
+    def __init__(self, dump=None):
+        self.dump = dump
+        self.cprofile = None
+        self.index = {phase: i for i, phase in enumerate(PHASES)}
+        self.current = [0.0] * len(PHASES)
+        self.samples = [array('d') for _ in PHASES]  # 每帧各阶段的毫秒数
+        self.frame_times = array('d')
+        self.child = 0.0  # 当前调用中嵌套阶段已经计入的时间
+        self.frame_start = None
+        self.patched = []
+        self.control = None
+
+
+    def timed(self, phase, function):
+        """function 的计时包装，耗时（扣除嵌套的阶段）累加到 phase"""
+        i = self.index[phase]
+        current = self.current
+
+        def wrapper(*args, **kwargs):
+            outer = self.child
+            self.child = 0.0
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                current[i] += elapsed - self.child
+                self.child = outer + elapsed
+        wrapper.__wrapped__ = function
+        return wrapper
+
+
+    def install(self, control):
+        """开始统计：包装各阶段的方法，control.main 每帧调用 end_frame()"""
+        for owner, name, phase in TARGETS:
+            self.patched.append(patch_method(
+                owner, name, lambda function, phase=phase: self.timed(phase, function)))
+        control.clock = _TimedClock(control.clock, self.timed('idle', control.clock.tick))
+        control.profiler = self
+        self.control = control
+        if self.dump:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+
+    def uninstall(self):
+        """恢复原来的方法，写出 cProfile 结果"""
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.dump)
+            self.cprofile = None
+        restore_methods(self.patched)
+        self.patched = []
+        if self.control is not None:
+            self.control.clock = self.control.clock.clock
+            self.control.profiler = None
+            self.control = None
+
+
+    def end_frame(self):
+        """一帧结束：保存这一帧各阶段的时间并清零"""
+        now = perf_counter()
+        if self.frame_start is not None:
+            self.frame_times.append((now - self.frame_start) * 1000.0)
+            for samples, value in zip(self.samples, self.current):
+                samples.append(value * 1000.0)
+        for i in range(len(self.current)):
+            self.current[i] = 0.0
+        self.frame_start = now
+
+
+    def report(self, budget=None):
+        """各阶段每帧耗时（毫秒）的平均值、百分位数、最大值和占整帧的比例"""
+        frames = len(self.frame_times)
+        if not frames:
+            return "没有完整的帧，无法统计"
+
+        totals = np.frombuffer(self.frame_times, dtype=np.float64)
+        rows = [(phase, np.frombuffer(samples, dtype=np.float64))
+                for phase, samples in zip(PHASES, self.samples)]
+        # 帧率受限时整帧时间总是接近预算，和预算比较的是扣除 idle 之后的忙碌时间
+        busy = totals - rows[self.index['idle']][1]
+        rows.append(('other', totals - sum(values for _, values in rows)))
+        rows.append(('busy', busy))
+        rows.append(('frame', totals))
+
+        title = f"=== 帧耗时分析: {frames} 帧"
+        if budget:
+            over = int(np.count_nonzero(busy > budget))
+            title += f", 预算 {budget:.1f} ms, 忙碌时间超出 {over} 帧 ({over / frames:.1%})"
+        header = f"{'phase':<20}{'mean':>8}" + "".join(f"{'p%d' % p:>8}" for p in PERCENTILES) \
+            + f"{'max':>8}{'share':>8}"
+        lines = [title + " ===", header]
+        total_mean = totals.mean()
+        for phase, values in rows:
+            percentiles = np.percentile(values, PERCENTILES)
+            share = values.mean() / total_mean if total_mean else 0.0
+            lines.append(f"{phase:<20}{values.mean():>8.3f}"
+                         + "".join(f"{p:>8.3f}" for p in percentiles)
+                         + f"{values.max():>8.3f}{share:>8.1%}")
+        if self.dump:
+            lines.append(f"cProfile 结果已写入 {self.dump}（python -m pstats {self.dump}）")
+        return "\n".join(lines)
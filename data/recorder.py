@@ -2,9 +2,15 @@ __author__ = 'justinarmstrong'
 
 import os
 import json
+import numpy as np
 import pygame as pg
 from . import tools
 from . import constants as c
+from . import labels
+from . import frame_store
+from .frame_view import FrameView, is_bgrx
+from . import manifest
+from . import savestate
 import time
 import threading
 import queue
@@ -12,7 +18,8 @@ import queue
 class Recorder:
     """录制器类，用于记录游戏帧和玩家动作"""
     
-    def __init__(self, recording_mode=False, frame_skip=1, quality='medium'):
+    def __init__(self, recording_mode=False, frame_skip=1, quality='medium', storage='png',
+                 savestate_interval=0, root='recordings'):
         self.recording_mode = recording_mode
         self.frame_data = []
         self.frame_count = 0
@@ -20,6 +27,12 @@ class Recorder:
         self.frame_skip = frame_skip  # 帧跳过间隔，1=每帧都保存，2=每2帧保存一次
         self.quality = quality  # 图片质量: 'low', 'medium', 'high'
         self.save_frame_count = 0  # 实际保存的帧数
+        self.queued_frame_count = 0  # 已加入保存队列的帧数，用于分配文件名/帧序号
+        self.storage = storage  # 图片存储格式: 'png' 每帧一个文件, 'chunk' 分块npy
+        self.chunk_writer = None
+        self.frame_pool = []  # 分块存储时复用的 (H, W, 4) 像素缓冲区
+        self.savestate_interval = savestate_interval  # 每隔多少帧保存一次关卡存档，0=不保存
+        self.savestate_count = 0
         
         # 异步保存相关
         self.save_queue = queue.Queue()
@@ -29,12 +42,16 @@ class Recorder:
         # 创建录制目录
         if self.recording_mode:
             timestamp = int(time.time())
-            self.recording_dir = f"recordings/recording_{timestamp}"
+            self.recording_dir = f"{root}/recording_{timestamp}"
             os.makedirs(self.recording_dir, exist_ok=True)
-            os.makedirs(f"{self.recording_dir}/frames", exist_ok=True)
+            if self.storage == 'png':
+                os.makedirs(f"{self.recording_dir}/frames", exist_ok=True)
             print(f"录制模式已开启，保存路径: {self.recording_dir}")
             print(f"帧跳过间隔: {self.frame_skip} (每{self.frame_skip}帧保存一次)")
             print(f"图片质量: {self.quality}")
+            print(f"存储格式: {self.storage}")
+            if self.savestate_interval:
+                print(f"关卡存档间隔: 每{self.savestate_interval}帧")
     
     def start_recording(self):
         """开始录制"""
@@ -43,10 +60,15 @@ class Recorder:
             self.frame_data = []
             self.frame_count = 0
             self.save_frame_count = 0
+            self.queued_frame_count = 0
+            self.savestate_count = 0
+            if self.storage == 'chunk':
+                self.chunk_writer = frame_store.ChunkWriter(
+                    f"{self.recording_dir}/{frame_store.STORE_DIRNAME}")
             
             # 启动异步保存线程
             self.save_thread_running = True
-            self.save_thread = threading.Thread(target=self._save_worker)
+            self.save_thread = threading.Thread(target=self._save_worker, name='recorder-save')
             self.save_thread.daemon = True
             self.save_thread.start()
             
@@ -55,51 +77,65 @@ class Recorder:
     def stop_recording(self):
         """停止录制并保存数据"""
         if self.recording_mode and self.frame_data:
-            # 停止异步保存线程
-            self.save_thread_running = False
+            # 发送结束信号，等待队列中剩余的帧全部保存完
             if self.save_thread:
-                self.save_thread.join(timeout=5.0)  # 等待最多5秒
+                self.save_queue.put(None)
+                self.save_thread.join()
+            self.save_thread_running = False
+            if self.chunk_writer:
+                self.chunk_writer.close()
             
             self.save_recording_data()
+            manifest.write_manifest(self.recording_dir)
             print(f"录制完成！共录制 {self.frame_count} 帧")
             print(f"实际保存图片 {self.save_frame_count} 张")
+            if self.savestate_count:
+                print(f"关卡存档 {self.savestate_count} 个")
             print(f"数据已保存到: {self.recording_dir}")
     
     def _save_worker(self):
-        """异步保存工作线程"""
-        while self.save_thread_running:
-            try:
-                # 从队列中获取保存任务
-                save_task = self.save_queue.get(timeout=0.1)
-                if save_task is None:  # 结束信号
-                    break
-                
-                surface, frame_path, frame_info = save_task
-                
-                # 执行实际的保存操作
-                try:
-                    if self.quality == 'high':
-                        pg.image.save(surface, frame_path)
-                    else:
-                        surface_to_save = self.prepare_surface_for_save(surface)
-                        pg.image.save(surface_to_save, frame_path)
-                    
-                    frame_info['frame_filename'] = f"frame_{self.save_frame_count:06d}.png"
-                    self.save_frame_count += 1
-                except Exception as e:
-                    print(f"保存图片失败: {e}")
-                    frame_info['frame_filename'] = None
-                
+        """异步保存工作线程，收到结束信号前会把队列中的帧全部保存"""
+        while True:
+            save_task = self.save_queue.get()
+            if save_task is None:  # 结束信号
                 self.save_queue.task_done()
-                
-            except queue.Empty:
-                continue
-            except Exception as e:
-                print(f"保存线程错误: {e}")
                 break
+            
+            self._save_frame(*save_task)
+            self.save_queue.task_done()
+    
+    def _save_frame(self, surface, frame_path, frame_info):
+        """在保存线程中保存一帧图片，结果写回 frame_info"""
+        try:
+            if isinstance(surface, np.ndarray):
+                # 分块存储: surface 是复用的原始像素缓冲区 (B, G, R, X)
+                frame_info['frame_offset'] = self.chunk_writer.append(
+                    self.pixels_to_frame(surface))
+                self.frame_pool.append(surface)
+            else:
+                if self.quality == 'high':
+                    surface_to_save = surface
+                else:
+                    surface_to_save = self.prepare_surface_for_save(surface)
+                
+                if self.chunk_writer:
+                    frame = frame_store.surface_to_array(surface_to_save)
+                    frame_info['frame_offset'] = self.chunk_writer.append(frame)
+                else:
+                    pg.image.save(surface_to_save, frame_path)
+                    frame_info['frame_filename'] = os.path.basename(frame_path)
+            self.save_frame_count += 1
+        except Exception as e:
+            print(f"保存图片失败: {e}")
+            frame_info['frame_filename'] = None
+            frame_info.pop('frame_offset', None)
     
-    def record_frame(self, keys, mario_state, mario_dead, screen_surface):
-        """记录当前帧的数据"""
+    def record_frame(self, keys, mario_state, mario_dead, screen_surface, current_time=None):
+        """记录当前帧的数据
+
+        current_time 为游戏时间（毫秒）。timestamp 是墙钟时间，--speed / --turbo 下会被
+        压缩；game_time 按固定步长前进，标签用它判断中间是否离开了关卡。
+        """
         if not self.recording_mode:
             return
         
@@ -110,9 +146,11 @@ class Recorder:
         should_save_frame = (self.frame_count % self.frame_skip == 0)
         
         # 记录帧数据（每帧都记录，但图片可能跳过）
+        timestamp = time.time() - self.start_time if self.start_time else 0
         frame_info = {
             'frame_id': self.frame_count,
-            'timestamp': time.time() - self.start_time if self.start_time else 0,
+            'timestamp': timestamp,
+            'game_time': current_time / 1000.0 if current_time is not None else timestamp,
             'action_code': action_code,
             'action_binary': bin(action_code),
             'action_names': self.decode_action(action_code),
@@ -123,11 +161,14 @@ class Recorder:
         
         # 如果需要保存图片
         if should_save_frame:
-            frame_filename = f"frame_{self.save_frame_count:06d}.png"
+            # 文件名在入队时分配，队列中还没保存的帧不会拿到同一个文件名
+            frame_filename = f"frame_{self.queued_frame_count:06d}.png"
             frame_path = f"{self.recording_dir}/frames/{frame_filename}"
+            frame_info['frame_filename'] = None
+            self.queued_frame_count += 1
             
-            # 创建surface的副本用于异步保存
-            surface_copy = screen_surface.copy()
+            # 创建画面的副本用于异步保存
+            surface_copy = self.copy_screen(screen_surface)
             
             # 将保存任务加入队列
             try:
@@ -142,6 +183,53 @@ class Recorder:
         self.frame_data.append(frame_info)
         self.frame_count += 1
     
+    def will_save_frame(self):
+        """下一次 record_frame 是否会保存图片"""
+        return self.recording_mode and self.frame_count % self.frame_skip == 0
+    
+    def record_savestate(self, level, current_time):
+        """每隔 savestate_interval 帧保存一次关卡存档，在 record_frame 之后调用
+        
+        存档是这一帧更新完之后的状态，文件名记录在这一帧的 'savestate' 字段中。
+        """
+        if not self.recording_mode or not self.savestate_interval or not self.frame_data:
+            return
+        frame_info = self.frame_data[-1]
+        if frame_info['frame_id'] % self.savestate_interval != 0:
+            return
+        
+        try:
+            data = savestate.snapshot(level, current_time, frame_info['frame_id'])
+            frame_info['savestate'] = savestate.save_savestate(
+                self.recording_dir, frame_info['frame_id'], data)
+            self.savestate_count += 1
+        except Exception as e:
+            print(f"保存关卡存档失败: {e}")
+    
+    def copy_screen(self, surface):
+        """复制要异步保存的画面
+        
+        分块存储且画面按 B, G, R, X 排列时，直接把像素复制进复用的缓冲区，不创建新的
+        surface；其它像素格式（如 RGBX 掩码的显示画面）返回 surface 的副本，按颜色转换。
+        """
+        if not self.chunk_writer or not is_bgrx(surface):
+            return surface.copy()
+        width, height = surface.get_size()
+        pixels = self.frame_pool.pop() if self.frame_pool else None
+        if pixels is None or pixels.shape != (height, width, 4):
+            pixels = np.empty((height, width, 4), dtype=np.uint8)
+        with FrameView(surface) as view:
+            view.copy_raw(pixels)
+        return pixels
+    
+    def pixels_to_frame(self, pixels):
+        """copy_screen 复制的 B, G, R, X 像素转为要写入块文件的 (H, W, 3) 帧（按质量设置缩放）"""
+        if self.quality == 'high':
+            return pixels[..., 2::-1]
+        height, width = pixels.shape[:2]
+        surface = pg.image.frombuffer(pixels, (width, height), 'BGRA')
+        return frame_store.surface_to_array(self.prepare_surface_for_save(surface))
+    
     def encode_action(self, keys):
         """将键盘输入编码为动作值
         编码规则：每一帧的动作 = 所有按下键的位或运算（OR运算）
@@ -211,7 +299,9 @@ class Recorder:
                 'total_frames': self.frame_count,
                 'duration': time.time() - self.start_time if self.start_time else 0,
                 'recording_time': time.strftime('%Y-%m-%d %H:%M:%S'),
-                'game_version': 'Mario Level 1'
+                'game_version': 'Mario Level 1',
+                'frame_storage': self.storage,
+                'savestate_interval': self.savestate_interval
             },
             'frame_data': self.frame_data
         }
@@ -226,30 +316,15 @@ class Recorder:
     
     def save_action_statistics(self):
         """保存动作统计信息"""
-        action_counts = {}
-        state_counts = {}
-        
-        for frame in self.frame_data:
-            action_key = str(frame['action_code'])
-            if action_key not in action_counts:
-                action_counts[action_key] = 0
-            action_counts[action_key] += 1
-            
-            state_key = frame['mario_state']
-            if state_key not in state_counts:
-                state_counts[state_key] = 0
-            state_counts[state_key] += 1
+        columns = labels.load_columns(self.frame_data)
+        action_counts = labels.action_histogram(columns['action_code'])
+        state_counts = labels.state_histogram(columns['state_id'], columns['state_names'])
         
         stats = {
             'action_statistics': action_counts,
             'state_statistics': state_counts,
             'action_descriptions': {
-                str(self.encode_action({tools.keybinding['left']: True})): "LEFT",
-                str(self.encode_action({tools.keybinding['right']: True})): "RIGHT",
-                str(self.encode_action({tools.keybinding['jump']: True})): "JUMP",
-                str(self.encode_action({tools.keybinding['action']: True})): "ACTION",
-                str(self.encode_action({tools.keybinding['down']: True})): "DOWN",
-                "0": "NONE"
+                str(code): self.decode_action(code)[0] for code in (1, 2, 4, 8, 16, 0)
             }
         }
         
@@ -0,0 +1,188 @@
+"""
+流式读写 recording_data.json。
+
+RecordingReader 逐条返回 frame_data 中的帧记录，内存占用只和单帧大小有关，
+与录制时长无关。文件被截断（例如录制进程被强制结束）时，读到最后一个完整的
+帧记录后干净地停止，不需要修补括号。
+"""
+
+__author__ = 'justinarmstrong'
+
+import os
+import glob
+import json
+
+CHUNK_SIZE = 1 << 16        # 每次从文件读取的字符数
+MAX_RECORD_SIZE = 1 << 20   # 单条记录的上限，超过则认为文件已损坏
+WHITESPACE = ' \t\n\r'
+
+
+class _Truncated(Exception):
+    """文件在一条完整记录之前结束或损坏"""
+    pass
+
+
+class RecordingReader(object):
+    """增量解析 recording_data.json
+
+    用法:
+        reader = RecordingReader(json_path)
+        for frame_info in reader:
+            ...
+        reader.recording_info   # 录制信息（通常在第一帧之前就已解析）
+        reader.truncated        # 文件是否在中途被截断
+    """
+    def __init__(self, json_path, chunk_size=CHUNK_SIZE):
+        self.json_path = json_path
+        self.chunk_size = chunk_size
+        self.header = {}
+        self.recording_info = None
+        self.truncated = False
+        self.frame_count = 0
+        self.decoder = json.JSONDecoder()
+
+
+    def __iter__(self):
+        return self.iter_frames()
+
+
+    def read_header(self):
+        """只解析 frame_data 之前的内容（recording_info），不读取帧数据"""
+        for _ in self.iter_frames():
+            break
+        return self.recording_info
+
+
+    def iter_frames(self):
+        """逐条返回 frame_data 中的帧记录"""
+        self.header = {}
+        self.recording_info = None
+        self.truncated = False
+        self.frame_count = 0
+
+        with open(self.json_path, 'r', encoding='utf-8') as f:
+            self.file = f
+            self.buf = ''
+            self.pos = 0
+            self.eof = False
+
+            try:
+                self.expect('{')
+                while True:
+                    char = self.peek()
+                    if char == '}':
+                        return
+                    if char == ',':
+                        self.pos += 1
+                        continue
+
+                    key = self.decode_value()
+                    self.expect(':')
+                    if key == 'frame_data':
+                        for frame_info in self.iter_array():
+                            self.frame_count += 1
+                            yield frame_info
+                    else:
+                        self.header[key] = self.decode_value()
+                        if key == 'recording_info':
+                            self.recording_info = self.header[key]
+            except _Truncated:
+                self.truncated = True
+            finally:
+                self.file = None
+                self.buf = ''
+
+
+    def iter_array(self):
+        """逐个返回JSON数组中的元素"""
+        self.expect('[')
+        while True:
+            char = self.peek()
+            if char == ']':
+                self.pos += 1
+                return
+            if char == ',':
+                self.pos += 1
+                continue
+            yield self.decode_value()
+
+
+    def fill(self):
+        """从文件再读一块数据，丢弃已经解析过的部分"""
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+
+    def peek(self):
+        """跳过空白，返回下一个字符"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                raise _Truncated()
+
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise _Truncated()
+        self.pos += 1
+
+
+    def decode_value(self):
+        """解析下一个完整的JSON值，数据不够时继续读取"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # 数字等值可能刚好在缓冲区末尾被截开，需要读到更多数据再确认
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof or len(self.buf) - self.pos > MAX_RECORD_SIZE:
+                    raise _Truncated()
+            self.fill()
+
+
+def discover_recordings(root="recordings"):
+    """查找根目录下所有 recording_* 录制目录"""
+    pattern = os.path.join(root, "recording_*")
+    return sorted(d for d in glob.glob(pattern) if os.path.isdir(d))
+
+
+def iter_frame_data(json_path):
+    """逐条返回录制文件中的帧记录"""
+    return iter(RecordingReader(json_path))
+
+
+def write_recording_data(json_path, recording_info, frames):
+    """流式写出 recording_data.json，格式与 json.dump(indent=2) 相同
+
+    frames 可以是生成器，写出过程中不会把所有帧放进内存。返回写出的帧数。
+    """
+    count = 0
+
+    with open(json_path, 'w', encoding='utf-8') as f:
+        info_text = json.dumps(recording_info, indent=2, ensure_ascii=False)
+        f.write('{\n  "recording_info": ')
+        f.write(info_text.replace('\n', '\n  '))
+        f.write(',\n  "frame_data": [')
+
+        for frame_info in frames:
+            frame_text = json.dumps(frame_info, indent=2, ensure_ascii=False)
+            f.write(',\n    ' if count else '\n    ')
+            f.write(frame_text.replace('\n', '\n    '))
+            count += 1
+
+        f.write('\n  ]\n}' if count else ']\n}')
+
+    return count
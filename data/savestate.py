@@ -0,0 +1,297 @@
+"""
+关卡存档（savestate）。
+
+录制时每隔 N 帧把 Level1 的完整状态（马里奥、所有精灵和精灵组、视口、game_info、
+计时器、分数动画等）序列化到录制目录的 savestates/ 下，文件名带 frame_id。
+训练或评估时可以从任意一个存档直接恢复到无头模拟中，不必从关卡开头重放。
+
+精灵图片不能直接 pickle。存档时每张图片按内容算出一个键：各组件类新建时就会
+生成的图片（素材表，两边用同样的代码构造，结果一致）只写键；其它图片把像素
+写进存档。setup.GFX 中的精灵表和音效按名字引用。关卡背景和绘制用的画布不进存档，
+恢复时重新生成。计时器记录的都是游戏时间的绝对值，恢复时用 Control.set_time 接上存档时刻，
+不需要逐个修改计时器。
+"""
+
+__author__ = 'justinarmstrong'
+
+import io
+import os
+import re
+import zlib
+import pickle
+import hashlib
+import weakref
+
+import pygame as pg
+
+from . import setup
+from . import constants as c
+from . import game_sound
+from . import tilemap
+
+SAVESTATE_VERSION = 2  # 2: 状态改为整数编号
+SAVESTATE_DIRNAME = "savestates"
+SAVESTATE_PATTERN = re.compile(r'^state_(\d+)\.sav$')
+
+# 不进存档的 Level1 属性：背景和画布、地形占用图恢复时重新生成，声音管理器只保存
+# 状态，对象池只属于本进程中的实例
+LEVEL_SHARED = ('background', 'level')
+LEVEL_EXCLUDED = ('sound_manager', 'pool', 'solid_map')
+
+_asset_table = None
+_surface_keys = weakref.WeakKeyDictionary()
+_surface_blobs = weakref.WeakKeyDictionary()
+
+
+def savestate_filename(frame_id):
+    return f"state_{frame_id:06d}.sav"
+
+
+def surface_key(surface):
+    """图片的内容键：尺寸、透明方式和像素哈希。图片创建后不再修改，按对象缓存"""
+    key = _surface_keys.get(surface)
+    if key is None:
+        srcalpha = bool(surface.get_flags() & pg.SRCALPHA)
+        pixels = pg.image.tobytes(surface, 'RGBA')
+        key = (surface.get_size(), srcalpha, surface.get_colorkey(), surface.get_alpha(),
+               hashlib.sha1(pixels).hexdigest())
+        _surface_keys[surface] = key
+    return key
+
+
+def surface_blob(surface):
+    """不在素材表中的图片写进存档的压缩像素，同样按对象缓存"""
+    blob = _surface_blobs.get(surface)
+    if blob is None:
+        blob = zlib.compress(pg.image.tobytes(surface, 'RGBA'), 1)
+        _surface_blobs[surface] = blob
+    return blob
+
+
+def _template_objects():
+    """每个组件类各建一个实例，它们的图片组成素材表"""
+    from .components import (bricks, castle_flag, checkpoint, coin, coin_box, collider,
+                             enemies, flagpole, flashing_coin, info, mario, powerups, score)
+    game_info = {c.COIN_TOTAL: 0,
+                 c.SCORE: 0,
+                 c.LIVES: 3,
+                 c.TOP_SCORE: 0,
+                 c.CURRENT_TIME: 0.0,
+                 c.LEVEL_STATE: None,
+                 c.CAMERA_START_X: 0,
+                 c.MARIO_DEAD: False}
+    return [mario.Mario(),
+            enemies.Goomba(), enemies.Koopa(),
+            bricks.Brick(0, 0), bricks.BrickPiece(0, 0, 0, 0),
+            coin_box.Coin_box(0, 0), coin.Coin(0, 0, []), flashing_coin.Coin(0, 0),
+            powerups.Mushroom(0, 0), powerups.LifeMushroom(0, 0), powerups.FireFlower(0, 0),
+            powerups.Star(0, 0), powerups.FireBall(0, 0, True),
+            flagpole.Flag(0, 0), flagpole.Pole(0, 0), flagpole.Finial(0, 0),
+            castle_flag.Flag(0, 0), checkpoint.Checkpoint(0, 'checkpoint'),
+            collider.Collider(0, 0, 1, 1),
+            score.Score(0, 0, 100), info.OverheadInfo(game_info, c.LEVEL)]
+
+
+class _SurfaceCollector(pickle.Pickler):
+    """只为了找出对象中引用到的所有图片"""
+    def __init__(self, file):
+        super(_SurfaceCollector, self).__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.surfaces = []
+        self.named = _named_objects()
+
+    def persistent_id(self, obj):
+        if id(obj) in self.named:
+            return 'named'
+        if isinstance(obj, pg.Surface):
+            self.surfaces.append(obj)
+            return 'surface'
+        if isinstance(obj, pg.mask.Mask):
+            return 'mask'
+        return None
+
+
+def asset_table():
+    """素材表: {内容键: 图片}，第一次使用时构造"""
+    global _asset_table
+    if _asset_table is None:
+        collector = _SurfaceCollector(io.BytesIO())
+        collector.dump(_template_objects())
+        _asset_table = {}
+        for surface in collector.surfaces:
+            _asset_table.setdefault(surface_key(surface), surface)
+    return _asset_table
+
+
+def _named_objects():
+    """按名字引用的共享对象: {id: (类别, 名字)}"""
+    named = {}
+    for name, surface in setup.GFX.items():
+        named[id(surface)] = ('gfx', name)
+    for name, sound in setup.SFX.items():
+        named[id(sound)] = ('sfx', name)
+    return named
+
+
+class _SnapshotPickler(pickle.Pickler):
+    def __init__(self, file, shared):
+        super(_SnapshotPickler, self).__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.named = _named_objects()
+        for name, obj in shared.items():
+            self.named[id(obj)] = ('shared', name)
+        self.assets = asset_table()
+        self.blobs = {}
+
+    def persistent_id(self, obj):
+        ref = self.named.get(id(obj))
+        if ref is not None:
+            return ref
+        if isinstance(obj, pg.Surface):
+            key = surface_key(obj)
+            if key not in self.assets and key not in self.blobs:
+                self.blobs[key] = surface_blob(obj)
+            return ('surface', key)
+        if isinstance(obj, pg.mask.Mask):
+            bits = pg.image.tobytes(obj.to_surface(), 'RGB')
+            return ('mask', obj.get_size(), zlib.compress(bits))
+        return None
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    def __init__(self, file, shared, blobs):
+        super(_SnapshotUnpickler, self).__init__(file)
+        self.shared = shared
+        self.blobs = blobs
+        self.assets = asset_table()
+        self.surfaces = {}
+
+    def persistent_load(self, pid):
+        kind = pid[0]
+        if kind == 'gfx':
+            return setup.GFX[pid[1]]
+        if kind == 'sfx':
+            return setup.SFX[pid[1]]
+        if kind == 'shared':
+            return self.shared[pid[1]]
+        if kind == 'surface':
+            key = pid[1]
+            if key in self.assets:
+                return self.assets[key]
+            if key not in self.surfaces:
+                self.surfaces[key] = self.load_surface(key)
+            return self.surfaces[key]
+        if kind == 'mask':
+            size, bits = pid[1], zlib.decompress(pid[2])
+            surface = pg.image.frombytes(bits, size, 'RGB')
+            return pg.mask.from_threshold(surface, (255, 255, 255), (1, 1, 1, 255))
+        raise pickle.UnpicklingError(f"未知的存档引用: {kind}")
+
+    def load_surface(self, key):
+        size, srcalpha, colorkey, alpha = key[:4]
+        surface = pg.image.frombytes(zlib.decompress(self.blobs[key]), size, 'RGBA')
+        if srcalpha:
+            surface = surface.convert_alpha()
+        else:
+            surface = surface.convert()
+            if colorkey is not None:
+                surface.set_colorkey(colorkey)
+            if alpha is not None:
+                surface.set_alpha(alpha)
+        return surface
+
+
+def snapshot(level, current_time, frame_id=None):
+    """把 Level1 的当前状态打包成可写入文件的字节串"""
+    shared = {name: getattr(level, name) for name in LEVEL_SHARED}
+    attrs = {name: value for name, value in vars(level).items()
+             if name not in LEVEL_SHARED and name not in LEVEL_EXCLUDED}
+
+    buffer = io.BytesIO()
+    pickler = _SnapshotPickler(buffer, shared)
+    pickler.dump(attrs)
+
+    state = {
+        'version': SAVESTATE_VERSION,
+        'frame_id': frame_id,
+        'current_time': current_time,
+        'sound_state': getattr(level.sound_manager, 'state', None),
+        'level': buffer.getvalue(),
+        'blobs': pickler.blobs,
+    }
+    return zlib.compress(pickle.dumps(state, pickle.HIGHEST_PROTOCOL), 1)
+
+
+def load_snapshot(data):
+    """解析 snapshot() 的结果（或存档文件路径），返回存档字典"""
+    if isinstance(data, str):
+        with open(data, 'rb') as f:
+            data = f.read()
+    state = pickle.loads(zlib.decompress(data))
+    if state.get('version') != SAVESTATE_VERSION:
+        raise ValueError(f"不支持的存档版本: {state.get('version')}")
+    return state
+
+
+def restore_level(level, state):
+    """把存档恢复到一个 Level1 实例上（实例之前是否 startup 过都可以）"""
+    if isinstance(state, (bytes, str)):
+        state = load_snapshot(state)
+
+    # 背景和画布与关卡进度无关，重新生成
+    level.game_info = {c.CAMERA_START_X: 0}
+    level.setup_background()
+    shared = {name: getattr(level, name) for name in LEVEL_SHARED}
+
+    unpickler = _SnapshotUnpickler(io.BytesIO(state['level']), shared, state['blobs'])
+    vars(level).update(unpickler.load())
+
+    level.solid_map = tilemap.SolidMap(level.ground_step_pipe_group, level.level_rect.size)
+    level.sound_manager = game_sound.Sound(level.overhead_info_display)
+    if state['sound_state'] is not None:
+        level.sound_manager.state = state['sound_state']
+    return level
+
+
+def restore(control, state):
+    """恢复存档并让 Control 从存档时刻继续运行关卡"""
+    if isinstance(state, (bytes, str)):
+        state = load_snapshot(state)
+    level = restore_level(control.state_dict[c.LEVEL1], state)
+    control.state_name = c.LEVEL1
+    control.state = level
+    control.set_time(state['current_time'])
+    return level
+
+
+def save_savestate(recording_dir, frame_id, data):
+    """把存档写入 <录制目录>/savestates/，返回相对于录制目录的路径"""
+    directory = os.path.join(recording_dir, SAVESTATE_DIRNAME)
+    os.makedirs(directory, exist_ok=True)
+    filename = savestate_filename(frame_id)
+    path = os.path.join(directory, filename)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)
+    return f"{SAVESTATE_DIRNAME}/{filename}"
+
+
+def list_savestates(recording_dir):
+    """返回 {frame_id: 存档路径}，按 frame_id 排序"""
+    directory = os.path.join(recording_dir, SAVESTATE_DIRNAME)
+    if not os.path.isdir(directory):
+        return {}
+    found = {}
+    for name in os.listdir(directory):
+        match = SAVESTATE_PATTERN.match(name)
+        if match:
+            found[int(match.group(1))] = os.path.join(directory, name)
+    return dict(sorted(found.items()))
+
+
+def nearest_savestate(recording_dir, frame_id):
+    """frame_id 之前（含）最近的存档，返回 (存档帧ID, 路径)，没有时返回 None"""
+    best = None
+    for saved_id, path in list_savestates(recording_dir).items():
+        if saved_id > frame_id:
+            break
+        best = (saved_id, path)
+    return best
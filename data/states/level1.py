@@ -1,10 +1,14 @@
 from __future__ import division
 
 
+import functools
+
 import pygame as pg
 from .. import setup, tools
 from .. import constants as c
 from .. import game_sound
+from .. import broadphase
+from .. import tilemap
 from .. components import mario
 from .. components import collider
 from .. components import bricks
@@ -17,9 +21,20 @@ from .. components import score
 from .. components import castle_flag
 
 
+@functools.lru_cache(maxsize=None)
+def scaled_background():
+    """放大后的关卡背景。只读，所有 Level1 实例和存档恢复共用一份"""
+    background = setup.GFX['level_1']
+    back_rect = background.get_rect()
+    return pg.transform.scale(background,
+                              (int(back_rect.width*c.BACKGROUND_MULTIPLER),
+                              int(back_rect.height*c.BACKGROUND_MULTIPLER)))
+
+
 class Level1(tools._State):
     def __init__(self):
         tools._State.__init__(self)
+        self.pool = None
 
     def startup(self, current_time, persist):
         """Called when the State object is created"""
@@ -36,31 +51,45 @@ class Level1(tools._State):
         self.flag_score_total = 0
 
         self.moving_score_list = []
-        self.overhead_info_display = info.OverheadInfo(self.game_info, c.LEVEL)
-        self.sound_manager = game_sound.Sound(self.overhead_info_display)
 
-        self.setup_background()
-        self.setup_ground()
-        self.setup_pipes()
-        self.setup_steps()
-        self.setup_bricks()
-        self.setup_coin_boxes()
-        self.setup_flag_pole()
-        self.setup_enemies()
-        self.setup_checkpoints()
-        self.setup_mario()
+        if self.pool is None:
+            self.overhead_info_display = info.OverheadInfo(self.game_info, c.LEVEL)
+            self.sound_manager = game_sound.Sound(self.overhead_info_display)
+
+            before = dict(vars(self))
+            self.setup_background()
+            self.setup_ground()
+            self.setup_pipes()
+            self.setup_steps()
+            self.setup_bricks()
+            self.setup_coin_boxes()
+            self.setup_flag_pole()
+            self.setup_enemies()
+            self.setup_checkpoints()
+            self.setup_mario()
+
+            self.setup_spritegroups()
+            self.pool = tools.ObjectPool(self, [name for name, value in vars(self).items()
+                                                if before.get(name) is not value])
+        else:
+            self.reset_from_pool()
+
 
-        self.setup_spritegroups()
+    def reset_from_pool(self):
+        """之后的每条命不重新创建关卡对象：第一次 startup 建好的精灵、精灵组、
+        画布和信息栏原地恢复到初始状态，马里奥按 CAMERA_START_X 重新放置"""
+        self.pool.restore()
+        self.overhead_info_display.reset(self.game_info, c.LEVEL)
+        self.sound_manager.reset(self.overhead_info_display)
+        self.viewport.x = self.game_info[c.CAMERA_START_X]
+        self.mario.reset_image_alpha()
+        self.place_mario()
 
 
     def setup_background(self):
         """Sets the background image, rect and scales it to the correct
         proportions"""
-        self.background = setup.GFX['level_1']
-        self.back_rect = self.background.get_rect()
-        self.background = pg.transform.scale(self.background,
-                                  (int(self.back_rect.width*c.BACKGROUND_MULTIPLER),
-                                  int(self.back_rect.height*c.BACKGROUND_MULTIPLER)))
+        self.background = scaled_background()
         self.back_rect = self.background.get_rect()
         width = self.back_rect.width
         height = self.back_rect.height
@@ -310,6 +339,11 @@ class Level1(tools._State):
     def setup_mario(self):
         """Places Mario at the beginning of the level"""
         self.mario = mario.Mario()
+        self.place_mario()
+
+
+    def place_mario(self):
+        """Puts Mario on the ground at the left of the screen"""
         self.mario.rect.x = self.viewport.x + 110
         self.mario.rect.bottom = c.GROUND_HEIGHT
 
@@ -350,27 +384,35 @@ class Level1(tools._State):
         self.mario_and_enemy_group = pg.sprite.Group(self.mario,
                                                      self.enemy_group)
 
+        self.solid_map = tilemap.SolidMap(self.ground_step_pipe_group,
+                                          self.level_rect.size)
+
 
     def update(self, surface, keys, current_time):
         """Updates Entire level using states.  Called by the control object"""
         self.game_info[c.CURRENT_TIME] = self.current_time = current_time
         self.handle_states(keys)
         self.check_if_time_out()
-        self.blit_everything(surface)
+        if self.render:
+            self.blit_everything(surface)
         self.sound_manager.update(self.game_info, self.mario)
 
 
 
+    # 状态编号 -> 处理方法名，handle_states 按表分派
+    state_handlers = {
+        c.FROZEN: 'update_during_transition_state',
+        c.NOT_FROZEN: 'update_all_sprites',
+        c.IN_CASTLE: 'update_while_in_castle',
+        c.FLAG_AND_FIREWORKS: 'update_flag_and_fireworks',
+    }
+
+
     def handle_states(self, keys):
         """If the level is in a FROZEN state, only mario will update"""
-        if self.state == c.FROZEN:
-            self.update_during_transition_state(keys)
-        elif self.state == c.NOT_FROZEN:
-            self.update_all_sprites(keys)
-        elif self.state == c.IN_CASTLE:
-            self.update_while_in_castle()
-        elif self.state == c.FLAG_AND_FIREWORKS:
-            self.update_flag_and_fireworks()
+        handler = self.state_handlers.get(self.state)
+        if handler is not None:
+            getattr(self, handler)(keys)
 
 
     def update_during_transition_state(self, keys):
@@ -436,9 +478,7 @@ class Level1(tools._State):
 
             for i in range(1,11):
                 if checkpoint.name == str(i):
-                    for index, enemy in enumerate(self.enemy_group_list[i -1]):
-                        enemy.rect.x = self.viewport.right + (index * 60)
-                    self.enemy_group.add(self.enemy_group_list[i-1])
+                    self.spawn_enemy_group(i)
 
             if checkpoint.name == '11':
                 self.mario.state = c.FLAGPOLE
@@ -448,6 +488,8 @@ class Level1(tools._State):
                     self.mario.rect.bottom = self.flag.rect.y
                 self.flag.state = c.SLIDE_DOWN
                 self.create_flag_points()
+                if self.fast_forward:
+                    self.skip_to_end_of_level()
 
             elif checkpoint.name == '12':
                 self.state = c.IN_CASTLE
@@ -472,6 +514,71 @@ class Level1(tools._State):
             self.mario_and_enemy_group.add(self.enemy_group)
 
 
+    def spawn_enemy_group(self, i):
+        """Places the enemies of checkpoint i just off the right edge of
+        the screen and adds them to self.enemy_group"""
+        for index, enemy in enumerate(self.enemy_group_list[i-1]):
+            enemy.rect.x = self.viewport.right + (index * 60)
+        self.enemy_group.add(self.enemy_group_list[i-1])
+
+
+    def set_start_state(self, x, power=c.SMALL):
+        """从关卡中任意位置开始，在 startup 之后调用。
+
+        马里奥放在 x 处最高的地面、管道或台阶上，能力为 c.SMALL / c.BIG / c.FIRE；
+        视口与 setup_mario 一致，马里奥位于画面左侧 110 像素处（到关卡边缘时截止）。
+        x 之前的检查点视为已经触发：仍在画面内的最后一个检查点的敌人像刚触发时
+        一样出现在画面右侧，更早的敌人视为已经离开。x 必须在旗杆之前。
+        """
+        if power not in c.MARIO_POWERS:
+            raise ValueError(f"未知的能力状态: {power}")
+        flag_x = min(checkpoint.rect.x for checkpoint in self.check_point_group
+                     if checkpoint.name == '11')
+        if not 0 <= x < flag_x - self.mario.rect.width:
+            raise ValueError(f"起点 x={x} 不在关卡范围内 (0 ~ {flag_x})")
+
+        if power != c.SMALL:
+            self.mario.become_big()
+            self.mario.fire = power == c.FIRE
+            self.mario.check_if_fire()
+            self.mario.image = self.mario.right_frames[0]
+            self.convert_mushrooms_to_fireflowers()
+
+        supports = [self.solid_map.first_solid_below(column, 0)
+                    for column in range(x, x + self.mario.rect.width)]
+        supports = [top for top in supports if top is not None]
+        if not supports:
+            raise ValueError(f"起点 x={x} 处没有可以站立的地面")
+        self.mario.rect.x = x
+        self.mario.rect.bottom = min(supports)
+
+        highest = self.level_rect.w - self.viewport.w
+        self.viewport.x = max(0, min(highest, x - 110))
+
+        last = None
+        for checkpoint in self.check_point_group.sprites():
+            if checkpoint.name.isdigit() and int(checkpoint.name) <= 10 \
+                    and checkpoint.rect.right <= x:
+                checkpoint.kill()
+                if last is None or checkpoint.rect.x > last.rect.x:
+                    last = checkpoint
+        if last is not None and last.rect.x >= self.viewport.x:
+            self.spawn_enemy_group(int(last.name))
+        self.mario_and_enemy_group.add(self.enemy_group)
+
+
+    def skip_to_end_of_level(self):
+        """快进时碰到旗杆直接结束关卡：立即加上旗杆分和剩余时间的奖励分
+        (与倒计时每秒50分相同)，跳过滑旗、走进城堡和烟花"""
+        self.game_info[c.SCORE] += self.flag_score_total
+        self.game_info[c.SCORE] += self.overhead_info_display.time * 50
+        self.flag_score_total = 0
+        self.set_game_info_values()
+        self.next = c.GAME_OVER
+        self.sound_manager.stop_music()
+        self.done = True
+
+
     def create_flag_points(self):
         """Creates the points that appear when Mario touches the
         flag pole"""
@@ -521,7 +628,7 @@ class Level1(tools._State):
 
     def check_mario_x_collisions(self):
         """Check for collisions after Mario is moved on the x axis"""
-        collider = pg.sprite.spritecollideany(self.mario, self.ground_step_pipe_group)
+        collider = self.solid_map.collide(self.mario.rect)
         coin_box = pg.sprite.spritecollideany(self.mario, self.coin_box_group)
         brick = pg.sprite.spritecollideany(self.mario, self.brick_group)
         enemy = pg.sprite.spritecollideany(self.mario, self.enemy_group)
@@ -682,7 +789,7 @@ class Level1(tools._State):
 
     def check_mario_y_collisions(self):
         """Checks for collisions when Mario moves along the y-axis"""
-        ground_step_or_pipe = pg.sprite.spritecollideany(self.mario, self.ground_step_pipe_group)
+        ground_step_or_pipe = self.solid_map.collide(self.mario.rect)
         enemy = pg.sprite.spritecollideany(self.mario, self.enemy_group)
         shell = pg.sprite.spritecollideany(self.mario, self.shell_group)
         brick = pg.sprite.spritecollideany(self.mario, self.brick_group)
@@ -847,12 +954,10 @@ class Level1(tools._State):
         """Changes Mario to a FALL state if more than a pixel above a pipe,
         ground, step or box"""
         self.mario.rect.y += 1
-        test_collide_group = pg.sprite.Group(self.ground_step_pipe_group,
-                                                 self.brick_group,
-                                                 self.coin_box_group)
-
 
-        if pg.sprite.spritecollideany(self.mario, test_collide_group) is None:
+        if self.solid_map.collide(self.mario.rect) is None \
+                and pg.sprite.spritecollideany(self.mario, self.brick_group) is None \
+                and pg.sprite.spritecollideany(self.mario, self.coin_box_group) is None:
             if self.mario.state != c.JUMP \
                 and self.mario.state != c.DEATH_JUMP \
                 and self.mario.state != c.SMALL_TO_BIG \
@@ -913,22 +1018,28 @@ class Level1(tools._State):
 
     def adjust_enemy_position(self):
         """Moves all enemies along the x, y axes and check for collisions"""
-        for enemy in self.enemy_group:
+        enemies = self.enemy_group.sprites()
+        sweep = broadphase.SweepAndPrune(enemies)
+        for enemy in enemies:
             enemy.rect.x += enemy.x_vel
-            self.check_enemy_x_collisions(enemy)
+            self.check_enemy_x_collisions(enemy, sweep)
+            sweep.move(enemy)
 
             enemy.rect.y += enemy.y_vel
             self.check_enemy_y_collisions(enemy)
             self.delete_if_off_screen(enemy)
+            if not self.enemy_group.has(enemy):
+                sweep.remove(enemy)
 
+        self.mario_and_enemy_group.add(self.enemy_group)
 
-    def check_enemy_x_collisions(self, enemy):
-        """Enemy collisions along the x axis.  Removes enemy from enemy group
-        in order to check against all other enemies then adds it back."""
-        enemy.kill()
 
-        collider = pg.sprite.spritecollideany(enemy, self.ground_step_pipe_group)
-        enemy_collider = pg.sprite.spritecollideany(enemy, self.enemy_group)
+    def check_enemy_x_collisions(self, enemy, sweep):
+        """Enemy collisions along the x axis.  Other enemies are found with
+        the sweep-and-prune broadphase instead of removing the enemy from
+        the enemy group"""
+        collider = self.solid_map.collide(enemy.rect)
+        enemy_collider = sweep.first_collision(enemy)
 
         if collider:
             if enemy.direction == c.RIGHT:
@@ -955,13 +1066,10 @@ class Level1(tools._State):
                 enemy.x_vel = 2
                 enemy_collider.x_vel = -2
 
-        self.enemy_group.add(enemy)
-        self.mario_and_enemy_group.add(self.enemy_group)
-
 
     def check_enemy_y_collisions(self, enemy):
         """Enemy collisions on the y axis"""
-        collider = pg.sprite.spritecollideany(enemy, self.ground_step_pipe_group)
+        collider = self.solid_map.collide(enemy.rect)
         brick = pg.sprite.spritecollideany(enemy, self.brick_group)
         coin_box = pg.sprite.spritecollideany(enemy, self.coin_box_group)
 
@@ -1019,10 +1127,9 @@ class Level1(tools._State):
 
         else:
             enemy.rect.y += 1
-            test_group = pg.sprite.Group(self.ground_step_pipe_group,
-                                         self.coin_box_group,
-                                         self.brick_group)
-            if pg.sprite.spritecollideany(enemy, test_group) is None:
+            if self.solid_map.collide(enemy.rect) is None \
+                    and pg.sprite.spritecollideany(enemy, self.coin_box_group) is None \
+                    and pg.sprite.spritecollideany(enemy, self.brick_group) is None:
                 if enemy.state != c.JUMP:
                     enemy.state = c.FALL
 
@@ -1043,7 +1150,7 @@ class Level1(tools._State):
 
     def check_shell_x_collisions(self, shell):
         """Shell collisions along the x axis"""
-        collider = pg.sprite.spritecollideany(shell, self.ground_step_pipe_group)
+        collider = self.solid_map.collide(shell.rect)
         enemy = pg.sprite.spritecollideany(shell, self.enemy_group)
 
         if collider:
@@ -1068,7 +1175,7 @@ class Level1(tools._State):
 
     def check_shell_y_collisions(self, shell):
         """Shell collisions along the y axis"""
-        collider = pg.sprite.spritecollideany(shell, self.ground_step_pipe_group)
+        collider = self.solid_map.collide(shell.rect)
 
         if collider:
             shell.y_vel = 0
@@ -1077,7 +1184,7 @@ class Level1(tools._State):
 
         else:
             shell.rect.y += 1
-            if pg.sprite.spritecollideany(shell, self.ground_step_pipe_group) is None:
+            if self.solid_map.collide(shell.rect) is None:
                 shell.state = c.FALL
             shell.rect.y -= 1
 
@@ -1108,7 +1215,7 @@ class Level1(tools._State):
 
     def check_mushroom_x_collisions(self, mushroom):
         """Mushroom collisions along the x axis"""
-        collider = pg.sprite.spritecollideany(mushroom, self.ground_step_pipe_group)
+        collider = self.solid_map.collide(mushroom.rect)
         brick = pg.sprite.spritecollideany(mushroom, self.brick_group)
         coin_box = pg.sprite.spritecollideany(mushroom, self.coin_box_group)
 
@@ -1124,7 +1231,7 @@ class Level1(tools._State):
 
     def check_mushroom_y_collisions(self, mushroom):
         """Mushroom collisions along the y axis"""
-        collider = pg.sprite.spritecollideany(mushroom, self.ground_step_pipe_group)
+        collider = self.solid_map.collide(mushroom.rect)
         brick = pg.sprite.spritecollideany(mushroom, self.brick_group)
         coin_box = pg.sprite.spritecollideany(mushroom, self.coin_box_group)
 
@@ -1135,7 +1242,7 @@ class Level1(tools._State):
         elif coin_box:
             self.adjust_mushroom_for_collision_y(mushroom, coin_box)
         else:
-            self.check_if_falling(mushroom, self.ground_step_pipe_group)
+            self.check_if_falling(mushroom, self.solid_map)
             self.check_if_falling(mushroom, self.brick_group)
             self.check_if_falling(mushroom, self.coin_box_group)
 
@@ -1170,7 +1277,7 @@ class Level1(tools._State):
 
     def check_star_y_collisions(self, star):
         """Invincible star collisions along y axis"""
-        collider = pg.sprite.spritecollideany(star, self.ground_step_pipe_group)
+        collider = self.solid_map.collide(star.rect)
         brick = pg.sprite.spritecollideany(star, self.brick_group)
         coin_box = pg.sprite.spritecollideany(star, self.coin_box_group)
 
@@ -1221,15 +1328,17 @@ class Level1(tools._State):
             fireball.state = c.BOUNCING
 
 
+    def fireball_collider(self, fireball):
+        """The first ground, pipe, step, coin box or brick the fireball
+        touches, in that order"""
+        return self.solid_map.collide(fireball.rect) \
+            or pg.sprite.spritecollideany(fireball, self.coin_box_group) \
+            or pg.sprite.spritecollideany(fireball, self.brick_group)
+
+
     def check_fireball_x_collisions(self, fireball):
         """Fireball collisions along x axis"""
-        collide_group = pg.sprite.Group(self.ground_group,
-                                        self.pipe_group,
-                                        self.step_group,
-                                        self.coin_box_group,
-                                        self.brick_group)
-
-        collider = pg.sprite.spritecollideany(fireball, collide_group)
+        collider = self.fireball_collider(fireball)
 
         if collider:
             fireball.kill()
@@ -1240,13 +1349,7 @@ class Level1(tools._State):
 
     def check_fireball_y_collisions(self, fireball):
         """Fireball collisions along y axis"""
-        collide_group = pg.sprite.Group(self.ground_group,
-                                        self.pipe_group,
-                                        self.step_group,
-                                        self.coin_box_group,
-                                        self.brick_group)
-
-        collider = pg.sprite.spritecollideany(fireball, collide_group)
+        collider = self.fireball_collider(fireball)
         enemy = pg.sprite.spritecollideany(fireball, self.enemy_group)
         shell = pg.sprite.spritecollideany(fireball, self.shell_group)
 
@@ -1278,8 +1381,12 @@ class Level1(tools._State):
     def check_if_falling(self, sprite, sprite_group):
         """Checks if sprite should enter a falling state"""
         sprite.rect.y += 1
+        if sprite_group is self.solid_map:
+            collider = self.solid_map.collide(sprite.rect)
+        else:
+            collider = pg.sprite.spritecollideany(sprite, sprite_group)
 
-        if pg.sprite.spritecollideany(sprite, sprite_group) is None:
+        if collider is None:
             if sprite.state != c.JUMP:
                 sprite.state = c.FALL
 
@@ -1327,7 +1434,10 @@ class Level1(tools._State):
 
 
     def play_death_song(self):
-        if self.death_timer == 0:
+        if self.fast_forward:
+            self.set_game_info_values()
+            self.done = True
+        elif self.death_timer == 0:
             self.death_timer = self.current_time
         elif (self.current_time - self.death_timer) > 3000:
             self.set_game_info_values()
@@ -1378,7 +1488,7 @@ class Level1(tools._State):
             self.viewport.x = min(highest, new)
 
 
-    def update_while_in_castle(self):
+    def update_while_in_castle(self, *args):
         """Updates while Mario is in castle at the end of the level"""
         for score in self.moving_score_list:
             score.update(self.moving_score_list, self.game_info)
@@ -1389,7 +1499,7 @@ class Level1(tools._State):
             self.flag_pole_group.add(castle_flag.Flag(8745, 322))
 
 
-    def update_flag_and_fireworks(self):
+    def update_flag_and_fireworks(self, *args):
         """Updates the level for the fireworks and castle flag"""
         for score in self.moving_score_list:
             score.update(self.moving_score_list, self.game_info)
@@ -1432,9 +1542,9 @@ class Level1(tools._State):
             score.draw(surface)
 
     def get_mario_info(self):
-        """获取马里奥的状态信息，用于录制"""
+        """获取马里奥的状态信息，用于录制；状态为 STATE_NAMES 中的字符串名"""
         if hasattr(self, 'mario'):
-            mario_state = self.mario.state if hasattr(self.mario, 'state') else 'unknown'
+            mario_state = c.STATE_NAMES.get(getattr(self.mario, 'state', None), 'unknown')
             mario_dead = self.mario.dead if hasattr(self.mario, 'dead') else False
             return mario_state, mario_dead
         return 'unknown', False
@@ -33,6 +33,11 @@ class Menu(tools._State):
         self.setup_mario()
         self.setup_cursor()
 
+        # 快进时相当于直接选择单人游戏
+        if self.fast_forward:
+            self.reset_game_info()
+            self.done = True
+
 
     def setup_cursor(self):
         """Creates the mushroom cursor to select 1 or 2 player game"""
@@ -107,6 +112,11 @@ class Menu(tools._State):
         """Update the position of the cursor"""
         input_list = [pg.K_RETURN, pg.K_a, pg.K_s]
 
+        if self.fast_forward:
+            self.reset_game_info()
+            self.done = True
+            return
+
         if self.cursor.state == c.PLAYER1:
             self.cursor.rect.y = 358
             if keys[pg.K_DOWN]:
@@ -0,0 +1,96 @@
+"""
+静态地形（地面、管道、台阶）的占用图。
+
+这些碰撞矩形在 setup_ground / setup_pipes / setup_steps 中建好后就不再移动，
+SolidMap 把它们编译一次：
+
+- grid: 按砖块大小（TILE_SIZE 像素）划分的 numpy bool 数组，(行, 列) 为 True
+  表示这一格有地形覆盖，用于符号化观测等粗略查询
+- 每一列可能碰到的碰撞矩形的序号表，精确查询只检查这几个矩形
+
+collide(rect) 的结果与 spritecollideany(sprite, ground_step_pipe_group) 完全相同：
+多个矩形同时重叠时返回精灵组顺序中的第一个。
+"""
+
+__author__ = 'justinarmstrong'
+
+import numpy as np
+import pygame as pg
+
+from . import constants as c
+
+TILE_SIZE = int(round(16 * c.BACKGROUND_MULTIPLER))
+
+
+class SolidMap(object):
+    """colliders 按精灵组的顺序给出，size 为关卡的 (宽, 高)"""
+    def __init__(self, colliders, size):
+        self.colliders = list(colliders)
+        self.rects = [pg.Rect(collider.rect) for collider in self.colliders]
+        width = max([size[0]] + [rect.right for rect in self.rects])
+        self.columns_count = -(-width // TILE_SIZE)
+        self.rows_count = -(-size[1] // TILE_SIZE)
+
+        self.grid = np.zeros((self.rows_count, self.columns_count), dtype=bool)
+        columns = [[] for _ in range(self.columns_count)]
+        for i, rect in enumerate(self.rects):
+            first, last = self.column_range(rect.left, rect.right)
+            top = max(rect.top, 0) // TILE_SIZE
+            bottom = (min(rect.bottom, size[1]) - 1) // TILE_SIZE
+            self.grid[top:bottom + 1, first:last + 1] = True
+            for column in range(first, last + 1):
+                columns[column].append(i)
+        self.columns = [tuple(indices) for indices in columns]
+
+
+    def column_range(self, left, right):
+        """x 区间 [left, right) 覆盖的第一列和最后一列（截到地图范围内）"""
+        last_column = self.columns_count - 1
+        first = min(max(left // TILE_SIZE, 0), last_column)
+        last = min(max((max(right, left + 1) - 1) // TILE_SIZE, 0), last_column)
+        return first, last
+
+
+    def collide(self, rect):
+        """第一个与 rect 重叠的碰撞矩形精灵，没有时返回 None"""
+        first, last = self.column_range(rect.left, rect.right)
+        colliderect = rect.colliderect
+        rects = self.rects
+        best = len(rects)
+        for indices in self.columns[first:last + 1]:
+            for i in indices:
+                if i >= best:
+                    break
+                if colliderect(rects[i]):
+                    best = i
+                    break
+        return self.colliders[best] if best < len(rects) else None
+
+
+    def is_solid(self, x, y):
+        """像素 (x, y) 是否在地形内"""
+        column = self.column_range(x, x + 1)[0]
+        return any(self.rects[i].collidepoint(x, y) for i in self.columns[column])
+
+
+    def first_solid_below(self, x, y):
+        """像素列 x 中 y（含）以下第一个地形像素的 y 坐标，下面是坑时返回 None"""
+        column = self.column_range(x, x + 1)[0]
+        best = None
+        for i in self.columns[column]:
+            rect = self.rects[i]
+            if rect.left <= x < rect.right and rect.bottom > y:
+                top = max(rect.top, y)
+                if best is None or top < best:
+                    best = top
+        return best
+
+
+    def tile_columns(self, x, count):
+        """从像素 x 所在的列开始 count 列的占用格 (行数, count)，超出地图的列为 False"""
+        start = x // TILE_SIZE
+        out = np.zeros((self.rows_count, count), dtype=bool)
+        lo, hi = max(start, 0), min(start + count, self.columns_count)
+        if lo < hi:
+            out[:, lo - start:hi - start] = self.grid[:, lo:hi]
+        return out
@@ -11,11 +11,64 @@ keybinding = {
     'down':pg.K_DOWN
 }
 
+# 动作编码中每个按键对应的位，与 Recorder.encode_action 一致
+action_bits = {
+    'left':1,
+    'right':2,
+    'jump':4,
+    'action':8,
+    'down':16
+}
+
+
+class ActionKeys(object):
+    """由动作编码(0-31)表示的按键状态，可以代替 pg.key.get_pressed() 的结果
+
+    按 keybinding 中的键码索引，其它键都视为没有按下。
+    """
+    __slots__ = ('action_code',)
+    scancode_bits = {keybinding[name]: bit for name, bit in action_bits.items()}
+
+    def __init__(self, action_code=0):
+        self.action_code = action_code
+
+    def __getitem__(self, key):
+        return bool(self.action_code & self.scancode_bits.get(key, 0))
+
+
+class KeyboardInput(object):
+    """人类玩家的输入：按键事件发生时读取键盘状态"""
+    def __init__(self):
+        self.keys = pg.key.get_pressed()
+
+    def handle_event(self, event):
+        if event.type in (pg.KEYDOWN, pg.KEYUP):
+            self.keys = pg.key.get_pressed()
+
+    def get_keys(self):
+        return self.keys
+
+
+class ActionInput(object):
+    """程序控制的输入：直接设置每一步的动作编码，不经过事件队列"""
+    def __init__(self, action_code=0):
+        self.keys = ActionKeys(action_code)
+
+    def set_action(self, action_code):
+        self.keys.action_code = action_code
+
+    def handle_event(self, event):
+        pass
+
+    def get_keys(self):
+        return self.keys
+
+
 class Control(object):
     """Control class for entire project. Contains the game loop, and contains
     the event_loop which passes events to States as needed. Logic for flipping
     states is also found here."""
-    def __init__(self, caption, recorder=None):
+    def __init__(self, caption, recorder=None, input_provider=None):
         self.screen = pg.display.get_surface()
         self.done = False
         self.clock = pg.time.Clock()
@@ -23,23 +76,48 @@ class Control(object):
         self.fps = 30
         self.show_fps = False
         self.current_time = 0.0
-        self.keys = pg.key.get_pressed()
+        self.timestep = 1000.0 / self.fps  # 每个逻辑步推进的游戏时间(毫秒)
+        self.speed = 1  # 每显示一帧运行多少个逻辑步
+        self.render_every = 1  # 每隔多少个显示帧绘制一次画面
+        self.turbo = False  # 不限帧率，尽快运行
+        self.fast_forward = False  # 跳过菜单、加载画面和死亡/过关后的等待
+        self.display_frame = 0
+        self.input = input_provider or KeyboardInput()  # 输入来源: 键盘或动作编码
+        self.keys = self.input.get_keys()
         self.state_dict = {}
         self.state_name = None
         self.state = None
         self.recorder = recorder  # 录制器实例
+        self.profiler = None  # --profile 时的 FrameProfiler，每显示一帧调用 end_frame()
 
     def setup_states(self, state_dict, start_state):
         self.state_dict = state_dict
         self.state_name = start_state
         self.state = self.state_dict[self.state_name]
 
-    def update(self):
-        self.current_time = pg.time.get_ticks()
+    def set_time(self, current_time):
+        """让游戏时间从 current_time 接着走（用于从存档恢复）"""
+        self.current_time = current_time
+
+    def update(self, render=True):
+        """运行一个逻辑步，游戏时间固定前进 timestep 毫秒
+
+        render 为 False 时关卡不绘制画面；录制器要保存这一帧时总会绘制。
+        """
+        self.current_time += self.timestep
+        self.keys = self.input.get_keys()
         if self.state.quit:
             self.done = True
         elif self.state.done:
             self.flip_state()
+            # 快进时被跳过的等待画面一开始就结束，不占用帧
+            while self.fast_forward and self.state.done and not self.state.quit:
+                self.flip_state()
+        
+        if self.recorder and self.recorder.will_save_frame():
+            render = True
+        self.state.render = render
+        self.state.fast_forward = self.fast_forward
         
         # 更新状态
         self.state.update(self.screen, self.keys, self.current_time)
@@ -52,6 +130,7 @@ class Control(object):
         previous, self.state_name = self.state_name, self.state.next
         persist = self.state.cleanup()
         self.state = self.state_dict[self.state_name]
+        self.state.fast_forward = self.fast_forward
         self.state.startup(self.current_time, persist)
         self.state.previous = previous
 
@@ -61,10 +140,8 @@ class Control(object):
             if event.type == pg.QUIT:
                 self.done = True
             elif event.type == pg.KEYDOWN:
-                self.keys = pg.key.get_pressed()
                 self.toggle_show_fps(event.key)
-            elif event.type == pg.KEYUP:
-                self.keys = pg.key.get_pressed()
+            self.input.handle_event(event)
             self.state.get_event(event)
 
 
@@ -79,7 +156,9 @@ class Control(object):
         """录制当前帧的数据"""
         if self.recorder and hasattr(self.state, 'get_mario_info'):
             mario_state, mario_dead = self.state.get_mario_info()
-            self.recorder.record_frame(self.keys, mario_state, mario_dead, self.screen)
+            self.recorder.record_frame(self.keys, mario_state, mario_dead, self.screen,
+                                       self.current_time)
+            self.recorder.record_savestate(self.state, self.current_time)
     
     def main(self):
         """Main loop for entire program"""
@@ -90,9 +169,19 @@ class Control(object):
         try:
             while not self.done:
                 self.event_loop()
-                self.update()
-                pg.display.update()
-                self.clock.tick(self.fps)
+                show = self.display_frame % self.render_every == 0
+                for step in range(self.speed):
+                    # 只有这一批的最后一步会显示出来
+                    self.update(render=show and step == self.speed - 1)
+                    if self.done:
+                        break
+                if show:
+                    pg.display.update()
+                self.display_frame += 1
+                if not self.turbo:
+                    self.clock.tick(self.fps)
+                if self.profiler is not None:
+                    self.profiler.end_frame()
                 
                 if self.show_fps:
                     fps = self.clock.get_fps()
@@ -113,6 +202,8 @@ class _State(object):
         self.next = None
         self.previous = None
         self.persist = {}
+        self.render = True  # 这一步是否需要绘制画面，由 Control 设置
+        self.fast_forward = False  # 是否跳过等待，由 Control 设置
 
     def get_event(self, event):
         pass
@@ -130,6 +221,77 @@ class _State(object):
 
 
 
+# pg.sprite.Sprite 自己的属性（所属的组），不进对象快照
+_SPRITE_INTERNAL = frozenset(vars(pg.sprite.Sprite()))
+
+
+class InitialState(object):
+    """对象某一时刻的属性快照，restore() 把对象原地恢复到这个状态
+
+    属性值按引用保存（图片、帧列表等创建后不再修改），Rect 保存副本，恢复时写回
+    对象当前的 Rect。names 为 None 时快照全部属性，快照之后新加的属性在恢复时
+    删除；否则只快照和恢复 names 中的属性。精灵所属的组不在快照中。
+    """
+    __slots__ = ('obj', 'attrs', 'partial')
+
+    def __init__(self, obj, names=None):
+        self.obj = obj
+        self.partial = names is not None
+        if names is None:
+            names = [name for name in vars(obj) if name not in _SPRITE_INTERNAL]
+        self.attrs = {}
+        for name in names:
+            value = getattr(obj, name)
+            self.attrs[name] = value.copy() if isinstance(value, pg.Rect) else value
+
+    def restore(self):
+        current = vars(self.obj)
+        if not self.partial:
+            for name in [name for name in current
+                         if name not in self.attrs and name not in _SPRITE_INTERNAL]:
+                del current[name]
+        for name, value in self.attrs.items():
+            if isinstance(value, pg.Rect):
+                rect = current.get(name)
+                if isinstance(rect, pg.Rect):
+                    rect.update(value)
+                    continue
+                value = value.copy()
+            current[name] = value
+
+
+class ObjectPool(object):
+    """一个状态对象在 startup 中建好的对象，之后原地重置而不是重新创建
+
+    记录 owner 的 names 属性、这些属性中（包括列表里）所有精灵组的成员和顺序，
+    以及每个精灵的 InitialState。restore() 把属性指回这些对象，按原来的顺序
+    重新填充精灵组，再恢复每个精灵的属性；之后新建的精灵（金币、碎砖、分数等）
+    随精灵组清空而丢弃。
+    """
+    def __init__(self, owner, names):
+        self.owner = InitialState(owner, names)
+        groups = []
+        for value in self.owner.attrs.values():
+            values = value if isinstance(value, list) else [value]
+            groups.extend(v for v in values if isinstance(v, pg.sprite.AbstractGroup))
+        self.groups = [(group, group.sprites()) for group in groups]
+        sprites = {}
+        for group, members in self.groups:
+            for sprite in members:
+                sprites.setdefault(id(sprite), sprite)
+        self.sprites = [InitialState(sprite) for sprite in sprites.values()]
+
+    def restore(self):
+        self.owner.restore()
+        for group, members in self.groups:
+            group.empty()
+        for group, members in self.groups:
+            group.add(*members)
+        for state in self.sprites:
+            state.restore()
+
+
+
 def load_all_gfx(directory, colorkey=(255,0,255), accept=('.png', 'jpg', 'bmp')):
     graphics = {}
     for pic in os.listdir(directory):
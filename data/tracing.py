@@ -0,0 +1,161 @@
+"""
+帧时间线追踪（--trace），导出为 Chrome trace-event JSON。
+
+FrameTracer.install() 和 profiler 一样在类上包装 SPANS 中的方法，每次调用
+记一个带开始时间和时长的区间（包括保存线程中的 Recorder._save_frame），录制时
+每帧再记一次保存队列的长度。事件写进预先分配的环形缓冲区，只保留最近 capacity
+个，长时间运行也不会增长内存。
+
+write(path) 写出的 JSON 可以直接用 Perfetto（ui.perfetto.dev）或 chrome://tracing
+打开；区间按时间自动嵌套，音乐重新加载、Level1.startup 重置、保存队列积压等
+偶发的卡顿在时间线上一眼就能看到。
+"""
+
+__author__ = 'justinarmstrong'
+
+import itertools
+import json
+import os
+import threading
+from time import perf_counter
+
+import pygame as pg
+
+from . import tools
+from . import game_sound
+from .profiler import patch_method, restore_methods
+from .recorder import Recorder
+from .states import level1
+
+DEFAULT_CAPACITY = 1 << 18
+
+# (所在的类或模块, 属性名, 区间名)
+SPANS = (
+    (tools.Control, 'update', 'Control.update'),
+    (tools.Control, 'event_loop', 'Control.event_loop'),
+    (tools.Control, 'flip_state', 'Control.flip_state'),
+    (level1.Level1, 'startup', 'Level1.startup'),
+    (level1.Level1, 'handle_states', 'Level1.handle_states'),
+    (level1.Level1, 'adjust_mario_position', 'adjust_mario_position'),
+    (level1.Level1, 'adjust_enemy_position', 'adjust_enemy_position'),
+    (level1.Level1, 'adjust_shell_position', 'adjust_shell_position'),
+    (level1.Level1, 'adjust_powerup_position', 'adjust_powerup_position'),
+    (level1.Level1, 'blit_everything', 'render'),
+    (game_sound.Sound, 'play_music', 'Sound.play_music'),
+    (Recorder, 'record_frame', 'Recorder.record_frame'),
+    (Recorder, 'record_savestate', 'Recorder.record_savestate'),
+    (Recorder, '_save_frame', 'Recorder._save_frame'),
+    (pg.display, 'update', 'pg.display.update'),
+)
+
+SAVE_QUEUE = 'save_queue'  # 计数器：保存队列中等待的帧数
+COUNTER = -1.0  # dur 为该值的事件是计数器，value 为计数
+
+
+class FrameTracer(object):
+    """把方法调用记成区间的环形缓冲区"""
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.names = [None] * capacity
+        self.starts = [0.0] * capacity
+        self.durations = [0.0] * capacity
+        self.threads = [0] * capacity  # 线程 ident；计数器事件为计数值
+        self.thread_names = {}
+        self.counter = itertools.count()  # next() 在 GIL 下是原子的，保存线程也可以写
+        self.origin = perf_counter()
+        self.patched = []
+
+
+    def span(self, name, function):
+        """function 的包装，每次调用记一个区间"""
+        names, starts, durations, threads = self.names, self.starts, self.durations, self.threads
+        capacity, counter, get_ident = self.capacity, self.counter, threading.get_ident
+        thread_names = self.thread_names
+
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                slot = next(counter) % capacity
+                names[slot] = name
+                starts[slot] = start
+                durations[slot] = perf_counter() - start
+                ident = threads[slot] = get_ident()
+                if ident not in thread_names:
+                    thread_names[ident] = threading.current_thread().name
+        wrapper.__wrapped__ = function
+        return wrapper
+
+
+    def count(self, name, value):
+        """记一个计数器的值"""
+        slot = next(self.counter) % self.capacity
+        self.names[slot] = name
+        self.starts[slot] = perf_counter()
+        self.durations[slot] = COUNTER
+        self.threads[slot] = value
+
+
+    def queue_counter(self, function):
+        """Recorder.record_frame 之后记录保存队列的长度"""
+        def wrapper(recorder, *args, **kwargs):
+            result = function(recorder, *args, **kwargs)
+            if recorder.recording_mode:
+                self.count(SAVE_QUEUE, recorder.save_queue.qsize())
+            return result
+        wrapper.__wrapped__ = function
+        return wrapper
+
+
+    def install(self):
+        """开始追踪"""
+        self.patched.append(patch_method(Recorder, 'record_frame', self.queue_counter))
+        for owner, attribute, name in SPANS:
+            self.patched.append(patch_method(
+                owner, attribute, lambda function, name=name: self.span(name, function)))
+
+
+    def uninstall(self):
+        restore_methods(self.patched)
+        self.patched = []
+
+
+    def events(self):
+        """缓冲区中的事件，按写入顺序"""
+        total = next(self.counter)
+        self.names[total % self.capacity] = None  # 这个序号不会再写入
+        for i in range(max(0, total - self.capacity), total):
+            slot = i % self.capacity
+            if self.names[slot] is not None:
+                yield self.names[slot], self.starts[slot], self.durations[slot], self.threads[slot]
+
+
+    def to_chrome_trace(self):
+        """Chrome trace-event 格式的 dict，时间单位为微秒"""
+        pid = os.getpid()
+        thread_ids = {}
+        trace_events = []
+        for name, start, duration, thread in self.events():
+            ts = (start - self.origin) * 1e6
+            if duration == COUNTER:
+                trace_events.append({'name': name, 'ph': 'C', 'ts': ts, 'pid': pid,
+                                     'args': {name: thread}})
+                continue
+            tid = thread_ids.setdefault(thread, len(thread_ids) + 1)
+            trace_events.append({'name': name, 'ph': 'X', 'ts': ts, 'dur': duration * 1e6,
+                                 'pid': pid, 'tid': tid})
+
+        for ident, tid in thread_ids.items():
+            name = self.thread_names.get(ident, f"thread {tid}")
+            trace_events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                                 'args': {'name': name}})
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+
+    def write(self, path):
+        """写出 JSON，返回写入的事件数"""
+        trace = self.to_chrome_trace()
+        with open(path, 'w') as f:
+            json.dump(trace, f)
+        return len(trace['traceEvents'])
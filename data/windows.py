@@ -0,0 +1,166 @@
+"""
+连续帧窗口索引。
+
+世界模型训练需要 K 帧连续画面及对应动作。窗口不能跨越死亡、重生（Level1 重新开始）
+或被 frame_skip 跳过的帧。build_window_index 扫描一次录制，算出所有合法窗口的起点，
+按 (动作, 状态) 分组保存成一个 npz；WindowDataset 读取索引后可以直接切片取出窗口。
+"""
+
+__author__ = 'justinarmstrong'
+
+import os
+import numpy as np
+import pygame as pg
+
+from . import labels
+from . import frame_store
+
+
+def window_starts(columns, frame_labels, length):
+    """返回一个录制中所有合法窗口的起始行号
+
+    窗口内每一帧都必须保存了图片、活着、属于同一条命，且 frame_id 连续。
+    """
+    n = columns['frame_id'].size
+    if length <= 0 or n < length:
+        return np.zeros(0, dtype=np.int64)
+
+    saved = (columns['frame_offset'] >= 0) | (columns['frame_filename'] != '')
+    good = saved & ~columns['mario_dead']
+
+    # 与前一帧断开：换了一条命，或中间有没记录的帧
+    broken = np.zeros(n, dtype=bool)
+    broken[1:] = ((frame_labels['life_id'][1:] != frame_labels['life_id'][:-1]) |
+                  (np.diff(columns['frame_id']) != 1))
+
+    good_sum = np.concatenate(([0], np.cumsum(good)))
+    broken_sum = np.concatenate(([0], np.cumsum(broken)))
+
+    starts = np.arange(n - length + 1)
+    ends = starts + length
+    valid = ((good_sum[ends] - good_sum[starts] == length) &
+             (broken_sum[ends] - broken_sum[starts + 1] == 0))
+    return starts[valid]
+
+
+def build_window_index(recording_dirs, length):
+    """扫描录制目录，返回窗口索引（字典形式，可直接保存为npz）
+
+    每个窗口按最后一帧的动作和第一帧的状态分组，
+    strata_offsets[k]:strata_offsets[k+1] 为第k组窗口在数组中的范围。
+    """
+    state_index = {}
+    recording, start_row, action_code, state_id = [], [], [], []
+
+    for r, recording_dir in enumerate(recording_dirs):
+        columns = labels.load_recording_columns(recording_dir)
+        frame_labels = labels.label_columns(columns)
+        starts = window_starts(columns, frame_labels, length)
+
+        local_names = columns['state_names'].tolist()
+        for name in local_names:
+            state_index.setdefault(name, len(state_index))
+        remap = np.array([state_index[name] for name in local_names], dtype=np.int16)
+
+        recording.append(np.full(starts.size, r, dtype=np.int32))
+        start_row.append(starts)
+        action_code.append(columns['action_code'][starts + length - 1])
+        state_id.append(remap[columns['state_id'][starts]] if starts.size
+                        else np.zeros(0, dtype=np.int16))
+
+    recording = np.concatenate(recording) if recording else np.zeros(0, dtype=np.int32)
+    start_row = np.concatenate(start_row) if start_row else np.zeros(0, dtype=np.int64)
+    action_code = np.concatenate(action_code) if action_code else np.zeros(0, dtype=np.int16)
+    state_id = np.concatenate(state_id) if state_id else np.zeros(0, dtype=np.int16)
+
+    # 按 (动作, 状态) 排序，同一组的窗口在数组中连续
+    order = np.lexsort((start_row, recording, state_id, action_code))
+    recording, start_row = recording[order], start_row[order]
+    action_code, state_id = action_code[order], state_id[order]
+
+    key_changes = np.flatnonzero((np.diff(action_code) != 0) | (np.diff(state_id) != 0)) + 1
+    strata_offsets = np.concatenate(([0], key_changes, [action_code.size])).astype(np.int64)
+    if action_code.size == 0:
+        strata_offsets = np.zeros(1, dtype=np.int64)
+    first = strata_offsets[:-1]
+
+    return {
+        'length': np.array(length),
+        'recording_dirs': np.array([os.path.abspath(d) for d in recording_dirs], dtype=str),
+        'state_names': np.array(list(state_index), dtype=str),
+        'recording': recording,
+        'start_row': start_row,
+        'action_code': action_code,
+        'state_id': state_id,
+        'strata_action': action_code[first],
+        'strata_state': state_id[first],
+        'strata_offsets': strata_offsets,
+    }
+
+
+def save_window_index(path, index):
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, **index)
+    os.replace(tmp_path, path)
+
+
+def load_window_index(path):
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+
+
+class WindowDataset(object):
+    """按窗口索引读取 (K帧画面, K个动作)
+
+    分块存储的录制中，不跨块的窗口直接返回内存映射切片；动作是动作列的切片。
+    """
+    def __init__(self, index):
+        if isinstance(index, str):
+            index = load_window_index(index)
+        self.index = index
+        self.length = int(index['length'])
+        self.recording_dirs = index['recording_dirs'].tolist()
+        self.state_names = index['state_names'].tolist()
+        self.recordings = {}
+
+
+    def __len__(self):
+        return self.index['start_row'].size
+
+
+    def strata(self):
+        """返回 [(动作编码, 状态名, 窗口下标范围)]，便于分层抽样"""
+        offsets = self.index['strata_offsets']
+        return [(int(action), self.state_names[state], range(offsets[k], offsets[k + 1]))
+                for k, (action, state) in enumerate(zip(self.index['strata_action'],
+                                                        self.index['strata_state']))]
+
+
+    def recording_columns(self, r):
+        """录制 r 的列数据和帧来源，第一次访问时加载"""
+        if r not in self.recordings:
+            recording_dir = self.recording_dirs[r]
+            columns = labels.load_recording_columns(recording_dir)
+            if frame_store.has_store(recording_dir):
+                source = frame_store.FrameStore(
+                    os.path.join(recording_dir, frame_store.STORE_DIRNAME))
+            else:
+                source = os.path.join(recording_dir, "frames")
+            self.recordings[r] = (columns, source)
+        return self.recordings[r]
+
+
+    def __getitem__(self, i):
+        r = int(self.index['recording'][i])
+        row = int(self.index['start_row'][i])
+        columns, source = self.recording_columns(r)
+        end = row + self.length
+
+        actions = columns['action_code'][row:end]
+        if isinstance(source, frame_store.FrameStore):
+            frames = source.read_range(int(columns['frame_offset'][row]), self.length)
+        else:
+            frames = np.stack([
+                frame_store.surface_to_array(pg.image.load(os.path.join(source, name)))
+                for name in columns['frame_filename'][row:end].tolist()])
+        return frames, actions
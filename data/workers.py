@@ -0,0 +1,60 @@
+"""
+共享素材的 worker 启动器（fork server）。
+
+用 spawn 启动的每个 worker 都要重新导入 pygame、执行 data.setup（初始化显示、
+解码所有 PNG、加载所有音效）、放大关卡背景，每个进程将近 1 秒、130 MB 私有内存。
+
+get_context() 返回 multiprocessing 的 forkserver 上下文，并让 fork server 在启动时
+导入 data.preload：素材只在这个模板进程里加载一次并 gc.freeze()，之后每个 worker
+都从它 fork 出来，启动只要几毫秒，素材所占的内存页由所有 worker 共享（写时复制）。
+
+    workers.start_template()                # 可选：提前加载素材
+    processes = workers.start_workers(generate, [(seed,) for seed in range(64)])
+    for process in processes:
+        process.join()
+
+和 spawn 一样，target 和参数要能被 pickle（模块级函数）。worker 都是无头的：
+fork 一个连着真实窗口的进程并不安全，所以启动 fork server 之前把 SDL 的视频和
+音频驱动默认设为 dummy。不支持 fork 的平台（Windows）退回 spawn。
+"""
+
+__author__ = 'justinarmstrong'
+
+import os
+import multiprocessing
+
+PRELOAD_MODULE = 'data.preload'
+
+
+def get_context(preload=True):
+    """启动 worker 用的 multiprocessing 上下文；preload=False 时为普通的 spawn"""
+    if not preload or 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload([PRELOAD_MODULE])
+    return context
+
+
+def _ready():
+    pass
+
+
+def start_template(context=None):
+    """启动模板进程并等它加载完素材（否则第一个 worker 要等这段时间）"""
+    context = context or get_context()
+    process = context.Process(target=_ready, name='preload-template')
+    process.start()
+    process.join()
+    return context
+
+
+def start_workers(target, args_list, preload=True, name='worker'):
+    """为 args_list 中的每组参数启动一个 worker 进程，返回 Process 列表"""
+    context = get_context(preload)
+    processes = [context.Process(target=target, args=args, name=f"{name}-{i}")
+                 for i, args in enumerate(args_list)]
+    for process in processes:
+        process.start()
+    return processes
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""
+录制帧索引工具
+用法: python index_recordings.py [--root recordings] [--db recordings/catalog.sqlite]
+查询: python index_recordings.py --before-death 30 --action 14
+"""
+
+import os
+import argparse
+
+from data.catalog import Catalog, CATALOG_FILENAME
+
+
+def main():
+    parser = argparse.ArgumentParser(description='建立/更新录制帧的SQLite索引')
+    parser.add_argument('--root', default='recordings', help='录制根目录 (默认: recordings)')
+    parser.add_argument('--db', help=f'数据库路径 (默认: <root>/{CATALOG_FILENAME})')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='并行解析的进程数')
+    parser.add_argument('--no-update', action='store_true', help='只查询，不更新索引')
+    parser.add_argument('--before-death', type=int, metavar='N',
+                        help='查询死亡前N帧以内的帧')
+    parser.add_argument('--action', type=int, help='按动作编码过滤')
+    parser.add_argument('--state', help='按mario_state过滤')
+    parser.add_argument('--limit', type=int, default=10, help='最多显示多少条查询结果')
+
+    args = parser.parse_args()
+    db_path = args.db or os.path.join(args.root, CATALOG_FILENAME)
+
+    with Catalog(db_path) as catalog:
+        if not args.no_update:
+            updated, removed = catalog.update(args.root, args.workers)
+            print(f"索引更新完成: 更新 {updated} 个录制, 删除 {removed} 个录制")
+
+        recordings, frames = catalog.query(
+            "SELECT (SELECT COUNT(*) FROM recordings), (SELECT COUNT(*) FROM frames)")[0]
+        print(f"数据库: {db_path}")
+        print(f"共 {recordings} 个录制, {frames} 帧")
+
+        if args.before_death is not None:
+            rows = catalog.frames_before_death(args.before_death, args.action, args.state)
+            print(f"\n查询结果: {len(rows)} 帧")
+            for row in rows[:args.limit]:
+                print(f"  {row['path']} 帧 {row['frame_id']}: action={row['action_code']}, "
+                      f"state={row['mario_state']}, 距离死亡 {row['frames_to_death']} 帧, "
+                      f"图片={catalog.frame_path(row)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -9,7 +9,6 @@ Super Mario Bros for the NES.
 import sys
 import pygame as pg
 from data.main import main
-import cProfile
 
 
 if __name__=='__main__':
@@ -39,6 +38,69 @@ if __name__=='__main__':
         except IndexError:
             print("警告: --quality 参数无效，使用默认值 medium")
     
+    # 解析存储格式参数
+    storage = 'png'
+    if '--format' in sys.argv:
+        try:
+            format_index = sys.argv.index('--format')
+            storage = sys.argv[format_index + 1]
+            if storage not in ['png', 'chunk']:
+                print("警告: 存储格式无效，使用默认值 png")
+                storage = 'png'
+        except IndexError:
+            print("警告: --format 参数无效，使用默认值 png")
+    
+    # 解析关卡存档间隔参数
+    savestate_interval = 0
+    if '--savestate' in sys.argv:
+        try:
+            savestate_index = sys.argv.index('--savestate')
+            savestate_interval = max(0, int(sys.argv[savestate_index + 1]))
+        except (ValueError, IndexError):
+            print("警告: --savestate 参数无效，不保存关卡存档")
+    
+    # 解析运行速度参数
+    speed = 1
+    render_every = 1
+    turbo = '--turbo' in sys.argv
+    if '--speed' in sys.argv:
+        try:
+            speed_index = sys.argv.index('--speed')
+            speed = max(1, int(sys.argv[speed_index + 1]))
+        except (ValueError, IndexError):
+            print("警告: --speed 参数无效，使用默认值 1")
+    if '--render-every' in sys.argv:
+        try:
+            render_index = sys.argv.index('--render-every')
+            render_every = max(1, int(sys.argv[render_index + 1]))
+        except (ValueError, IndexError):
+            print("警告: --render-every 参数无效，使用默认值 1")
+    # 解析性能分析参数
+    profile = '--profile' in sys.argv
+    profile_dump = None
+    if '--profile-dump' in sys.argv:
+        try:
+            dump_index = sys.argv.index('--profile-dump')
+            profile_dump = sys.argv[dump_index + 1]
+        except IndexError:
+            print("警告: --profile-dump 参数无效，不保存 cProfile 结果")
+    trace = None
+    if '--trace' in sys.argv:
+        try:
+            trace_index = sys.argv.index('--trace')
+            trace = sys.argv[trace_index + 1]
+        except IndexError:
+            print("警告: --trace 参数无效，不记录时间线")
+    if profile or profile_dump:
+        print("性能分析: 退出时打印每帧各阶段的耗时"
+              f"{', cProfile 结果写入 ' + profile_dump if profile_dump else ''}")
+    if trace:
+        print(f"时间线: 退出时写入 {trace}")
+    
+    if speed > 1 or render_every > 1 or turbo:
+        print(f"运行速度: 每帧{speed}个逻辑步, 每{render_every}帧绘制一次"
+              f"{', 不限帧率' if turbo else ''}")
+    
     if recording_mode:
         print("=== 录制模式已开启 ===")
         print("游戏将记录每一帧的图片和玩家动作")
@@ -46,10 +108,16 @@ if __name__=='__main__':
         print("按 Ctrl+C 或正常退出游戏来停止录制")
         print(f"帧跳过间隔: {frame_skip} (每{frame_skip}帧保存一次)")
         print(f"图片质量: {quality}")
+        print(f"存储格式: {storage}")
+        if savestate_interval:
+            print(f"关卡存档: 每{savestate_interval}帧保存一次")
         print("========================\n")
     
     try:
-        main(recording_mode=recording_mode, frame_skip=frame_skip, quality=quality)
+        main(recording_mode=recording_mode, frame_skip=frame_skip, quality=quality,
+             storage=storage, savestate_interval=savestate_interval,
+             speed=speed, render_every=render_every, turbo=turbo,
+             profile=profile, profile_dump=profile_dump, trace=trace)
     except KeyboardInterrupt:
         print("\n录制已停止")
     finally:
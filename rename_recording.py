@@ -2,208 +2,48 @@
 """
 录制文件重命名工具
 用法: python rename_recording.py --user zf --f recording_1761098154
+批量: python rename_recording.py --user zf --batch [--manifest] [--workers N]
 """
 
 import os
 import json
 import argparse
 import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
+import numpy as np
 
-def load_recording_data(recording_dir):
-    """加载录制数据JSON文件"""
-    json_path = os.path.join(recording_dir, "recording_data.json")
-    
-    if not os.path.exists(json_path):
-        print(f"错误: 找不到文件 {json_path}")
-        return None
-    
-    try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data
-    except json.JSONDecodeError as e:
-        print(f"JSON格式错误: {e}")
-        print("尝试修复JSON文件...")
-        return try_fix_json(json_path)
-    except Exception as e:
-        print(f"错误: 无法读取JSON文件 - {e}")
-        return None
+from data import labels
+from data import manifest
+from data.recording_io import RecordingReader, discover_recordings, write_recording_data
 
 
-def try_fix_json(json_path):
-    """尝试修复损坏的JSON文件"""
-    try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # 尝试找到最后一个完整的frame_data条目
-        lines = content.split('\n')
-        fixed_lines = []
-        bracket_count = 0
-        in_frame_data = False
-        
-        for i, line in enumerate(lines):
-            fixed_lines.append(line)
-            
-            # 计算括号数量
-            bracket_count += line.count('{') - line.count('}')
-            
-            # 检查是否在frame_data数组中
-            if '"frame_data":' in line:
-                in_frame_data = True
-            
-            # 如果在frame_data中且括号不平衡，可能找到了截断点
-            if in_frame_data and bracket_count < 0:
-                print(f"在第 {i+1} 行发现可能的截断点")
-                # 尝试修复
-                fixed_lines.append('    ]')
-                fixed_lines.append('}')
-                break
-        
-        # 如果文件没有正确结束，添加结束符
-        if bracket_count > 0:
-            for _ in range(bracket_count):
-                fixed_lines.append('}')
-        
-        # 写回修复后的内容
-        fixed_content = '\n'.join(fixed_lines)
-        
-        # 备份原文件
-        backup_path = json_path + '.backup'
-        with open(backup_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-        print(f"原文件已备份到: {backup_path}")
-        
-        # 写入修复后的文件
-        with open(json_path, 'w', encoding='utf-8') as f:
-            f.write(fixed_content)
-        
-        print("JSON文件修复完成，尝试重新加载...")
-        
-        # 重新尝试加载
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data
-        
-    except Exception as e:
-        print(f"修复JSON文件失败: {e}")
-        return None
+JOURNAL_FILENAME = "rename_journal.jsonl"
+MANIFEST_FILENAME = "label_manifest.json"
+NAMING_FORMAT = 'user_fxxx_axxx_ntxxx.png'
+
 
+def open_recording(recording_dir):
+    """打开录制数据JSON文件，返回流式读取器
 
-def load_recording_data_simple(recording_dir):
-    """简单加载录制数据，忽略JSON错误"""
+    帧数据在迭代时才逐条解析，文件再大也只占用单帧的内存；
+    文件被截断时读到最后一个完整的帧为止。
+    """
     json_path = os.path.join(recording_dir, "recording_data.json")
     
     if not os.path.exists(json_path):
         print(f"错误: 找不到文件 {json_path}")
         return None
     
-    try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # 尝试手动解析frame_data部分
-        frame_data = []
-        
-        # 查找frame_data数组
-        start_marker = '"frame_data": ['
-        end_marker = ']'
-        
-        start_pos = content.find(start_marker)
-        if start_pos == -1:
-            print("错误: 找不到frame_data数组")
-            return None
-        
-        start_pos += len(start_marker)
-        
-        # 查找frame_data数组的结束位置
-        bracket_count = 0
-        end_pos = start_pos
-        
-        for i in range(start_pos, len(content)):
-            if content[i] == '{':
-                bracket_count += 1
-            elif content[i] == '}':
-                bracket_count -= 1
-                if bracket_count == 0:
-                    # 找到一个完整的frame对象
-                    frame_text = content[start_pos:i+1].strip()
-                    if frame_text.startswith(','):
-                        frame_text = frame_text[1:].strip()
-                    
-                    try:
-                        frame_obj = json.loads(frame_text)
-                        # 确保frame_filename字段存在
-                        if 'frame_filename' not in frame_obj:
-                            frame_obj['frame_filename'] = None
-                        frame_data.append(frame_obj)
-                    except:
-                        # 忽略解析失败的frame
-                        pass
-                    
-                    start_pos = i + 1
-        
-        if not frame_data:
-            print("错误: 无法解析任何帧数据")
-            return None
-        
-        print(f"成功解析 {len(frame_data)} 个帧数据")
-        
-        # 创建简化的数据结构
-        data = {
-            'recording_info': {
-                'total_frames': len(frame_data),
-                'duration': 0.0,
-                'recording_time': 'unknown',
-                'game_version': 'Mario Level 1'
-            },
-            'frame_data': frame_data
-        }
-        
-        return data
-        
-    except Exception as e:
-        print(f"简单解析也失败: {e}")
-        return None
+    return RecordingReader(json_path)
 
 
-def calculate_death_status(frame_data):
-    """计算考虑连续帧的死亡状态"""
-    if not frame_data:
-        return []
-    
-    death_statuses = []
-    
-    for i, frame_info in enumerate(frame_data):
-        mario_dead = frame_info['mario_dead']
-        
-        # 获取前后帧的死亡状态
-        prev_dead = frame_data[i-1]['mario_dead'] if i > 0 else False
-        next_dead = frame_data[i+1]['mario_dead'] if i < len(frame_data) - 1 else False
-        
-        # 根据规则计算nt值
-        if mario_dead:
-            # 当前帧是死亡状态
-            if not prev_dead and not next_dead:
-                # 只有一帧死亡，前后都活着
-                death_status = 0
-            elif prev_dead and not next_dead:
-                # 连续死亡序列的最后一帧
-                death_status = 0
-            else:
-                # 连续死亡序列的中间帧或第一帧
-                death_status = 1
-        else:
-            # 当前帧是活着状态
-            death_status = 1
-        
-        death_statuses.append(death_status)
-    
-    return death_statuses
+def make_label_filename(user_name, frame_id, action_code, death_status):
+    """生成带标签的文件名: user_fxxx_axxx_ntxxx.png"""
+    return f"{user_name}_f{frame_id}_a{action_code}_nt{death_status}.png"
 
 
-def rename_frames(user_name, recording_dir, frame_data):
+def rename_frames(user_name, recording_dir, columns):
     """重命名帧图片文件"""
     frames_dir = os.path.join(recording_dir, "frames")
     
@@ -211,31 +51,25 @@ def rename_frames(user_name, recording_dir, frame_data):
         print(f"错误: 找不到frames目录 {frames_dir}")
         return False, []
     
-    print(f"开始重命名 {len(frame_data)} 个文件...")
-    
-    # 计算所有帧的死亡状态
-    death_statuses = calculate_death_status(frame_data)
+    # 一次算出所有帧的死亡状态
+    death_statuses = labels.death_status(columns['mario_dead'])
     
     renamed_count = 0
     error_count = 0
     skipped_count = 0
     failed_frames = []  # 记录失败的帧信息
     
-    for i, frame_info in enumerate(frame_data):
-        frame_id = frame_info['frame_id']
-        action_code = frame_info['action_code']
-        old_filename = frame_info.get('frame_filename')  # 使用get方法避免KeyError
+    for frame_id, action_code, old_filename, death_status in zip(
+            columns['frame_id'].tolist(), columns['action_code'].tolist(),
+            columns['frame_filename'].tolist(), death_statuses.tolist()):
         
-        # 检查old_filename是否为None
-        if old_filename is None:
+        # 没有对应图片的帧
+        if not old_filename:
             skipped_count += 1
             continue
         
-        # 使用计算出的死亡状态
-        death_status = death_statuses[i]
-        
         # 新文件名格式: user_fxxx_axxx_ntxxx.png
-        new_filename = f"{user_name}_f{frame_id}_a{action_code}_nt{death_status}.png"
+        new_filename = make_label_filename(user_name, frame_id, action_code, death_status)
         
         old_path = os.path.join(frames_dir, old_filename)
         new_path = os.path.join(frames_dir, new_filename)
@@ -267,39 +101,45 @@ def rename_frames(user_name, recording_dir, frame_data):
     return error_count == 0, failed_frames
 
 
-def update_json_data(recording_dir, frame_data, user_name):
-    """更新JSON文件中的文件名信息"""
+def update_json_data(recording_dir, user_name, death_statuses):
+    """更新JSON文件中的文件名信息
+
+    流式读取原文件、写出到临时文件后再替换。原文件被截断时，
+    新文件只包含完整的帧，原文件备份为 .backup。有完整性清单时同步更新清单。
+    """
     json_path = os.path.join(recording_dir, "recording_data.json")
+    tmp_path = json_path + '.tmp'
+    renamed = {}
     
     try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # 计算所有帧的死亡状态
-        death_statuses = calculate_death_status(frame_data)
-        
-        # 更新帧数据中的文件名
-        for i, frame_info in enumerate(frame_data):
-            frame_id = frame_info['frame_id']
-            action_code = frame_info['action_code']
-            
-            # 使用计算出的死亡状态
-            death_status = death_statuses[i]
-            new_filename = f"{user_name}_f{frame_id}_a{action_code}_nt{death_status}.png"
-            
-            # 更新JSON数据（只有当原文件名不为None时才更新）
-            if frame_info.get('frame_filename') is not None:
-                data['frame_data'][i]['frame_filename'] = new_filename
-            else:
-                data['frame_data'][i]['frame_filename'] = None
+        reader = RecordingReader(json_path)
+        recording_info = dict(reader.read_header() or {})
         
         # 添加用户信息
-        data['recording_info']['user_name'] = user_name
-        data['recording_info']['naming_format'] = 'user_fxxx_axxx_ntxxx.png'
-        
-        # 保存更新后的JSON
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        recording_info['user_name'] = user_name
+        recording_info['naming_format'] = NAMING_FORMAT
+        
+        def relabelled_frames():
+            for frame_info, death_status in zip(reader, death_statuses.tolist()):
+                # 只有当原文件名不为None时才更新
+                old_filename = frame_info.get('frame_filename')
+                if old_filename is not None:
+                    frame_info['frame_filename'] = make_label_filename(
+                        user_name, frame_info['frame_id'],
+                        frame_info['action_code'], death_status)
+                    renamed[f"frames/{old_filename}"] = f"frames/{frame_info['frame_filename']}"
+                else:
+                    frame_info['frame_filename'] = None
+                yield frame_info
+        
+        write_recording_data(tmp_path, recording_info, relabelled_frames())
+        
+        if reader.truncated:
+            backup_path = json_path + '.backup'
+            os.replace(json_path, backup_path)
+            print(f"原文件不完整，已备份到: {backup_path}")
+        os.replace(tmp_path, json_path)
+        manifest.update_manifest(recording_dir, renamed, changed=["recording_data.json"])
         
         print(f"JSON文件已更新: {json_path}")
         return True
@@ -309,18 +149,236 @@ def update_json_data(recording_dir, frame_data, user_name):
         return False
 
 
+def read_journal(recording_dir):
+    """读取重命名日志，返回 (已完成的旧文件名集合, 是否已全部完成)"""
+    journal_path = os.path.join(recording_dir, JOURNAL_FILENAME)
+    renamed = set()
+    finished = False
+
+    if not os.path.exists(journal_path):
+        return renamed, finished
+
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # 中断时最后一行可能没写完整
+                continue
+            if entry.get('status') == 'done':
+                finished = True
+            elif 'old' in entry:
+                renamed.add(entry['old'])
+
+    return renamed, finished
+
+
+def plan_recording(recording_dir, user_name):
+    """在工作进程中加载一个录制目录并计算所有帧的nt标签
+
+    返回的计划包含每一帧的旧文件名和新文件名，主进程据此重命名或写标签清单。
+    """
+    plan = {
+        'recording_dir': recording_dir,
+        'status': 'pending',
+        'renames': [],
+        'death_statuses': None,
+        'error': None
+    }
+
+    _, finished = read_journal(recording_dir)
+    if finished:
+        plan['status'] = 'done'
+        return plan
+
+    reader = open_recording(recording_dir)
+    if reader is None:
+        plan['status'] = 'error'
+        plan['error'] = '找不到 recording_data.json'
+        return plan
+
+    # JSON中已经记录了命名格式，说明之前已经完成过重命名
+    recording_info = reader.read_header() or {}
+    if recording_info.get('naming_format') == NAMING_FORMAT:
+        plan['status'] = 'done'
+        return plan
+
+    columns = labels.load_recording_columns(recording_dir)
+    if columns['frame_id'].size == 0:
+        plan['status'] = 'error'
+        plan['error'] = '无法加载帧数据'
+        return plan
+
+    death_statuses = labels.death_status(columns['mario_dead'])
+    saved = np.flatnonzero(columns['frame_filename'] != '')
+    for frame_id, action_code, death_status, old_filename in zip(
+            columns['frame_id'][saved].tolist(),
+            columns['action_code'][saved].tolist(),
+            death_statuses[saved].tolist(),
+            columns['frame_filename'][saved].tolist()):
+        new_filename = make_label_filename(user_name, frame_id, action_code, death_status)
+        plan['renames'].append((frame_id, action_code, death_status,
+                                old_filename, new_filename))
+
+    plan['death_statuses'] = death_statuses
+    return plan
+
+
+def write_label_manifest(plan, user_name):
+    """只写标签清单，不修改任何帧文件"""
+    manifest = {
+        'user_name': user_name,
+        'naming_format': NAMING_FORMAT,
+        'frames': [{'frame_id': frame_id,
+                    'action_code': action_code,
+                    'nt': death_status,
+                    'frame_filename': old_filename,
+                    'label_filename': new_filename}
+                   for frame_id, action_code, death_status, old_filename, new_filename
+                   in plan['renames']]
+    }
+
+    manifest_path = os.path.join(plan['recording_dir'], MANIFEST_FILENAME)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+    return manifest_path
+
+
+def _rename_one(frames_dir, old_filename, new_filename):
+    """重命名单个文件，已经重命名过的文件视为成功"""
+    old_path = os.path.join(frames_dir, old_filename)
+    new_path = os.path.join(frames_dir, new_filename)
+
+    if os.path.exists(old_path):
+        os.rename(old_path, new_path)
+        return True, None
+    if os.path.exists(new_path):
+        return True, None
+    return False, '文件不存在'
+
+
+def rename_with_journal(plan, workers):
+    """用线程池重命名一个录制目录的帧文件，每完成一个都写入日志以便中断后继续"""
+    recording_dir = plan['recording_dir']
+    frames_dir = os.path.join(recording_dir, "frames")
+    journal_path = os.path.join(recording_dir, JOURNAL_FILENAME)
+
+    if not os.path.exists(frames_dir):
+        return [{'frame_id': None, 'error_reason': f'找不到frames目录 {frames_dir}'}]
+
+    renamed, _ = read_journal(recording_dir)
+    pending = [r for r in plan['renames'] if r[3] not in renamed]
+    failed_frames = []
+
+    with open(journal_path, 'a', encoding='utf-8') as journal, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_rename_one, frames_dir, r[3], r[4]): r
+                   for r in pending}
+        for future in as_completed(futures):
+            frame_id, _, _, old_filename, new_filename = futures[future]
+            try:
+                ok, reason = future.result()
+            except Exception as e:
+                ok, reason = False, str(e)
+
+            if ok:
+                journal.write(json.dumps({'old': old_filename,
+                                          'new': new_filename},
+                                         ensure_ascii=False) + '\n')
+                journal.flush()
+            else:
+                failed_frames.append({'frame_id': frame_id,
+                                      'error_reason': reason})
+
+    return failed_frames
+
+
+def finish_journal(recording_dir):
+    """在日志末尾标记该录制目录已全部完成"""
+    journal_path = os.path.join(recording_dir, JOURNAL_FILENAME)
+    with open(journal_path, 'a', encoding='utf-8') as journal:
+        journal.write(json.dumps({'status': 'done'}) + '\n')
+
+
+def run_batch(user_name, root, workers, manifest_only):
+    """批量处理根目录下的所有录制，无需交互
+
+    标签计算在进程池中并行完成；重命名使用线程池并写日志，
+    中断后重新运行同一命令即可从断点继续，已完成的录制会被跳过。
+    """
+    recording_dirs = discover_recordings(root)
+    if not recording_dirs:
+        print(f"错误: 在 {root} 下没有找到录制目录")
+        return False
+
+    print(f"找到 {len(recording_dirs)} 个录制目录")
+    print(f"模式: {'写标签清单' if manifest_only else '重命名'}")
+    print("=" * 50)
+
+    all_ok = True
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(plan_recording, d, user_name) for d in recording_dirs]
+
+        for future in as_completed(futures):
+            plan = future.result()
+            recording_dir = plan['recording_dir']
+
+            if plan['status'] == 'done':
+                print(f"跳过 (已完成): {recording_dir}")
+                continue
+            if plan['status'] == 'error':
+                print(f"❌ {recording_dir}: {plan['error']}")
+                all_ok = False
+                continue
+
+            if manifest_only:
+                manifest_path = write_label_manifest(plan, user_name)
+                print(f"✅ {recording_dir}: {len(plan['renames'])} 帧标签已写入 {manifest_path}")
+                continue
+
+            failed_frames = rename_with_journal(plan, workers)
+            if failed_frames:
+                print(f"❌ {recording_dir}: {len(failed_frames)} 个文件重命名失败")
+                for failed_frame in failed_frames:
+                    print(f"  帧ID: {failed_frame['frame_id']} - 失败原因: {failed_frame['error_reason']}")
+                all_ok = False
+                continue
+
+            if update_json_data(recording_dir, user_name, plan['death_statuses']):
+                finish_journal(recording_dir)
+                print(f"✅ {recording_dir}: {len(plan['renames'])} 个文件已重命名")
+            else:
+                all_ok = False
+
+    return all_ok
+
+
 def main():
     parser = argparse.ArgumentParser(description='重命名录制文件')
     parser.add_argument('--user', required=True, help='用户名')
-    parser.add_argument('--f', required=True, help='录制目录名 (如: recording_1761098154)')
+    parser.add_argument('--f', help='录制目录名 (如: recording_1761098154)')
+    parser.add_argument('--batch', action='store_true', help='批量处理 --root 下所有录制目录')
+    parser.add_argument('--root', default='recordings', help='录制根目录 (默认: recordings)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='并行工作数')
+    parser.add_argument('--manifest', action='store_true',
+                        help='只写标签清单 label_manifest.json，不重命名文件')
+    parser.add_argument('--yes', '-y', action='store_true', help='不询问直接执行')
     
     args = parser.parse_args()
     
+    if args.batch:
+        ok = run_batch(args.user, args.root, args.workers, args.manifest)
+        sys.exit(0 if ok else 1)
+    if not args.f:
+        parser.error('需要 --f 或 --batch')
+    
     user_name = args.user
     recording_folder = args.f
     
     # 构建录制目录路径
-    recording_dir = os.path.join("recordings", recording_folder)
+    recording_dir = os.path.join(args.root, recording_folder)
     
     print(f"用户: {user_name}")
     print(f"录制目录: {recording_dir}")
@@ -333,42 +391,40 @@ def main():
     
     # 加载录制数据
     print("加载录制数据...")
-    data = load_recording_data(recording_dir)
-    if not data:
-        print("\n尝试使用简单解析模式...")
-        data = load_recording_data_simple(recording_dir)
-        if not data:
-            print("所有解析方法都失败了")
-            sys.exit(1)
+    if open_recording(recording_dir) is None:
+        sys.exit(1)
+    columns = labels.load_recording_columns(recording_dir)
+    frame_count = columns['frame_id'].size
     
-    frame_data = data.get('frame_data', [])
-    if not frame_data:
+    if frame_count == 0:
         print("错误: 没有找到帧数据")
         sys.exit(1)
     
-    print(f"找到 {len(frame_data)} 帧数据")
+    print(f"找到 {frame_count} 帧数据")
+    if columns['truncated']:
+        print("警告: JSON文件不完整，只处理到最后一个完整的帧")
     
     # 显示一些示例数据
     print("\n示例数据:")
-    for i in range(min(3, len(frame_data))):
-        frame = frame_data[i]
-        print(f"  帧 {frame['frame_id']}: action={frame['action_code']}, dead={frame['mario_dead']}")
+    for i in range(min(3, frame_count)):
+        print(f"  帧 {columns['frame_id'][i]}: action={columns['action_code'][i]}, dead={columns['mario_dead'][i]}")
     
     # 确认操作
-    print(f"\n准备重命名 {len(frame_data)} 个文件")
-    confirm = input("是否继续? (y/N): ").strip().lower()
+    print(f"\n准备重命名 {np.count_nonzero(columns['frame_filename'] != '')} 个文件")
+    confirm = 'y' if args.yes else input("是否继续? (y/N): ").strip().lower()
     if confirm != 'y':
         print("操作已取消")
         sys.exit(0)
     
     # 重命名文件
     print("\n开始重命名...")
-    success, failed_frames = rename_frames(user_name, recording_dir, frame_data)
+    success, failed_frames = rename_frames(user_name, recording_dir, columns)
     
     if success:
         # 更新JSON文件
         print("\n更新JSON文件...")
-        update_json_data(recording_dir, frame_data, user_name)
+        update_json_data(recording_dir, user_name,
+                         labels.death_status(columns['mario_dead']))
         print("\n✅ 重命名完成!")
     else:
         print("\n❌ 重命名过程中出现错误")
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+录制完整性校验工具
+用法: python verify_recordings.py [--root recordings] [--workers N] [--write-missing]
+
+有 manifest.json 的录制逐个文件比对大小和 sha256；没有清单的旧录制检查
+JSON 是否完整、引用的图片是否存在、PNG 是否被截断。
+"""
+
+import os
+import sys
+import argparse
+
+from data.manifest import verify_recordings, write_manifest
+from data.recording_io import discover_recordings
+
+PROBLEM_NAMES = {
+    'missing': '缺失',
+    'truncated': '被截断',
+    'size_mismatch': '大小不符',
+    'hash_mismatch': '内容不符',
+}
+
+
+def print_report(report, limit):
+    recording_dir = report['recording_dir']
+    source = '清单' if report['has_manifest'] else '结构检查'
+    if report['ok']:
+        print(f"✅ {recording_dir}: {report['files']} 个文件正常 ({source})")
+    else:
+        print(f"❌ {recording_dir}: 发现问题 ({source})")
+        for problem in report['structure']:
+            print(f"  {problem}")
+        for name, problem in report['problems'][:limit]:
+            print(f"  {name}: {PROBLEM_NAMES.get(problem, problem)}")
+        if len(report['problems']) > limit:
+            print(f"  ... 共 {len(report['problems'])} 个文件有问题")
+    if report['unlisted']:
+        print(f"  ⚠️ {len(report['unlisted'])} 个文件不在清单中")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='校验录制文件完整性')
+    parser.add_argument('--root', default='recordings', help='录制根目录 (默认: recordings)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='并行哈希的线程数')
+    parser.add_argument('--write-missing', action='store_true',
+                        help='为通过结构检查但没有清单的录制生成 manifest.json')
+    parser.add_argument('--limit', type=int, default=10, help='每个录制最多显示多少个问题文件')
+
+    args = parser.parse_args()
+
+    recording_dirs = discover_recordings(args.root)
+    if not recording_dirs:
+        print(f"错误: 在 {args.root} 下没有找到录制目录")
+        sys.exit(1)
+
+    print(f"校验 {len(recording_dirs)} 个录制目录...")
+    print("=" * 50)
+
+    reports = verify_recordings(recording_dirs, args.workers)
+    damaged = []
+    for report in reports:
+        print_report(report, args.limit)
+        if not report['ok']:
+            damaged.append(report['recording_dir'])
+        elif args.write_missing and not report['has_manifest']:
+            write_manifest(report['recording_dir'], args.workers)
+            print("  已生成清单")
+
+    print("=" * 50)
+    print(f"正常: {len(reports) - len(damaged)} 个, 损坏: {len(damaged)} 个")
+    for recording_dir in damaged:
+        print(f"  {recording_dir}")
+    sys.exit(1 if damaged else 0)
+
+
+if __name__ == '__main__':
+    main()